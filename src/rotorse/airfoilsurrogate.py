@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+airfoilsurrogate.py
+
+Kriging surrogate of XFOIL: maps NACA or CST parameters plus angle of attack
+and Reynolds number to cl, cd, and cm, with analytic derivatives.
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import numpy as np
+from scipy.linalg import cho_factor, cho_solve, LinAlgError
+
+from polardatabase import naca4_parameters
+
+
+def airfoil_features(parameterization, af_parameters):
+    """surrogate inputs describing an airfoil shape: [camber, camber position, thickness]
+    for a NACA 4-digit designation, or the weights themselves for CST"""
+
+    if parameterization == 'NACA':
+        return naca4_parameters(af_parameters)
+    else:
+        return np.asarray(af_parameters, dtype=float)
+
+
+
+class KrigingSurrogate(object):
+    """Ordinary kriging (Gaussian process regression with a constant mean and a
+    squared-exponential correlation) of cl, cd, and cm.  Inputs are the airfoil
+    features, angle of attack (deg), and log10(Re), normalized by the range
+    of the training data."""
+
+    def __init__(self, parameterization, lower, upper, X, weights, mean, theta):
+        """Constructor (use train or load rather than calling directly)"""
+
+        self.parameterization = parameterization
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.X = np.asarray(X, dtype=float)  # normalized training inputs
+        self.weights = np.asarray(weights, dtype=float)
+        self.mean = np.asarray(mean, dtype=float)
+        self.theta = float(theta)
+
+
+    @classmethod
+    def train(cls, parameterization, X, Y, thetas=np.logspace(-2, 2, 17), nugget=1e-8):
+        """fit the surrogate, choosing the correlation parameter by maximum likelihood
+
+        Parameters
+        ----------
+        parameterization : str
+            'NACA' or 'CST'
+        X : ndarray (npts, nfeatures+2)
+            airfoil features, alpha (deg), and log10(Re) of each training point
+        Y : ndarray (npts, 3)
+            cl, cd, cm at each training point
+        thetas : array_like
+            candidate correlation parameters
+        nugget : float
+            added to the diagonal of the correlation matrix for conditioning
+
+        """
+
+        X = np.asarray(X, dtype=float)
+        Y = np.asarray(Y, dtype=float)
+        n = len(X)
+
+        lower = X.min(axis=0)
+        upper = X.max(axis=0)
+        upper[upper == lower] += 1.0  # constant features
+        Xn = (X - lower)/(upper - lower)
+
+        d2 = np.sum((Xn[:, np.newaxis, :] - Xn[np.newaxis, :, :])**2, axis=2)
+        ones = np.ones(n)
+
+        best = None
+        for theta in thetas:
+            R = np.exp(-theta*d2) + nugget*np.eye(n)
+            try:
+                C = cho_factor(R)
+            except LinAlgError:
+                continue
+
+            Rinv1 = cho_solve(C, ones)
+            mean = np.dot(Rinv1, Y) / np.sum(Rinv1)
+            weights = cho_solve(C, Y - mean)
+            sigma2 = np.sum((Y - mean)*weights, axis=0) / n
+            logdetR = 2*np.sum(np.log(np.diag(C[0])))
+
+            # negative concentrated log-likelihood summed over cl, cd, cm
+            nll = 0.5*n*np.sum(np.log(sigma2)) + 1.5*logdetR
+
+            if best is None or nll < best[0]:
+                best = (nll, theta, mean, weights)
+
+        if best is None:
+            raise ValueError('could not factor the correlation matrix for any theta, try a larger nugget')
+
+        nll, theta, mean, weights = best
+
+        return cls(parameterization, lower, upper, Xn, weights, mean, theta)
+
+
+    @classmethod
+    def load(cls, fname):
+        """load a surrogate saved with save"""
+
+        f = np.load(fname)
+        model = cls(str(f['parameterization']), f['lower'], f['upper'], f['X'],
+                    f['weights'], f['mean'], float(f['theta']))
+        f.close()
+
+        return model
+
+
+    def save(self, fname):
+        """save to a binary file"""
+
+        with open(fname, 'wb') as f:
+            np.savez(f, parameterization=self.parameterization, lower=self.lower, upper=self.upper,
+                     X=self.X, weights=self.weights, mean=self.mean, theta=self.theta)
+
+
+    def evaluate(self, X):
+        """predict cl, cd, cm and their derivatives
+
+        Parameters
+        ----------
+        X : ndarray (npts, nfeatures+2)
+            airfoil features, alpha (deg), and log10(Re)
+
+        Returns
+        -------
+        Y : ndarray (npts, 3)
+            cl, cd, cm
+        dY_dX : ndarray (npts, 3, nfeatures+2)
+            derivatives of cl, cd, cm with respect to each input
+
+        """
+
+        scale = self.upper - self.lower
+        diff = (np.atleast_2d(X) - self.lower)/scale
+        diff = diff[:, np.newaxis, :] - self.X[np.newaxis, :, :]
+        r = np.exp(-self.theta*np.sum(diff**2, axis=2))
+
+        Y = self.mean + np.dot(r, self.weights)
+
+        dr_dX = -2*self.theta*diff*r[:, :, np.newaxis] / scale
+        dY_dX = np.einsum('inj,nk->ikj', dr_dX, self.weights)
+
+        return Y, dY_dX
+
+
+    def polars(self, af_parameters, Re, alpha):
+        """surrogate polars at each Reynolds number in the same format as
+        rotoraerodefaults.xfoil_polar, and their derivatives
+
+        Parameters
+        ----------
+        af_parameters : float or array_like
+            NACA 4-digit designation, or CST weights
+        Re : array_like
+            Reynolds numbers
+        alpha : array_like (deg)
+            angles of attack
+
+        Returns
+        -------
+        polars : list
+            (Re, alpha, cl, cd, cm) for each Reynolds number
+        dcoef_dparameters : ndarray (3, len(Re), len(alpha), nparameters)
+            derivatives of cl, cd, cm with respect to af_parameters
+
+        """
+
+        features = airfoil_features(self.parameterization, af_parameters)
+        Re = np.atleast_1d(np.asarray(Re, dtype=float))
+        alpha = np.asarray(alpha, dtype=float)
+        nf = len(features)
+        na = len(alpha)
+
+        X = np.zeros((len(Re)*na, nf+2))
+        X[:, :nf] = features
+        X[:, nf] = np.tile(alpha, len(Re))
+        X[:, nf+1] = np.repeat(np.log10(Re), na)
+
+        Y, dY_dX = self.evaluate(X)
+
+        polars = [(Re[j], alpha, Y[j*na:(j+1)*na, 0], Y[j*na:(j+1)*na, 1], Y[j*na:(j+1)*na, 2])
+                  for j in range(len(Re))]
+
+        dcoef = np.transpose(dY_dX[:, :, :nf], (1, 0, 2)).reshape(3, len(Re), na, nf)
+        if self.parameterization == 'NACA':
+            # camber digits are piecewise constant in the designation, so only thickness varies
+            dcoef = dcoef[:, :, :, 2:3]
+
+        return polars, dcoef
+
+
+
+def latin_hypercube(nsamples, lower, upper, seed=None):
+    """Latin hypercube design of experiments between lower and upper bounds"""
+
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    rand = np.random.RandomState(seed)
+
+    u = np.zeros((nsamples, len(lower)))
+    for j in range(len(lower)):
+        u[:, j] = (rand.permutation(nsamples) + rand.uniform(size=nsamples)) / nsamples
+
+    return lower + u*(upper - lower)
+
+
+def collect_training_data(parameterization, samples, Re, alphas, mach=0.03, iterations=1000, nprocs=1):
+    """run XFOIL for each sampled airfoil and Reynolds number
+
+    Parameters
+    ----------
+    parameterization : str
+        'NACA' or 'CST'
+    samples : ndarray (nsamples, nfeatures)
+        [camber, camber position, thickness] (NACA, camber digits are rounded), or CST weights
+    Re : array_like
+        Reynolds numbers
+    alphas : array_like (deg)
+        angles of attack
+    mach : float
+        Mach number
+    iterations : int
+        XFOIL iteration limit per angle of attack
+    nprocs : int
+        number of worker processes
+
+    Returns
+    -------
+    X : ndarray (npts, nfeatures+2)
+        airfoil features, alpha (deg), and log10(Re) of each converged point
+    Y : ndarray (npts, 3)
+        cl, cd, cm at each converged point
+
+    """
+
+    from rotoraerodefaults import cst_coordinates
+    from utilities import parallel_map
+    from naca_generator import naca4
+
+    args = []
+    features = []
+    for values in samples:
+        if parameterization == 'NACA':
+            m, p, t = values
+            pts = naca4('%d%d%05.2f' % (round(m), round(p), t), 60)
+            x = np.array([pt[0] for pt in pts])
+            y = np.array([pt[1] for pt in pts])
+            values = [round(m), round(p), t]
+        else:
+            nw = len(values)/2
+            x, y = cst_coordinates(values[:nw], values[nw:])
+            y = y[0]
+
+        for Re_j in np.atleast_1d(Re):
+            args.append((x, y, Re_j, mach, iterations, alphas))
+            features.append(values)
+
+    results = parallel_map(_training_job, args, nprocs)
+
+    X = []
+    Y = []
+    for values, res in zip(features, results):
+        if res is None:
+            continue
+        Re_j, alpha, cl, cd, cm = res
+        for k in range(len(alpha)):
+            X.append(np.concatenate([values, [alpha[k], np.log10(Re_j)]]))
+            Y.append([cl[k], cd[k], cm[k]])
+
+    return np.array(X), np.array(Y)
+
+
+def _training_job(args):
+    """XFOIL polar for a training sample (None if the analysis fails)"""
+
+    from rotoraerodefaults import xfoil_polar
+
+    try:
+        return xfoil_polar(*args, fallback=False)
+    except ValueError:
+        return None
+
+
+def train_surrogate(fname, parameterization, lower, upper, nsamples, Re=[1e6],
+                    alphas=np.linspace(-20, 20, 21), mach=0.03, nprocs=1, seed=0):
+    """training pipeline: sample airfoils with a Latin hypercube, run XFOIL,
+    fit a KrigingSurrogate, and save it to fname.  Meant to be run once, offline.
+
+    Parameters
+    ----------
+    fname : str
+        output file
+    parameterization : str
+        'NACA' or 'CST'
+    lower, upper : array_like
+        bounds of [camber, camber position, thickness] (NACA) or of each CST weight
+    nsamples : int
+        number of airfoils analyzed
+    Re : array_like
+        Reynolds numbers
+    alphas : array_like (deg)
+        angles of attack
+    mach : float
+        Mach number
+    nprocs : int
+        number of worker processes
+    seed : int
+        random seed for the design of experiments
+
+    Returns
+    -------
+    model : KrigingSurrogate
+
+    """
+
+    samples = latin_hypercube(nsamples, lower, upper, seed)
+    X, Y = collect_training_data(parameterization, samples, Re, alphas, mach, nprocs=nprocs)
+    model = KrigingSurrogate.train(parameterization, X, Y)
+    model.save(fname)
+
+    return model
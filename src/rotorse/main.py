@@ -48,7 +48,13 @@ rotor.nBlades = 3  # (Int): number of blades
 basepath = os.path.join(os.path.dirname(os.path.realpath(__file__)), '5MW_AFFiles')
 
 # === airfoil analysis tool ===
-rotor.airfoil_analysis_tool = 'XFOIL'  # (Enum): airfoil analysis tool ('Files', 'XFOIL')
+rotor.airfoil_analysis_tool = 'XFOIL'  # (Enum): airfoil analysis tool ('Files', 'XFOIL', 'Database', 'Surrogate')
+rotor.polar_cache_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'polar_cache')  # (Str): cache of XFOIL polars, reused across runs
+rotor.nprocs = 1  # (Int): number of worker processes used for parallel analyses (e.g., one XFOIL run per station)
+rotor.alpha_sampling = 'adaptive'  # (Enum): angles of attack analyzed with XFOIL ('uniform', 'adaptive')
+rotor.reynolds_mode = 'fixed'  # (Enum): Reynolds numbers analyzed with XFOIL ('fixed', 'local')
+rotor.airfoil_database = ''  # (Str): polar database built offline with polardatabase.build_polar_database (for 'Database')
+rotor.airfoil_surrogate = ''  # (Str): surrogate trained offline with airfoilsurrogate.train_surrogate (for 'Surrogate')
 airfoil_types = ['0']*8
 coordinate_files = ['0']*7
 
@@ -74,7 +80,7 @@ rotor.airfoil_files = af  # (List): names of airfoil file
 # === airfoil parameterization  ===
 rotor.airfoil_parameterization_type = 'CST'  # (Enum): airfoil parameterization type ('Coordinates', 'NACA', 'CST')
 
-if rotor.airfoil_analysis_tool == 'XFOIL':
+if rotor.airfoil_analysis_tool in ('XFOIL', 'Database', 'Surrogate'):
     if rotor.airfoil_parameterization_type == 'Coordinates':
         # if using XFOIL to provide aerodynamic data then load airfoil coordinate files
         coordinate_files[0] = os.path.join(basepath, 'Cylinder.pfl')
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+polardatabase.py
+
+Airfoil polars precomputed with XFOIL on a grid of NACA or CST parameters,
+so that polars for new airfoil shapes can be interpolated rather than solved.
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import numpy as np
+import itertools
+
+
+def naca4_parameters(code):
+    """split a (possibly non-integer) NACA 4-digit designation into
+    [max camber (% chord), position of max camber (tenths of chord), thickness (% chord)]"""
+
+    code = float(code)
+    m = np.floor(code/1000.0)
+    p = np.floor((code - 1000*m)/100.0)
+    t = code - 1000*m - 100*p
+
+    return np.array([m, p, t])
+
+
+
+class PolarDatabase(object):
+    """cl, cd, and cm tabulated over a grid of airfoil parameters,
+    Reynolds number, and angle of attack"""
+
+    def __init__(self, parameterization, axes, Re, alpha, cl, cd, cm, mach=0.0):
+        """Constructor
+
+        Parameters
+        ----------
+        parameterization : str
+            'NACA' (axes are max camber, camber position, thickness) or
+            'CST' (one axis per weight: upper surface weights then lower surface weights)
+        axes : list(ndarray)
+            increasing grid values along each parameter axis
+        Re : ndarray
+            Reynolds numbers
+        alpha : ndarray (deg)
+            angles of attack
+        cl, cd, cm : ndarray (len(axes[0]), ..., len(axes[-1]), len(Re), len(alpha))
+            force and moment coefficients
+
+        """
+
+        self.parameterization = parameterization
+        self.axes = [np.asarray(axis, dtype=float) for axis in axes]
+        self.Re = np.asarray(Re, dtype=float)
+        self.alpha = np.asarray(alpha, dtype=float)
+        self.mach = mach
+
+        # stacked so all three coefficients are interpolated together
+        self.data = np.concatenate([cl[..., np.newaxis, :, :], cd[..., np.newaxis, :, :],
+                                    cm[..., np.newaxis, :, :]], axis=-3)
+
+
+    @classmethod
+    def load(cls, fname):
+        """load a database saved with save"""
+
+        f = np.load(fname)
+        naxes = int(f['naxes'])
+        axes = [f['axis%d' % k] for k in range(naxes)]
+        data = f['data'].astype(float)
+        db = cls(str(f['parameterization']), axes, f['Re'], f['alpha'],
+                 data[..., 0, :, :], data[..., 1, :, :], data[..., 2, :, :], float(f['mach']))
+        f.close()
+
+        return db
+
+
+    def save(self, fname):
+        """save to a compressed binary file (coefficients in single precision)"""
+
+        axes = dict(('axis%d' % k, axis) for k, axis in enumerate(self.axes))
+        with open(fname, 'wb') as f:
+            np.savez_compressed(f, parameterization=self.parameterization, naxes=len(self.axes),
+                                Re=self.Re, alpha=self.alpha, mach=self.mach,
+                                data=self.data.astype(np.float32), **axes)
+
+
+    def interpolate(self, af_parameters):
+        """multilinear interpolation in the parameter grid (no extrapolation).
+        Parameters outside the grid are clipped to its edges, so the polars
+        are constant there and their gradients with respect to the airfoil
+        parameters are zero.
+
+        Parameters
+        ----------
+        af_parameters : float or array_like
+            NACA 4-digit designation, or CST weights
+
+        Returns
+        -------
+        cl, cd, cm : ndarray (len(Re), len(alpha))
+
+        """
+
+        if self.parameterization == 'NACA':
+            values = naca4_parameters(af_parameters)
+        else:
+            values = np.asarray(af_parameters, dtype=float)
+
+        if len(values) != len(self.axes):
+            raise ValueError('expected %d airfoil parameters for this database, got %d' % (len(self.axes), len(values)))
+
+        # cell containing the point, and the weights within the cell
+        cell = []
+        weights = []
+        for axis, value in zip(self.axes, values):
+            if len(axis) == 1:
+                cell.append(slice(0, 1))
+                weights.append(None)
+            else:
+                i = np.clip(np.searchsorted(axis, value) - 1, 0, len(axis)-2)
+                cell.append(slice(i, i+2))
+                weights.append(np.clip((value - axis[i])/(axis[i+1] - axis[i]), 0.0, 1.0))
+
+        # contract one axis at a time
+        sub = self.data[tuple(cell)]
+        for w in weights:
+            if w is None:
+                sub = sub[0]
+            else:
+                sub = (1-w)*sub[0] + w*sub[1]
+
+        if np.any(np.isnan(sub)):
+            raise ValueError('polar database has no converged data near airfoil parameters %s' % str(af_parameters))
+
+        return sub[0], sub[1], sub[2]
+
+
+    def polars(self, af_parameters):
+        """interpolated polars at each Reynolds number in the same format as
+        rotoraerodefaults.xfoil_polar: a list of (Re, alpha, cl, cd, cm)"""
+
+        cl, cd, cm = self.interpolate(af_parameters)
+
+        return [(self.Re[j], self.alpha, cl[j], cd[j], cm[j]) for j in range(len(self.Re))]
+
+
+
+def _naca4_code(values):
+    """NACA 4-digit designation from [camber, position, thickness] (integers)"""
+
+    return '%d%d%02d' % tuple(int(round(v)) for v in values)
+
+
+def _database_job(args):
+    """XFOIL polar on the full alpha grid (nan if the analysis fails)"""
+
+    from rotoraerodefaults import xfoil_polar
+
+    x, y, Re, mach, iterations, alphas = args
+    try:
+        Re, alpha, cl, cd, cm = xfoil_polar(x, y, Re, mach, iterations, alphas, fallback=False)
+    except ValueError:
+        nan = np.nan*np.ones(len(alphas))
+        return nan, nan, nan
+
+    # fill angles that did not converge from their neighbors
+    return np.interp(alphas, alpha, cl), np.interp(alphas, alpha, cd), np.interp(alphas, alpha, cm)
+
+
+def build_polar_database(fname, parameterization, axes, Re=[1e6], mach=0.03,
+                         alphas=np.linspace(-20, 20, 80), iterations=1000, nprocs=1):
+    """run XFOIL at every point of a grid of airfoil parameters and save the
+    resulting PolarDatabase to fname.  This is meant to be run once, offline.
+
+    Parameters
+    ----------
+    fname : str
+        output file
+    parameterization : str
+        'NACA' or 'CST'
+    axes : list(array_like)
+        grid values along each parameter (see PolarDatabase).
+        NACA axes must contain integer digits.
+    Re : array_like
+        Reynolds numbers
+    mach : float
+        Mach number
+    alphas : array_like (deg)
+        angles of attack
+    iterations : int
+        XFOIL iteration limit per angle of attack
+    nprocs : int
+        number of worker processes
+
+    Returns
+    -------
+    db : PolarDatabase
+
+    """
+
+    from rotoraerodefaults import cst_coordinates
+    from utilities import parallel_map
+    from naca_generator import naca4
+
+    axes = [np.asarray(axis, dtype=float) for axis in axes]
+    Re = np.atleast_1d(np.asarray(Re, dtype=float))
+    alphas = np.asarray(alphas, dtype=float)
+    shape = tuple(len(axis) for axis in axes)
+
+    args = []
+    for values in itertools.product(*axes):
+        if parameterization == 'NACA':
+            pts = naca4(_naca4_code(values), 60)
+            x = np.array([pt[0] for pt in pts])
+            y = np.array([pt[1] for pt in pts])
+        else:
+            nw = len(values)/2
+            x, y = cst_coordinates(values[:nw], values[nw:])
+            y = y[0]
+
+        for Re_j in Re:
+            args.append((x, y, Re_j, mach, iterations, alphas))
+
+    results = parallel_map(_database_job, args, nprocs)
+
+    cl = np.array([res[0] for res in results]).reshape(shape + (len(Re), len(alphas)))
+    cd = np.array([res[1] for res in results]).reshape(shape + (len(Re), len(alphas)))
+    cm = np.array([res[2] for res in results]).reshape(shape + (len(Re), len(alphas)))
+
+    nfail = np.count_nonzero(np.isnan(cl[..., 0]))
+    if nfail > 0:
+        print 'XFOIL failed for %d of %d airfoils in the polar database' % (nfail, len(results))
+
+    db = PolarDatabase(parameterization, axes, Re, alphas, cl, cd, cm, mach)
+    db.save(fname)
+
+    return db
@@ -285,6 +285,9 @@ class CompositeSection:
     """A CompositeSection defines the layup of the entire
     airfoil cross-section
 
+    If scale is set (a section resized with lazy scale factors), t holds the
+    unscaled ply thicknesses and the actual ones are given by thickness(sector).
+
     """
 
 
@@ -308,13 +311,27 @@ class CompositeSection:
 
         self.materials = materials
 
+        # set when this section is a view into a PackedLayup
+        self.layup = None
+        self.station = None
+        self.scale = None  # thickness scale factor of each sector, applied lazily (t itself is not scaled)
+
 
     def mycopy(self):
         return CompositeSection(copy.deepcopy(self.loc), copy.deepcopy(self.n_plies),
-            copy.deepcopy(self.t), copy.deepcopy(self.theta), copy.deepcopy(self.mat_idx),
+            [self.thickness(j) for j in range(len(self.t))], copy.deepcopy(self.theta), copy.deepcopy(self.mat_idx),
             self.materials)  # TODO: copy materials (for now it never changes so I'm not looking at it)
 
 
+    def thickness(self, sector):
+        """ply thicknesses of a sector, including any lazy scale factor (always a new array)"""
+
+        if self.scale is None:
+            return np.array(self.t[sector], dtype=float)
+        else:
+            return self.t[sector]*self.scale[sector]
+
+
     @classmethod
     def initFromPreCompLayupFile(cls, fname, locW, materials):
         """Construct CompositeSection object from a PreComp input file
@@ -454,7 +471,7 @@ class CompositeSection:
 
         """
 
-        t = self.t[sector]
+        t = self.thickness(sector)
         n_plies = self.n_plies[sector]
         mat_idx = self.mat_idx[sector]
         theta = self.theta[sector]
@@ -569,6 +586,9 @@ class CompositeSection:
 
     def _preCompFormat(self):
 
+        if self.layup is not None:
+            return self.layup._preCompFormat(self.station)
+
         n = len(self.theta)
         n_lamina = np.zeros(n)
 
@@ -583,12 +603,316 @@ class CompositeSection:
             mat[i] += 1  # 1-based indexing in Fortran
 
         return self.loc, n_lamina, np.concatenate(self.n_plies), \
-            np.concatenate(self.t), np.concatenate(self.theta), mat
+            np.concatenate([self.thickness(i) for i in range(n)]), np.concatenate(self.theta), mat
+
+
+
+
+
+
+
+
+
+def laminateABD(t, n_plies, theta, E1, E2, G12, nu12, derivatives=False):
+    """Vectorized classical lamination theory: A, B, D matrices of many laminates at once,
+    and optionally their derivatives with respect to ply thickness.  Same as
+    CompositeSection.compositeMatrices, but for arrays of laminates padded with
+    zero-thickness (n_plies = 0) laminae.
+
+    Parameters
+    ----------
+    t, n_plies, theta, E1, E2, G12, nu12 : ndarray, shape(nlam, nlamina)
+        ply thickness (m), number of plies, ply angle (deg), and material
+        properties of each lamina
+    derivatives : bool
+        if True, also return the derivatives with respect to ply thickness
+
+    Returns
+    -------
+    A, B, D : ndarray, shape(nlam, 3, 3)
+        portions of the constitutive matrix (see compositeMatrices)
+    totalHeight : ndarray, shape(nlam)
+        total height of each laminate stack
+    dA, dB, dD : ndarray, shape(nlam, nlamina, 3, 3)
+        derivatives with respect to the ply thickness of each lamina (only if derivatives)
+    dtotalHeight : ndarray, shape(nlam, nlamina)
+        (only if derivatives)
+
+    """
+
+    nlam, m = t.shape
+
+    # lamina stiffness in principal axes
+    nu21 = nu12*E2/E1
+    denom = 1 - nu12*nu21
+    Q = np.zeros((nlam, m, 3, 3))
+    Q[:, :, 0, 0] = E1/denom
+    Q[:, :, 0, 1] = Q[:, :, 1, 0] = nu12*E2/denom
+    Q[:, :, 1, 1] = E2/denom
+    Q[:, :, 2, 2] = G12
+
+    # rotate all plies at once
+    c = np.cos(np.radians(theta))
+    s = np.sin(np.radians(theta))
+    c2, s2, cs = c*c, s*s, c*s
+    T12 = np.array([[c2, s2, cs], [s2, c2, -cs], [-cs, cs, 0.5*(c2-s2)]])
+    Tinv = np.array([[c2, s2, -2*cs], [s2, c2, 2*cs], [cs, -cs, c2-s2]])
+    Qbar = np.einsum('ijnk,nkjl,lpnk->nkip', Tinv, Q, T12)
+
+    # heights relative to mid-plane
+    dz = t*n_plies
+    z = np.concatenate([np.zeros((nlam, 1)), np.cumsum(dz, axis=1)], axis=1)
+    totalHeight = z[:, -1]
+    h = z - totalHeight[:, np.newaxis]/2.0
+
+    A = np.einsum('nkij,nk->nij', Qbar, h[:, 1:] - h[:, :-1])
+    B = np.einsum('nkij,nk->nij', Qbar, 0.5*(h[:, 1:]**2 - h[:, :-1]**2))
+    D = np.einsum('nkij,nk->nij', Qbar, 1.0/3.0*(h[:, 1:]**3 - h[:, :-1]**3))
+
+    if not derivatives:
+        return A, B, D, totalHeight
+
+    # dh[n, j, k] = dh_j/dt_k
+    below = (np.arange(m+1)[:, np.newaxis] > np.arange(m)[np.newaxis, :]).astype(float)
+    dh = n_plies[:, np.newaxis, :]*(below - 0.5)
+
+    dA = Qbar*n_plies[:, :, np.newaxis, np.newaxis]
+    wB = h[:, 1:, np.newaxis]*dh[:, 1:, :] - h[:, :-1, np.newaxis]*dh[:, :-1, :]
+    wD = h[:, 1:, np.newaxis]**2*dh[:, 1:, :] - h[:, :-1, np.newaxis]**2*dh[:, :-1, :]
+    dB = np.einsum('nkij,nkl->nlij', Qbar, wB)
+    dD = np.einsum('nkij,nkl->nlij', Qbar, wD)
+    dtotalHeight = n_plies.copy()
+
+    return A, B, D, totalHeight, dA, dB, dD, dtotalHeight
+
+
+def panelBucklingStrain(sections, sector_idx, chord, derivatives=False):
+    """Critical buckling strain and effective axial modulus of one sector at every
+    station (see PreCompSections.panelBucklingStrain), computed together from a
+    single vectorized lamination theory evaluation, and optionally the derivatives
+    of the strain with respect to ply thickness.
+
+    Parameters
+    ----------
+    sections : list(CompositeSection)
+        section at each station
+    sector_idx : array_like(int)
+        sector of each station used for the panel
+    chord : ndarray
+        chord at each station (m)
+    derivatives : bool
+        if True, also return deps_dt
+
+    Returns
+    -------
+    eps_crit : ndarray
+        critical strain for panel buckling
+    Eaxial : ndarray (N/m^2)
+        effective axial modulus of elasticity of each panel (see effectiveEAxial)
+    deps_dt : list(ndarray)
+        derivative of eps_crit at each station with respect to the ply
+        thickness of each lamina in the sector (only if derivatives)
+
+    """
+
+    nsec = len(sections)
+    nlamina = [len(cs.theta[sector_idx[i]]) for i, cs in enumerate(sections)]
+    m = max(nlamina)
+
+    # pad all laminates to the same number of laminae
+    t = np.zeros((nsec, m))
+    n_plies = np.zeros((nsec, m))
+    theta = np.zeros((nsec, m))
+    props = np.ones((4, nsec, m))  # E1, E2, G12, nu12 (padding is arbitrary but nonsingular)
+    props[3] = 0.0
+    sector_length = np.zeros(nsec)
+
+    for i, cs in enumerate(sections):
+        j = sector_idx[i]
+        k = nlamina[i]
+        t[i, :k] = cs.thickness(j)
+        n_plies[i, :k] = cs.n_plies[j]
+        theta[i, :k] = cs.theta[j]
+        mats = [cs.materials[int(idx)] for idx in cs.mat_idx[j]]
+        props[:, i, :k] = [[mat.E1 for mat in mats], [mat.E2 for mat in mats],
+                           [mat.G12 for mat in mats], [mat.nu12 for mat in mats]]
+        sector_length[i] = chord[i] * (cs.loc[j+1] - cs.loc[j])
+
+    ABD = laminateABD(t, n_plies, theta, *props, derivatives=derivatives)
+    A, B, D, H = ABD[:4]
+
+    # S = [A B; B D]
+    S = np.concatenate([np.concatenate([A, B], axis=2), np.concatenate([B, D], axis=2)], axis=1)
+    M = S[:, 1:, 1:]
+    detS = np.linalg.det(S)
+    detM = np.linalg.det(M)
+    Eaxial = detS/detM/H
+
+    # use empirical formula
+    D1 = D[:, 0, 0]
+    D2 = D[:, 1, 1]
+    D3 = D[:, 0, 1] + 2*D[:, 2, 2]
+    Nxx = 2 * (math.pi/sector_length)**2 * (np.sqrt(D1*D2) + D3)
+
+    # -Nxx/totalHeight/Eaxial without forming Eaxial
+    eps_crit = -Nxx*detM/detS
+
+    if not derivatives:
+        return eps_crit, Eaxial
+
+    # derivatives (d det(X) = det(X) trace(X^-1 dX))
+    dA, dB, dD, dH = ABD[4:]
+    dS = np.concatenate([np.concatenate([dA, dB], axis=3), np.concatenate([dB, dD], axis=3)], axis=2)
+    dlogdetS = np.einsum('nij,nkji->nk', np.linalg.inv(S), dS)
+    dlogdetM = np.einsum('nij,nkji->nk', np.linalg.inv(M), dS[:, :, 1:, 1:])
+    sqrtD = np.sqrt(D1*D2)[:, np.newaxis]
+    dNxx = 2 * (math.pi/sector_length[:, np.newaxis])**2 * (
+        (D2[:, np.newaxis]*dD[:, :, 0, 0] + D1[:, np.newaxis]*dD[:, :, 1, 1])/(2*sqrtD)
+        + dD[:, :, 0, 1] + 2*dD[:, :, 2, 2])
+
+    deps = eps_crit[:, np.newaxis]*(dNxx/Nxx[:, np.newaxis] + dlogdetM - dlogdetS)
+    deps_dt = [deps[i, :nlamina[i]] for i in range(nsec)]
+
+    return eps_crit, Eaxial, deps_dt
+
+
+
+class PackedLayup:
+    """The layups of one surface (upper, lower, or webs) at every station of a blade,
+    stored as flat ply arrays with offsets, rather than as lists of per-sector arrays.
+
+    Ply data for sector s are n_plies[sector_ptr[s]:sector_ptr[s+1]] (and likewise t, theta, mat_idx),
+    the sectors of station i are station_ptr[i]:station_ptr[i+1], and the sector
+    locations of station i are loc[loc_ptr[i]:loc_ptr[i+1]].
+
+    """
+
+    def __init__(self, loc, loc_ptr, station_ptr, sector_ptr, n_plies, t, theta, mat_idx, materials, scale=None):
+        """Constructor (use fromSections or load rather than calling directly).
+        If given, scale multiplies the thickness of every ply in each sector (applied lazily)."""
+
+        self.loc = loc
+        self.loc_ptr = np.asarray(loc_ptr, dtype=int)
+        self.station_ptr = np.asarray(station_ptr, dtype=int)
+        self.sector_ptr = np.asarray(sector_ptr, dtype=int)
+        self.n_plies = n_plies
+        self.t = t
+        self.theta = theta
+        self.mat_idx = mat_idx
+        self.materials = materials
+        self.scale = scale
+
+        # computed once rather than on every call to _preCompFormat
+        self.n_lamina = np.diff(self.sector_ptr).astype(float)
+        self.mat_idx_fortran = mat_idx + 1  # 1-based indexing in Fortran
+        self.ply_sector = np.repeat(np.arange(len(self.n_lamina)), np.diff(self.sector_ptr))
+        self.sector_station = np.repeat(np.arange(len(self)), np.diff(self.station_ptr))
+
+
+    @classmethod
+    def fromSections(cls, sections):
+        """pack a list of CompositeSection objects (one per station).
+        Any lazy scale factors of the sections are applied to the packed thicknesses."""
+
+        loc = []
+        loc_ptr = [0]
+        station_ptr = [0]
+        sector_ptr = [0]
+        plies = []
+
+        for cs in sections:
+            loc.append(np.asarray(cs.loc, dtype=float))
+            loc_ptr.append(loc_ptr[-1] + len(cs.loc))
+            station_ptr.append(station_ptr[-1] + len(cs.theta))
+            for j in range(len(cs.theta)):
+                sector_ptr.append(sector_ptr[-1] + len(cs.theta[j]))
+                plies.append(np.array([cs.n_plies[j], cs.thickness(j), cs.theta[j], cs.mat_idx[j]], dtype=float).reshape(4, -1))
+
+        plies = np.concatenate(plies, axis=1) if len(plies) > 0 else np.zeros((4, 0))
+        loc = np.concatenate(loc) if len(loc) > 0 else np.zeros(0)
+        materials = sections[0].materials if len(sections) > 0 else []
+
+        return cls(loc, loc_ptr, station_ptr, sector_ptr, plies[0], plies[1], plies[2], plies[3], materials)
+
+
+    @classmethod
+    def load(cls, fname, materials, mmap=True):
+        """load a layup saved with save, memory-mapped by default (the ply arrays are then read-only views)"""
+
+        block = np.load(fname, mmap_mode='r' if mmap else None)
+
+        nstation, nsector, nply, nloc = [int(n) for n in block[:4]]
+        sizes = [nstation+1, nstation+1, nsector+1, nloc, nply, nply, nply, nply]
+        offsets = np.cumsum([4] + sizes)
+        parts = [block[offsets[k]:offsets[k+1]] for k in range(len(sizes))]
+
+        return cls(parts[3], parts[0], parts[1], parts[2], parts[4], parts[5], parts[6], parts[7], materials)
+
+
+    def save(self, fname):
+        """save as a single binary block (.npy) that can be memory-mapped with load"""
+
+        header = [len(self), len(self.n_lamina), len(self.t), len(self.loc)]
+        block = np.concatenate([header, self.loc_ptr, self.station_ptr, self.sector_ptr, self.loc,
+                                self.n_plies, self.t, self.theta, self.mat_idx]).astype(float)
+        np.save(fname, block)
+
+
+    def __len__(self):
+
+        return len(self.station_ptr) - 1
+
+
+    def withThickness(self, t):
+        """a layup sharing everything with this one except the ply thicknesses"""
+
+        return PackedLayup(self.loc, self.loc_ptr, self.station_ptr, self.sector_ptr, self.n_plies,
+                           t, self.theta, self.mat_idx, self.materials)
+
+
+    def withScale(self, scale):
+        """a layup sharing all data with this one (nothing is copied), with the thickness
+        of each sector multiplied by scale whenever it is used"""
+
+        return PackedLayup(self.loc, self.loc_ptr, self.station_ptr, self.sector_ptr, self.n_plies,
+                           self.t, self.theta, self.mat_idx, self.materials, scale)
+
+
+    def section(self, i):
+        """CompositeSection at station i whose data are views into this layup"""
+
+        loc = self.loc[self.loc_ptr[i]:self.loc_ptr[i+1]]
+        ptr = self.sector_ptr[self.station_ptr[i]:self.station_ptr[i+1]+1]
+        split = lambda x: [x[ptr[j]:ptr[j+1]] for j in range(len(ptr)-1)]
+
+        cs = CompositeSection(loc, split(self.n_plies), split(self.t), split(self.theta),
+                              split(self.mat_idx), self.materials)
+        cs.layup = self
+        cs.station = i
+        if self.scale is not None:
+            cs.scale = self.scale[self.station_ptr[i]:self.station_ptr[i+1]]
+
+        return cs
+
+
+    def sections(self):
+        """CompositeSection views at every station"""
 
+        return [self.section(i) for i in range(len(self))]
 
 
+    def _preCompFormat(self, i):
+        """same as CompositeSection._preCompFormat for station i, but only slices (no concatenation)"""
 
+        s0, s1 = self.station_ptr[i], self.station_ptr[i+1]
+        p0, p1 = self.sector_ptr[s0], self.sector_ptr[s1]
+        loc = self.loc[self.loc_ptr[i]:self.loc_ptr[i+1]]
+        t = self.t[p0:p1]
+        if self.scale is not None:
+            t = t*self.scale[self.ply_sector[p0:p1]]
 
+        return loc, self.n_lamina[s0:s1], self.n_plies[p0:p1], t, \
+            self.theta[p0:p1], self.mat_idx_fortran[p0:p1]
 
 
 
@@ -20,13 +20,13 @@ __version__ = '$Revision: $'
 # Standard Python modules
 # =============================================================================
 
-import os, sys, string, copy, pdb, time
+import os, sys, string, copy, pdb, time, warnings
 
 # =============================================================================
 # External Python modules
 # =============================================================================
 
-from numpy import zeros,array
+from numpy import zeros,array,ones,argsort,searchsorted,nan
 
 # =============================================================================
 # Extension modules
@@ -116,6 +116,65 @@ class xfoilAnalysis():
         xfoil.oper()
         return xfoil.cr09.cl,xfoil.cr09.cd,xfoil.cr09.cm,xfoil.cl01.lexitflag
 
+    def solveAlphaSweep(self,alphas,max_failures=3):
+        '''
+        Compute the flow solution over a sweep of angles of attack (degrees).
+
+        The sweep starts at the angle closest to zero and marches outward
+        in each direction, so each solve starts from the boundary layer of
+        the previous (converged) angle. A direction is abandoned once
+        max_failures consecutive angles fail to converge.
+
+        Returns arrays cl, cd, cm, lexitflag in the order of alphas.
+        lexitflag is True for angles that did not converge or were never
+        attempted. cl, cd, cm are nan at those angles.
+        '''
+        alphas = array(alphas,dtype=float)
+        n = len(alphas)
+        cl = zeros(n)*nan
+        cd = zeros(n)*nan
+        cm = zeros(n)*nan
+        lexitflag = ones(n,dtype=bool)
+
+        order = argsort(alphas)
+        start = searchsorted(alphas[order],0.0)
+        upper = order[start:]        # alpha >= 0, increasing
+        lower = order[:start][::-1]  # alpha < 0, decreasing
+
+        for branch in [upper,lower]:
+            self.resetBoundaryLayer()
+            failures = 0
+            for j in branch:
+                cl_j,cd_j,cm_j,flag = self.solveAlpha(alphas[j])
+                if flag:
+                    failures += 1
+                    if failures >= max_failures:
+                        break
+                    # end if
+                    # don't start the next angle from a diverged solution
+                    self.resetBoundaryLayer()
+                else:
+                    cl[j],cd[j],cm[j] = cl_j,cd_j,cm_j
+                    lexitflag[j] = False
+                    failures = 0
+                # end if
+            # end for
+        # end for
+
+        return cl,cd,cm,lexitflag
+
+    def resetBoundaryLayer(self):
+        '''Discard the stored boundary layer so the next solve starts cold'''
+
+        if hasattr(xfoil.cl01,'lblini'):
+            xfoil.cl01.lblini = False
+        else:
+            warnings.warn('this pyxlight build does not expose cl01.lblini, '
+                          'the boundary layer cannot be reset and every angle '
+                          'of the sweep is warm started')
+        # end if
+        return
+
     def solveAlphaComplex(self,angle):
         '''Compute the flow solution at and angle of attack angle'''
 
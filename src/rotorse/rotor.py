@@ -10,16 +10,17 @@ Copyright (c)  NREL. All rights reserved.
 import numpy as np
 import math
 from openmdao.main.api import VariableTree, Component, Assembly
-from openmdao.main.datatypes.api import Int, Float, Array, VarTree, Enum, Str, List
+from openmdao.main.datatypes.api import Int, Float, Array, VarTree, Enum, Str, List, Bool
 
-from rotoraero import SetupRunVarSpeed, RegulatedPowerCurve, AEP, VarSpeedMachine, \
+from rotoraero import SetupRunVarSpeed, RegulatedPowerCurve, AEP, AEPQuadrature, VarSpeedMachine, \
     RatedConditions, AeroLoads, RPM2RS, RS2RPM
-from rotoraerodefaults import CCBladeGeometry, CCBlade, CSMDrivetrain, RayleighCDF, WeibullWithMeanCDF, AirfoilParameterization
-from openmdao.lib.drivers.api import Brent
+from rotoraerodefaults import CCBladeGeometry, CCBlade, CCBladeBatch, CSMDrivetrain, RayleighCDF, WeibullWithMeanCDF, \
+    EmpiricalCDF, AirfoilParameterization
 from commonse.csystem import DirectionVector
 from commonse.utilities import hstack, vstack, trapz_deriv, interp_with_deriv
 from commonse.environment import PowerWind
-from precomp import Profile, Orthotropic2DMaterial, CompositeSection, _precomp
+from utilities import WorkerPool, hash_arrays
+from precomp import Profile, Orthotropic2DMaterial, CompositeSection, PackedLayup, panelBucklingStrain, _precomp
 from akima import Akima, akima_interp_with_derivs
 import _pBEAM
 import _curvefem
@@ -158,6 +159,8 @@ class ResizeCompositeSection(Component):
     chord_str = Array(iotype='in', units='m', desc='structural chord distribution')
     sparT_str = Array(iotype='in', units='m', desc='structural spar cap thickness distribution')
     teT_str = Array(iotype='in', units='m', desc='structural trailing-edge panel thickness distribution')
+    packed = Bool(False, iotype='in', desc='resize the layups in one vectorized step, with the inputs packed once into PackedLayup objects (outputs are views into PackedLayup objects)')
+    lazy_scale = Bool(False, iotype='in', desc='with packed, leave the input thicknesses untouched and output per-sector scale factors that are applied when the layups are used')
 
     # out
     upperCSOut = List(CompositeSection, iotype='out',
@@ -168,8 +171,69 @@ class ResizeCompositeSection(Component):
         desc='list of CompositeSection objections defining the properties for shear webs')
 
 
+    def __init__(self):
+        super(ResizeCompositeSection, self).__init__()
+        self._layups = None  # packed upperCSIn, lowerCSIn, websCSIn (None until needed)
+
+
+    def _upperCSIn_changed(self):
+        self._layups = None
+
+    _lowerCSIn_changed = _websCSIn_changed = _upperCSIn_changed
+    _upperCSIn_items_changed = _lowerCSIn_items_changed = _websCSIn_items_changed = _upperCSIn_changed
+
+
+    def packedInputs(self):
+        """input layups packed into PackedLayup objects.  They are packed once and
+        repacked only after upperCSIn, lowerCSIn, or websCSIn is set again
+        (edits made in place to the input sections are not seen)."""
+
+        if self._layups is None:
+            self._layups = (PackedLayup.fromSections(self.upperCSIn), PackedLayup.fromSections(self.lowerCSIn),
+                            PackedLayup.fromSections(self.websCSIn))
+
+        return self._layups
+
+
+    def sectorScale(self, upper, lower):
+        """thickness scale factor of every sector of the upper and lower layups"""
+
+        factor = self.chord_str/self.chord_str_ref  # same as thickness ratio for constant t/c
+
+        scaleU = factor[upper.sector_station]
+        scaleL = factor[lower.sector_station]
+
+        # change spar and trailing edge thickness to specified values
+        # upper and lower have same thickness for this design
+        tsector = np.bincount(upper.ply_sector, weights=upper.t, minlength=len(upper.n_lamina))
+        for idx, tnew in [(self.sector_idx_strain_spar, self.sparT_str), (self.sector_idx_strain_te, self.teT_str)]:
+            secU = upper.station_ptr[:-1] + idx
+            secL = lower.station_ptr[:-1] + idx
+            ratio = tnew/tsector[secU]
+            scaleU[secU] = ratio
+            scaleL[secL] = ratio
+
+        return scaleU, scaleL, factor
+
+
     def execute(self):
 
+        if self.packed:
+            upper, lower, webs = self.packedInputs()
+            scaleU, scaleL, factor = self.sectorScale(upper, lower)
+            scaleW = factor[webs.sector_station]
+
+            if self.lazy_scale:
+                self.upperCSOut = upper.withScale(scaleU).sections()
+                self.lowerCSOut = lower.withScale(scaleL).sections()
+                self.websCSOut = webs.withScale(scaleW).sections()
+                return
+
+            self.upperCSOut = upper.withThickness(upper.t*scaleU[upper.ply_sector]).sections()
+            self.lowerCSOut = lower.withThickness(lower.t*scaleL[lower.ply_sector]).sections()
+            self.websCSOut = webs.withThickness(webs.t*scaleW[webs.ply_sector]).sections()
+            return
+
         nstr = len(self.chord_str_ref)
 
         # copy data acrosss
@@ -221,6 +285,56 @@ class ResizeCompositeSection(Component):
             lower.t[idx_te] *= self.teT_str[i]/tte
 
 
+def _precomp_section(args):
+    """PreComp properties of one station (module level so it can run in a worker process)"""
+
+    chord, theta, th_prime, leLoc, (xnode, ynode), mat, secU, secL, secW = args
+    E1, E2, G12, nu12, rho = mat
+    locU, n_laminaU, n_pliesU, tU, thetaU, mat_idxU = secU
+    locL, n_laminaL, n_pliesL, tL, thetaL, mat_idxL = secL
+    locW, n_laminaW, n_pliesW, tW, thetaW, mat_idxW = secW
+
+    nwebs = len(locW)
+
+    # address a bug in f2py (need to pass in length 1 arrays even though they are not used)
+    if nwebs == 0:
+        locW = [0]
+        n_laminaW = [0]
+        n_pliesW = [0]
+        tW = [0]
+        thetaW = [0]
+        mat_idxW = [0]
+
+    return _precomp.properties(chord, theta, th_prime, leLoc,
+        xnode, ynode, E1, E2, G12, nu12, rho,
+        locU, n_laminaU, n_pliesU, tU, thetaU, mat_idxU,
+        locL, n_laminaL, n_pliesL, tL, thetaL, mat_idxL,
+        nwebs, locW, n_laminaW, n_pliesW, tW, thetaW, mat_idxW)
+
+
+
+def _station_key(args):
+    """fingerprint of all inputs to _precomp_section for one station"""
+
+    chord, theta, th_prime, leLoc, node, mat, secU, secL, secW = args
+
+    return hash_arrays(np.array([chord, theta, th_prime, leLoc]), *(list(node) + list(mat) + list(secU) + list(secL) + list(secW)))
+
+
+
+def _preCompFormatter(sections):
+    """function giving the PreComp layup data of station i, read straight from the
+    PackedLayup when the sections are views of one (station i is sections[i])"""
+
+    layup = sections[0].layup if len(sections) > 0 else None
+    if layup is not None and len(layup) == len(sections) and \
+            all(cs.layup is layup and cs.station == i for i, cs in enumerate(sections)):
+        return layup._preCompFormat
+
+    return lambda i: sections[i]._preCompFormat()
+
+
+
 class PreCompSections(BeamPropertiesBase):
 
     r = Array(iotype='in', units='m', desc='radial positions. r[0] should be the hub location \
@@ -245,10 +359,14 @@ class PreCompSections(BeamPropertiesBase):
 
     sector_idx_strain_spar = Array(iotype='in', dtype=np.int, desc='index of sector for spar (PreComp definition of sector)')
     sector_idx_strain_te = Array(iotype='in', dtype=np.int, desc='index of sector for trailing-edge (PreComp definition of sector)')
+    nprocs = Int(1, iotype='in', desc='number of worker processes used to run PreComp across stations')
+    reuse_stations = Bool(True, iotype='in', desc='only re-solve stations whose inputs changed since a previous run')
 
 
     eps_crit_spar = Array(iotype='out', desc='critical strain in spar from panel buckling calculation')
     eps_crit_te = Array(iotype='out', desc='critical strain in trailing-edge panels from panel buckling calculation')
+    Eaxial_spar = Array(iotype='out', units='N/m**2', desc='effective axial modulus of elasticity of spar cap laminate on upper surface')
+    Eaxial_te = Array(iotype='out', units='N/m**2', desc='effective axial modulus of elasticity of trailing-edge panel laminate on upper surface')
 
     xu_strain_spar = Array(iotype='out', desc='x-position of midpoint of spar cap on upper surface for strain calculation')
     xl_strain_spar = Array(iotype='out', desc='x-position of midpoint of spar cap on lower surface for strain calculation')
@@ -260,6 +378,12 @@ class PreCompSections(BeamPropertiesBase):
     yl_strain_te = Array(iotype='out', desc='y-position of midpoint of trailing-edge panel on lower surface for strain calculation')
 
 
+    def __init__(self):
+        super(PreCompSections, self).__init__()
+        self._station_cache = {}  # station fingerprint -> PreComp results
+        self._pool = WorkerPool()  # PreComp worker processes, kept between runs
+
+
     def criticalStrainLocations(self, sector_idx_strain, x_ec_nose, y_ec_nose):
 
         n = len(sector_idx_strain)
@@ -304,35 +428,10 @@ class PreCompSections(BeamPropertiesBase):
 
         """
 
-        # rename
-        chord = self.chord
-        CS_list = self.upperCS  # TODO: assumes the upper surface is the compression one
-
-        # initialize
-        nsec = len(chord)
-        eps_crit = np.zeros(nsec)
-
-        for i in range(nsec):
-
-            cs = CS_list[i]
-            sector_idx = sector_idx_strain[i]
-
-            # chord-wise length of sector
-            sector_length = chord[i] * (cs.loc[sector_idx+1] - cs.loc[sector_idx])
-
-            # get matrices
-            A, B, D, totalHeight = cs.compositeMatrices(sector_idx)
-            E = cs.effectiveEAxial(sector_idx)
-            D1 = D[0, 0]
-            D2 = D[1, 1]
-            D3 = D[0, 1] + 2*D[2, 2]
+        # TODO: assumes the upper surface is the compression one
+        eps_crit, Eaxial = panelBucklingStrain(self.upperCS, sector_idx_strain, self.chord)
 
-            # use empirical formula
-            Nxx = 2 * (math.pi/sector_length)**2 * (math.sqrt(D1*D2) + D3)
-
-            eps_crit[i] = - Nxx / totalHeight / E
-
-        return eps_crit
+        return eps_crit, Eaxial
 
 
 
@@ -388,32 +487,33 @@ class PreCompSections(BeamPropertiesBase):
             rho[i] = mat[i].rho
 
 
-        for i in range(nsec):
-
-            xnode, ynode = profile[i]._preCompFormat()
-            locU, n_laminaU, n_pliesU, tU, thetaU, mat_idxU = csU[i]._preCompFormat()
-            locL, n_laminaL, n_pliesL, tL, thetaL, mat_idxL = csL[i]._preCompFormat()
-            locW, n_laminaW, n_pliesW, tW, thetaW, mat_idxW = csW[i]._preCompFormat()
+        # stations are independent, so they can be solved in parallel
+        fmtU = _preCompFormatter(csU)
+        fmtL = _preCompFormatter(csL)
+        fmtW = _preCompFormatter(csW)
+        args = [(self.chord[i], self.theta[i], th_prime[i], self.leLoc[i], profile[i]._preCompFormat(),
+                 (E1, E2, G12, nu12, rho), fmtU(i), fmtL(i), fmtW(i)) for i in range(nsec)]
 
-            nwebs = len(locW)
+        # only solve stations whose inputs are not already in the cache
+        if self.reuse_stations:
+            keys = [_station_key(a) for a in args]
+        else:
+            keys = range(nsec)
+            self._station_cache = {}
+        todo = [i for i in range(nsec) if keys[i] not in self._station_cache]
 
-            # address a bug in f2py (need to pass in length 1 arrays even though they are not used)
-            if nwebs == 0:
-                locW = [0]
-                n_laminaW = [0]
-                n_pliesW = [0]
-                tW = [0]
-                thetaW = [0]
-                mat_idxW = [0]
+        if len(self._station_cache) + len(todo) > 10*nsec:
+            self._station_cache = {}  # keep memory bounded during long optimizations
+            todo = range(nsec)
 
+        solved = self._pool.map(_precomp_section, [args[i] for i in todo], self.nprocs)
+        for i, results in zip(todo, solved):
+            self._station_cache[keys[i]] = results
+        section_results = [self._station_cache[key] for key in keys]
 
-            results = _precomp.properties(self.chord[i], self.theta[i],
-                th_prime[i], self.leLoc[i],
-                xnode, ynode, E1, E2, G12, nu12, rho,
-                locU, n_laminaU, n_pliesU, tU, thetaU, mat_idxU,
-                locL, n_laminaL, n_pliesL, tL, thetaL, mat_idxL,
-                nwebs, locW, n_laminaW, n_pliesW, tW, thetaW, mat_idxW)
+        for i in range(nsec):
 
+            results = section_results[i]
 
             self.properties.EIxx[i] = results[1]  # EIedge
             self.properties.EIyy[i] = results[0]  # EIflat
@@ -428,8 +528,8 @@ class PreCompSections(BeamPropertiesBase):
             x_ec_nose[i] = results[13] + self.leLoc[i]*self.chord[i]
             y_ec_nose[i] = results[12]  # switch b.c of coordinate system used
 
-        self.eps_crit_spar = self.panelBucklingStrain(self.sector_idx_strain_spar)
-        self.eps_crit_te = self.panelBucklingStrain(self.sector_idx_strain_te)
+        self.eps_crit_spar, self.Eaxial_spar = self.panelBucklingStrain(self.sector_idx_strain_spar)
+        self.eps_crit_te, self.Eaxial_te = self.panelBucklingStrain(self.sector_idx_strain_te)
 
         self.xu_strain_spar, self.xl_strain_spar, self.yu_strain_spar, \
             self.yl_strain_spar = self.criticalStrainLocations(self.sector_idx_strain_spar, x_ec_nose, y_ec_nose)
@@ -734,7 +834,7 @@ class GeometrySpline(Component):
     idx_cylinder_str = Int(iotype='in', desc='first idx in r_str_unit of non-cylindrical section')
     hubFraction = Float(iotype='in', desc='hub location as fraction of radius')
     airfoil_parameterization_type = Enum('Coordinates', ('Coordinates', 'NACA', 'CST'), iotype='in', desc='airfoil parameterization type')
-    airfoil_analysis_tool = Enum('Files', ('Files', 'XFOIL'), iotype='in', desc='type of airfoil analysis tool, either using XFOIL or files')
+    airfoil_analysis_tool = Enum('Files', ('Files', 'XFOIL', 'Database', 'Surrogate'), iotype='in', desc='type of airfoil analysis tool, either using XFOIL, files, interpolation in a precomputed polar database, or a trained surrogate of XFOIL')
 
 
     # out
@@ -2010,7 +2110,21 @@ class RotorSE(Assembly):
     Pitch = Float(iotype='out', units='rad', desc='pitch angle at rated')
 
     # airfoil analysis
-    airfoil_analysis_tool = Enum('Files', ('Files', 'XFOIL'), iotype='in', desc='type of airfoil analysis tool, either using XFOIL or files')
+    airfoil_analysis_tool = Enum('Files', ('Files', 'XFOIL', 'Database', 'Surrogate'), iotype='in', desc='type of airfoil analysis tool, either using XFOIL, files, interpolation in a precomputed polar database, or a trained surrogate of XFOIL')
+    polar_cache_dir = Str('', iotype='in', desc='directory of the on-disk cache for XFOIL generated polars (no caching if empty)')
+    airfoil_sidecars = Bool(False, iotype='in', desc='store the parsed AeroDyn files in binary .npz files next to them and read those in later runs (Files analysis tool)')
+    airfoil_database = Str('', iotype='in', desc='polar database file (see polardatabase.build_polar_database), used by the Database analysis tool')
+    airfoil_surrogate = Str('', iotype='in', desc='trained surrogate file (see airfoilsurrogate.train_surrogate), used by the Surrogate analysis tool')
+    nprocs = Int(1, iotype='in', desc='number of worker processes used for parallel analyses')
+    alpha_sampling = Enum('uniform', ('uniform', 'adaptive'), iotype='in', desc='angles of attack analyzed with XFOIL, either a uniform grid or adaptively refined where the polar is nonlinear')
+    reynolds_mode = Enum('fixed', ('fixed', 'local'), iotype='in', desc='fixed: one XFOIL polar at Re=1e6 for every station, local: polars at multiples of the local Reynolds number at rated conditions')
+    Re_factors = Array(np.array([0.5, 1.0, 2.0]), iotype='in', desc='multiples of the local Reynolds number analyzed at each station (local reynolds_mode only)')
+    reynolds_digits = Int(2, iotype='in', desc='significant digits the local Reynolds and Mach numbers are rounded to so small design changes reuse the same polars (0: no rounding, e.g., for finite difference gradients)')
+    speed_of_sound = Float(340.3, iotype='in', units='m/s', desc='speed of sound in air (local reynolds_mode only)')
+    lazy_derivatives = Bool(False, iotype='in', desc='skip CCBlade derivatives unless gradients are requested (faster for runs without gradients)')
+    bem_method = Enum('ccblade', ('ccblade', 'vectorized'), iotype='in', desc='vectorized: solve all operating points of the coarse power curve at once')
+    power_curve_sampling = Enum('uniform', ('uniform', 'adaptive'), iotype='in', desc='adaptive: place most coarse power curve points below an estimate of rated speed')
+    sparse_jacobian = Bool(False, iotype='in', desc='power curve and AEP components provide sparse (CSR) Jacobians rather than dense arrays')
 
     # airfoil parameterization
     airfoil_parameterization_type = Enum('Coordinates', ('Coordinates', 'NACA', 'CST'), iotype='in', desc='type of airfoil parameterization, either NACA, CST (Class-Shape-Transformation), or thickness-to-chord-ratio')
@@ -2023,6 +2137,14 @@ class RotorSE(Assembly):
     presweepTip = Float(0.0, iotype='out', units='m', desc='tip location in y_b')  # TODO: connect later
 
 
+    def __init__(self, aep_method='trapz', cdf_type='rayleigh'):
+        self.aep_method = aep_method  # 'trapz' on the regulated power curve or 'quadrature' on the spline
+        self.cdf_type = cdf_type  # 'rayleigh' from the turbine class or 'empirical' from measured site data
+        if aep_method == 'quadrature' and cdf_type != 'rayleigh':
+            raise ValueError('quadrature AEP integration requires a Rayleigh wind speed distribution')
+        super(RotorSE, self).__init__()
+
+
     def configure(self):
 
         self.add('turbineclass', TurbineClass())
@@ -2037,17 +2159,24 @@ class RotorSE(Assembly):
         self.add('analysis', CCBlade())
         self.add('dt', CSMDrivetrain())
         self.add('powercurve', RegulatedPowerCurve())
-        self.add('brent', Brent())
         self.add('wind', PowerWind())
-        # self.add('cdf', WeibullWithMeanCDF())
-        self.add('cdf', RayleighCDF())
-        self.add('aep', AEP())
-
-
-        self.brent.workflow.add(['powercurve'])
+        if self.aep_method == 'quadrature':
+            self.add('aep', AEPQuadrature())
+            aep_workflow = ['aep']
+        else:
+            if self.cdf_type == 'empirical':
+                self.add('wind_file', Str(iotype='in', desc='measured hub-height wind speeds: time series (.npy is memory-mapped, otherwise text) or histogram (text: bin center, frequency)'))
+                self.add('wind_file_type', Enum('timeseries', ('timeseries', 'histogram'), iotype='in', desc='contents of wind_file'))
+                self.add('wind_cache_dir', Str('', iotype='in', desc='directory of the on-disk cache of binned time series'))
+                self.add('cdf', EmpiricalCDF())
+            else:
+                # self.add('cdf', WeibullWithMeanCDF())
+                self.add('cdf', RayleighCDF())
+            self.add('aep', AEP())
+            aep_workflow = ['cdf', 'aep']
 
         self.driver.workflow.add(['turbineclass', 'gridsetup', 'grid', 'spline0', 'spline',
-            'geom', 'setup', 'airfoil_param', 'analysis', 'dt', 'brent', 'wind', 'cdf', 'aep'])
+            'geom', 'setup', 'airfoil_param', 'analysis', 'dt', 'powercurve', 'wind'] + aep_workflow)
 
         # connections to turbineclass
         self.connect('turbine_class', 'turbineclass.turbine_class')
@@ -2111,6 +2240,7 @@ class RotorSE(Assembly):
         # connections to setup
         self.connect('control', 'setup.control')
         self.connect('geom.R', 'setup.R')
+        self.connect('power_curve_sampling', 'setup.sampling')
         self.connect('npts_coarse_power_curve', 'setup.npts')
 
         # connections to airfoil_param
@@ -2119,6 +2249,23 @@ class RotorSE(Assembly):
         self.connect('spline.airfoil_parameters_aero', 'airfoil_param.airfoil_parameters')
         self.connect('airfoil_locations', 'airfoil_param.airfoil_locations')
         self.connect('airfoil_files', 'airfoil_param.airfoil_files')
+        self.connect('polar_cache_dir', 'airfoil_param.polar_cache_dir')
+        self.connect('airfoil_sidecars', 'airfoil_param.airfoil_sidecars')
+        self.connect('airfoil_database', 'airfoil_param.airfoil_database')
+        self.connect('airfoil_surrogate', 'airfoil_param.airfoil_surrogate')
+        self.connect('nprocs', 'airfoil_param.nprocs')
+        self.connect('alpha_sampling', 'airfoil_param.alpha_sampling')
+        self.connect('reynolds_mode', 'airfoil_param.reynolds_mode')
+        self.connect('Re_factors', 'airfoil_param.Re_factors')
+        self.connect('reynolds_digits', 'airfoil_param.reynolds_digits')
+        self.connect('speed_of_sound', 'airfoil_param.speed_of_sound')
+        self.connect('spline.r_aero', 'airfoil_param.r')
+        self.connect('spline.chord_aero', 'airfoil_param.chord')
+        self.connect('spline.Rtip', 'airfoil_param.Rtip')
+        self.connect('rho', 'airfoil_param.rho')
+        self.connect('mu', 'airfoil_param.mu')
+        self.connect('control.tsr', 'airfoil_param.tsr')
+        self.connect('control.maxOmega', 'airfoil_param.maxOmega')
 
         # connections to analysis
         self.connect('spline.r_aero', 'analysis.r')
@@ -2143,6 +2290,8 @@ class RotorSE(Assembly):
         self.connect('mu', 'analysis.mu')
         self.connect('shearExp', 'analysis.shearExp')
         self.connect('nSector', 'analysis.nSector')
+        self.connect('lazy_derivatives', 'analysis.lazy_derivatives')
+        self.connect('bem_method', 'analysis.bem_method')
         self.connect('setup.Uhub', 'analysis.Uhub')
         self.connect('setup.Omega', 'analysis.Omega')
         self.connect('setup.pitch', 'analysis.pitch')
@@ -2163,13 +2312,7 @@ class RotorSE(Assembly):
         self.connect('analysis.T', 'powercurve.Tcoarse')
         self.connect('geom.R', 'powercurve.R')
         self.connect('npts_spline_power_curve', 'powercurve.npts')
-
-        # setup Brent method to find rated speed
-        self.connect('control.Vin', 'brent.lower_bound')
-        self.connect('control.Vout', 'brent.upper_bound')
-        self.brent.add_parameter('powercurve.Vrated', low=-1e-15, high=1e15)
-        self.brent.add_constraint('powercurve.residual = 0')
-        self.brent.invalid_bracket_return = 1.0
+        self.connect('sparse_jacobian', 'powercurve.sparse_jacobian')
 
         # connections to wind
         self.wind.z = np.zeros(1)
@@ -2180,15 +2323,35 @@ class RotorSE(Assembly):
         self.connect('hubHt', 'wind.z[0]')
         self.connect('shearExp', 'wind.shearExp')
 
-        # connections to cdf
-        self.connect('powercurve.V', 'cdf.x')
-        self.connect('wind.U[0]', 'cdf.xbar')
-        # self.connect('weibull_shape', 'cdf.k')
+        if self.aep_method == 'quadrature':
+
+            # connections to aep
+            self.connect('setup.Uhub', 'aep.Vcoarse')
+            self.connect('dt.power', 'aep.Pcoarse')
+            self.connect('powercurve.ratedConditions.V', 'aep.Vrated')
+            self.connect('control.Vin', 'aep.Vin')
+            self.connect('control.Vout', 'aep.Vout')
+            self.connect('control.ratedPower', 'aep.ratedPower')
+            self.connect('wind.U[0]', 'aep.xbar')
+            self.connect('AEP_loss_factor', 'aep.lossFactor')
+
+        else:
 
-        # connections to aep
-        self.connect('cdf.F', 'aep.CDF_V')
-        self.connect('powercurve.P', 'aep.P')
-        self.connect('AEP_loss_factor', 'aep.lossFactor')
+            # connections to cdf
+            self.connect('powercurve.V', 'cdf.x')
+            if self.cdf_type == 'empirical':
+                self.connect('wind_file', 'cdf.wind_file')
+                self.connect('wind_file_type', 'cdf.file_type')
+                self.connect('wind_cache_dir', 'cdf.cache_dir')
+            else:
+                self.connect('wind.U[0]', 'cdf.xbar')
+                # self.connect('weibull_shape', 'cdf.k')
+
+            # connections to aep
+            self.connect('cdf.F', 'aep.CDF_V')
+            self.connect('powercurve.P', 'aep.P')
+            self.connect('AEP_loss_factor', 'aep.lossFactor')
+            self.connect('sparse_jacobian', 'aep.sparse_jacobian')
 
         # connections to outputs
         self.connect('powercurve.V', 'V')
@@ -2204,10 +2367,12 @@ class RotorSE(Assembly):
         self.add('resize', ResizeCompositeSection())
         self.add('gust', GustETM())
         self.add('setuppc',  SetupPCModVarSpeed())
-        self.add('aero_rated', CCBlade())
-        self.add('aero_extrm', CCBlade())
-        self.add('aero_extrm_forces', CCBlade())
-        self.add('aero_defl_powercurve', CCBlade())
+        # loads: rated, extreme, power curve, and rated at azimuths 0, 120, 240
+        # power: extreme (pitch_extreme and feathered)
+        # the coarse power curve (analysis) is not part of this batch: its output
+        # determines the rated conditions these loads cases are run at, and it
+        # already evaluates all of its wind speeds in one call
+        self.add('aero_loads', CCBladeBatch(nloads=6, npower=2))
         self.add('beam', PreCompSections())
         self.add('loads_defl', TotalLoads())
         self.add('loads_pc_defl', TotalLoads())
@@ -2220,17 +2385,13 @@ class RotorSE(Assembly):
         self.add('mass', MassProperties())
         self.add('extreme', ExtremeLoads())
         self.add('blade_defl', BladeDeflection())
-        self.add('aero_0', CCBlade())
-        self.add('aero_120', CCBlade())
-        self.add('aero_240', CCBlade())
         self.add('root_moment_0', RootMoment())
         self.add('root_moment_120', RootMoment())
         self.add('root_moment_240', RootMoment())
 
-        self.driver.workflow.add(['curvature', 'resize', 'gust', 'setuppc', 'aero_rated', 'aero_extrm',
-            'aero_extrm_forces', 'aero_defl_powercurve', 'beam', 'loads_defl', 'loads_pc_defl',
-            'loads_strain', 'damage', 'struc', 'curvefem', 'tip', 'root_moment', 'mass', 'extreme',
-            'blade_defl', 'aero_0', 'aero_120', 'aero_240', 'root_moment_0', 'root_moment_120', 'root_moment_240'])
+        self.driver.workflow.add(['curvature', 'resize', 'gust', 'setuppc', 'aero_loads', 'beam',
+            'loads_defl', 'loads_pc_defl', 'loads_strain', 'damage', 'struc', 'curvefem', 'tip',
+            'root_moment', 'mass', 'extreme', 'blade_defl', 'root_moment_0', 'root_moment_120', 'root_moment_240'])
 
         # connections to curvature
         self.connect('spline.r_str', 'curvature.r')
@@ -2249,6 +2410,8 @@ class RotorSE(Assembly):
         self.connect('spline.chord_str', 'resize.chord_str')
         self.connect('spline.sparT_str', 'resize.sparT_str')
         self.connect('spline.teT_str', 'resize.teT_str')
+        self.resize.packed = True  # vectorized resize on packed layups
+        self.resize.lazy_scale = True  # no thickness copies, scale factors applied inside PreComp formatting
 
         # connections to gust
         self.connect('turbulence_class', 'gust.turbulence_class')
@@ -2261,131 +2424,51 @@ class RotorSE(Assembly):
         self.connect('geom.R', 'setuppc.R')
         self.connect('VfactorPC', 'setuppc.Vfactor')
 
-        # connections to aero_rated (for max deflection)
-        self.connect('spline.r_aero', 'aero_rated.r')
-        self.connect('spline.chord_aero', 'aero_rated.chord')
-        self.connect('spline.theta_aero', 'aero_rated.theta')
-        self.connect('spline.precurve_aero', 'aero_rated.precurve')
-        self.connect('spline.precurve_str[-1]', 'aero_rated.precurveTip')
-        self.connect('spline.Rhub', 'aero_rated.Rhub')
-        self.connect('spline.Rtip', 'aero_rated.Rtip')
-        # self.connect('airfoil_parameterization_type', 'aero_rated.airfoil_parameterization_type')
-        # self.connect('airfoil_analysis_tool', 'aero_rated.airfoil_analysis_tool')
-        # self.connect('spline.airfoil_parameters_aero', 'aero_rated.airfoil_parameters')
-        # self.connect('spline.airfoil_locations_aero', 'aero_rated.airfoil_locations')
-        self.connect('airfoil_param.af', 'aero_rated.af')
-        self.connect('hubHt', 'aero_rated.hubHt')
-        self.connect('precone', 'aero_rated.precone')
-        self.connect('tilt', 'aero_rated.tilt')
-        self.connect('yaw', 'aero_rated.yaw')
-        self.connect('airfoil_files', 'aero_rated.airfoil_files')
-        self.connect('coordinate_files', 'aero_rated.coordinate_files')
-        self.connect('nBlades', 'aero_rated.B')
-        self.connect('rho', 'aero_rated.rho')
-        self.connect('mu', 'aero_rated.mu')
-        self.connect('shearExp', 'aero_rated.shearExp')
-        self.connect('nSector', 'aero_rated.nSector')
-        # self.connect('powercurve.ratedConditions.V + 3*gust.sigma', 'aero_rated.V_load')  # OpenMDAO bug
-        self.connect('gust.V_gust', 'aero_rated.V_load')
-        self.connect('powercurve.ratedConditions.Omega', 'aero_rated.Omega_load')
-        self.connect('powercurve.ratedConditions.pitch', 'aero_rated.pitch_load')
-        self.aero_rated.azimuth_load = 180.0  # closest to tower
-        self.aero_rated.run_case = 'loads'
-
-        # connections to aero_extrm (for max strain)
-        self.connect('spline.r_aero', 'aero_extrm.r')
-        self.connect('spline.chord_aero', 'aero_extrm.chord')
-        self.connect('spline.theta_aero', 'aero_extrm.theta')
-        self.connect('spline.precurve_aero', 'aero_extrm.precurve')
-        self.connect('spline.precurve_str[-1]', 'aero_extrm.precurveTip')
-        self.connect('spline.Rhub', 'aero_extrm.Rhub')
-        self.connect('spline.Rtip', 'aero_extrm.Rtip')
-        # self.connect('airfoil_parameterization_type', 'aero_extrm.airfoil_parameterization_type')
-        # self.connect('airfoil_analysis_tool', 'aero_extrm.airfoil_analysis_tool')
-        # self.connect('spline.airfoil_parameters_aero', 'aero_extrm.airfoil_parameters')
-        # self.connect('spline.airfoil_locations_aero', 'aero_extrm.airfoil_locations')
-        self.connect('airfoil_param.af', 'aero_extrm.af')
-        self.connect('hubHt', 'aero_extrm.hubHt')
-        self.connect('precone', 'aero_extrm.precone')
-        self.connect('tilt', 'aero_extrm.tilt')
-        self.connect('yaw', 'aero_extrm.yaw')
-        self.connect('airfoil_files', 'aero_extrm.airfoil_files')
-        self.connect('coordinate_files', 'aero_extrm.coordinate_files')
-        self.connect('nBlades', 'aero_extrm.B')
-        self.connect('rho', 'aero_extrm.rho')
-        self.connect('mu', 'aero_extrm.mu')
-        self.connect('shearExp', 'aero_extrm.shearExp')
-        self.connect('nSector', 'aero_extrm.nSector')
-        self.connect('turbineclass.V_extreme', 'aero_extrm.V_load')
-        self.connect('pitch_extreme', 'aero_extrm.pitch_load')
-        self.connect('azimuth_extreme', 'aero_extrm.azimuth_load')
-        self.aero_extrm.Omega_load = 0.0  # parked case
-        self.aero_extrm.run_case = 'loads'
-
-        # connections to aero_extrm_forces (for tower thrust)
-        self.connect('spline.r_aero', 'aero_extrm_forces.r')
-        self.connect('spline.chord_aero', 'aero_extrm_forces.chord')
-        self.connect('spline.theta_aero', 'aero_extrm_forces.theta')
-        self.connect('spline.precurve_aero', 'aero_extrm_forces.precurve')
-        self.connect('spline.precurve_str[-1]', 'aero_extrm_forces.precurveTip')
-        self.connect('spline.Rhub', 'aero_extrm_forces.Rhub')
-        self.connect('spline.Rtip', 'aero_extrm_forces.Rtip')
-        # self.connect('airfoil_parameterization_type', 'aero_extrm_forces.airfoil_parameterization_type')
-        # self.connect('airfoil_analysis_tool', 'aero_extrm_forces.airfoil_analysis_tool')
-        # self.connect('spline.airfoil_parameters_aero', 'aero_extrm_forces.airfoil_parameters')
-        # self.connect('spline.airfoil_parameters_aero', 'aero_extrm_forces.airfoil_locations')
-        self.connect('airfoil_param.af', 'aero_extrm_forces.af')
-        self.connect('hubHt', 'aero_extrm_forces.hubHt')
-        self.connect('precone', 'aero_extrm_forces.precone')
-        self.connect('tilt', 'aero_extrm_forces.tilt')
-        self.connect('yaw', 'aero_extrm_forces.yaw')
-        self.connect('airfoil_files', 'aero_extrm_forces.airfoil_files')
-        self.connect('coordinate_files', 'aero_extrm_forces.coordinate_files')
-        self.connect('nBlades', 'aero_extrm_forces.B')
-        self.connect('rho', 'aero_extrm_forces.rho')
-        self.connect('mu', 'aero_extrm_forces.mu')
-        self.connect('shearExp', 'aero_extrm_forces.shearExp')
-        self.connect('nSector', 'aero_extrm_forces.nSector')
-        self.aero_extrm_forces.Uhub = np.zeros(2)
-        self.aero_extrm_forces.Omega = np.zeros(2)  # parked case
-        self.aero_extrm_forces.pitch = np.zeros(2)
-        self.connect('turbineclass.V_extreme', 'aero_extrm_forces.Uhub[0]')
-        self.connect('turbineclass.V_extreme', 'aero_extrm_forces.Uhub[1]')
-        self.connect('pitch_extreme', 'aero_extrm_forces.pitch[0]')
-        self.aero_extrm_forces.pitch[1] = 90  # feathered
-        self.aero_extrm_forces.run_case = 'power'
-        self.aero_extrm_forces.T = np.zeros(2)
-        self.aero_extrm_forces.Q = np.zeros(2)
-
-        # connections to aero_defl_powercurve (for gust reversal)
-        self.connect('spline.r_aero', 'aero_defl_powercurve.r')
-        self.connect('spline.chord_aero', 'aero_defl_powercurve.chord')
-        self.connect('spline.theta_aero', 'aero_defl_powercurve.theta')
-        self.connect('spline.precurve_aero', 'aero_defl_powercurve.precurve')
-        self.connect('spline.precurve_str[-1]', 'aero_defl_powercurve.precurveTip')
-        self.connect('spline.Rhub', 'aero_defl_powercurve.Rhub')
-        self.connect('spline.Rtip', 'aero_defl_powercurve.Rtip')
-        # self.connect('airfoil_parameterization_type', 'aero_defl_powercurve.airfoil_parameterization_type')
-        # self.connect('airfoil_analysis_tool', 'aero_defl_powercurve.airfoil_analysis_tool')
-        # self.connect('spline.airfoil_parameters_aero', 'aero_defl_powercurve.airfoil_parameters')
-        # self.connect('spline.airfoil_locations', 'aero_defl_powercurve.airfoil_locations')
-        self.connect('airfoil_param.af', 'aero_defl_powercurve.af')
-        self.connect('hubHt', 'aero_defl_powercurve.hubHt')
-        self.connect('precone', 'aero_defl_powercurve.precone')
-        self.connect('tilt', 'aero_defl_powercurve.tilt')
-        self.connect('yaw', 'aero_defl_powercurve.yaw')
-        self.connect('airfoil_files', 'aero_defl_powercurve.airfoil_files')
-        self.connect('coordinate_files', 'aero_defl_powercurve.coordinate_files')
-        self.connect('nBlades', 'aero_defl_powercurve.B')
-        self.connect('rho', 'aero_defl_powercurve.rho')
-        self.connect('mu', 'aero_defl_powercurve.mu')
-        self.connect('shearExp', 'aero_defl_powercurve.shearExp')
-        self.connect('nSector', 'aero_defl_powercurve.nSector')
-        self.connect('setuppc.Uhub', 'aero_defl_powercurve.V_load')
-        self.connect('setuppc.Omega', 'aero_defl_powercurve.Omega_load')
-        self.connect('setuppc.pitch', 'aero_defl_powercurve.pitch_load')
-        self.aero_defl_powercurve.azimuth_load = 0.0
-        self.aero_defl_powercurve.run_case = 'loads'
+        # connections to aero_loads
+        self.connect('spline.r_aero', 'aero_loads.r')
+        self.connect('spline.chord_aero', 'aero_loads.chord')
+        self.connect('spline.theta_aero', 'aero_loads.theta')
+        self.connect('spline.precurve_aero', 'aero_loads.precurve')
+        self.connect('spline.precurve_str[-1]', 'aero_loads.precurveTip')
+        self.connect('spline.Rhub', 'aero_loads.Rhub')
+        self.connect('spline.Rtip', 'aero_loads.Rtip')
+        self.connect('airfoil_param.af', 'aero_loads.af')
+        self.connect('hubHt', 'aero_loads.hubHt')
+        self.connect('precone', 'aero_loads.precone')
+        self.connect('tilt', 'aero_loads.tilt')
+        self.connect('yaw', 'aero_loads.yaw')
+        self.connect('nBlades', 'aero_loads.B')
+        self.connect('rho', 'aero_loads.rho')
+        self.connect('mu', 'aero_loads.mu')
+        self.connect('shearExp', 'aero_loads.shearExp')
+        self.connect('nSector', 'aero_loads.nSector')
+        self.connect('lazy_derivatives', 'aero_loads.lazy_derivatives')
+
+        # loads0: rated (for max deflection)
+        # self.connect('powercurve.ratedConditions.V + 3*gust.sigma', 'aero_loads.V_load[0]')  # OpenMDAO bug
+        self.connect('gust.V_gust', 'aero_loads.V_load[0]')
+        self.connect('powercurve.ratedConditions.Omega', 'aero_loads.Omega_load[0]')
+        self.connect('powercurve.ratedConditions.pitch', 'aero_loads.pitch_load[0]')
+        self.aero_loads.azimuth_load[0] = 180.0  # closest to tower
+
+        # loads1: extreme (for max strain)
+        self.connect('turbineclass.V_extreme', 'aero_loads.V_load[1]')
+        self.connect('pitch_extreme', 'aero_loads.pitch_load[1]')
+        self.connect('azimuth_extreme', 'aero_loads.azimuth_load[1]')
+        self.aero_loads.Omega_load[1] = 0.0  # parked case
+
+        # loads2: power curve (for gust reversal)
+        self.connect('setuppc.Uhub', 'aero_loads.V_load[2]')
+        self.connect('setuppc.Omega', 'aero_loads.Omega_load[2]')
+        self.connect('setuppc.pitch', 'aero_loads.pitch_load[2]')
+        self.aero_loads.azimuth_load[2] = 0.0
+
+        # power: extreme (for tower thrust)
+        self.connect('turbineclass.V_extreme', 'aero_loads.Uhub[0]')
+        self.connect('turbineclass.V_extreme', 'aero_loads.Uhub[1]')
+        self.connect('pitch_extreme', 'aero_loads.pitch[0]')
+        self.aero_loads.Omega[:] = 0.0  # parked case
+        self.aero_loads.pitch[1] = 90  # feathered
 
         # connections to beam
         self.connect('spline.r_str', 'beam.r')
@@ -2399,10 +2482,11 @@ class RotorSE(Assembly):
         self.connect('resize.websCSOut', 'beam.websCS')
         self.connect('sector_idx_strain_spar', 'beam.sector_idx_strain_spar')
         self.connect('sector_idx_strain_te', 'beam.sector_idx_strain_te')
+        self.connect('nprocs', 'beam.nprocs')
 
 
         # connections to loads_defl
-        self.connect('aero_rated.loads', 'loads_defl.aeroLoads')
+        self.connect('aero_loads.loads0', 'loads_defl.aeroLoads')
         self.connect('beam.properties.z', 'loads_defl.r')
         self.connect('spline.theta_str', 'loads_defl.theta')
         self.connect('tilt', 'loads_defl.tilt')
@@ -2412,7 +2496,7 @@ class RotorSE(Assembly):
         self.connect('g', 'loads_defl.g')
 
         # connections to loads_pc_defl
-        self.connect('aero_defl_powercurve.loads', 'loads_pc_defl.aeroLoads')
+        self.connect('aero_loads.loads2', 'loads_pc_defl.aeroLoads')
         self.connect('beam.properties.z', 'loads_pc_defl.r')
         self.connect('spline.theta_str', 'loads_pc_defl.theta')
         self.connect('tilt', 'loads_pc_defl.tilt')
@@ -2423,7 +2507,7 @@ class RotorSE(Assembly):
 
 
         # connections to loads_strain
-        self.connect('aero_extrm.loads', 'loads_strain.aeroLoads')
+        self.connect('aero_loads.loads1', 'loads_strain.aeroLoads')
         self.connect('beam.properties.z', 'loads_strain.r')
         self.connect('spline.theta_str', 'loads_strain.theta')
         self.connect('tilt', 'loads_strain.tilt')
@@ -2487,8 +2571,8 @@ class RotorSE(Assembly):
         self.connect('struc.dy_defl[-1]', 'tip.dy')
         self.connect('struc.dz_defl[-1]', 'tip.dz')
         self.connect('spline.theta_str[-1]', 'tip.theta')
-        self.connect('aero_rated.loads.pitch', 'tip.pitch')
-        self.connect('aero_rated.loads.azimuth', 'tip.azimuth')
+        self.connect('aero_loads.loads0.pitch', 'tip.pitch')
+        self.connect('aero_loads.loads0.azimuth', 'tip.azimuth')
         self.connect('tilt', 'tip.tilt')
         self.connect('curvature.totalCone[-1]', 'tip.totalConeTip')
         self.connect('dynamic_amplication_tip_deflection', 'tip.dynamicFactor')
@@ -2496,7 +2580,7 @@ class RotorSE(Assembly):
 
         # connections to root moment
         self.connect('spline.r_str', 'root_moment.r_str')
-        self.connect('aero_rated.loads', 'root_moment.aeroLoads')
+        self.connect('aero_loads.loads0', 'root_moment.aeroLoads')
         self.connect('curvature.totalCone', 'root_moment.totalCone')
         self.connect('curvature.x_az', 'root_moment.x_az')
         self.connect('curvature.y_az', 'root_moment.y_az')
@@ -2511,15 +2595,15 @@ class RotorSE(Assembly):
         self.connect('tilt', 'mass.tilt')
 
         # connectsion to extreme
-        self.connect('aero_extrm_forces.T', 'extreme.T')
-        self.connect('aero_extrm_forces.Q', 'extreme.Q')
+        self.connect('aero_loads.T', 'extreme.T')
+        self.connect('aero_loads.Q', 'extreme.Q')
         self.connect('nBlades', 'extreme.nBlades')
 
         # connections to blade_defl
         self.connect('struc.dx_pc_defl', 'blade_defl.dx')
         self.connect('struc.dy_pc_defl', 'blade_defl.dy')
         self.connect('struc.dz_pc_defl', 'blade_defl.dz')
-        self.connect('aero_defl_powercurve.loads.pitch', 'blade_defl.pitch')
+        self.connect('aero_loads.loads2.pitch', 'blade_defl.pitch')
         self.connect('spline0.theta_str', 'blade_defl.theta_str')
         self.connect('spline0.r_sub_precurve', 'blade_defl.r_sub_precurve0')
         self.connect('spline0.Rhub', 'blade_defl.Rhub0')
@@ -2557,46 +2641,16 @@ class RotorSE(Assembly):
 
         ### adding for the drivetrain root moment calculations:
         # TODO - number and value of azimuth angles should be arbitrary user inputs
-        # connections to aero_0 (for rated loads at 0 azimuth angle)
-        self.connect('spline.r_aero', ['aero_0.r','aero_120.r','aero_240.r'])
-        self.connect('spline.chord_aero', ['aero_0.chord', 'aero_120.chord', 'aero_240.chord'])
-        self.connect('spline.theta_aero', ['aero_0.theta', 'aero_120.theta', 'aero_240.theta'])
-        self.connect('spline.precurve_aero', ['aero_0.precurve', 'aero_120.precurve', 'aero_240.precurve'])
-        self.connect('spline.precurve_str[-1]', ['aero_0.precurveTip', 'aero_120.precurveTip', 'aero_240.precurveTip'])
-        self.connect('spline.Rhub', ['aero_0.Rhub', 'aero_120.Rhub', 'aero_240.Rhub'])
-        self.connect('spline.Rtip', ['aero_0.Rtip', 'aero_120.Rtip', 'aero_240.Rtip'])
-        self.connect('hubHt', ['aero_0.hubHt', 'aero_120.hubHt', 'aero_240.hubHt'])
-        self.connect('precone', ['aero_0.precone', 'aero_120.precone', 'aero_240.precone'])
-        self.connect('tilt', ['aero_0.tilt', 'aero_120.tilt', 'aero_240.tilt'])
-        self.connect('yaw', ['aero_0.yaw', 'aero_120.yaw', 'aero_240.yaw'])
-        self.connect('airfoil_files', ['aero_0.airfoil_files', 'aero_120.airfoil_files', 'aero_240.airfoil_files'])
-        self.connect('coordinate_files', ['aero_0.coordinate_files', 'aero_120.coordinate_files', 'aero_240.coordinate_files'])
-        # self.connect('airfoil_parameterization_type', ['aero_0.airfoil_parameterization_type', 'aero_120.airfoil_parameterization_type', 'aero_240.airfoil_parameterization_type'])
-        # self.connect('airfoil_analysis_tool', ['aero_0.airfoil_analysis_tool', 'aero_120.airfoil_analysis_tool', 'aero_240.airfoil_analysis_tool'])
-        # self.connect('spline.airfoil_parameters_aero', ['aero_0.airfoil_parameters', 'aero_120.airfoil_parameters', 'aero_240.airfoil_parameters'])
-        # self.connect('spline.airfoil_locations_aero', ['aero_0.airfoil_locations', 'aero_120.airfoil_locations', 'aero_240.airfoil_locations'])
-        self.connect('airfoil_param.af', ['aero_0.af', 'aero_120.af', 'aero_240.af'])
-        self.connect('nBlades', ['aero_0.B','aero_120.B', 'aero_240.B'])
-        self.connect('rho', ['aero_0.rho', 'aero_120.rho', 'aero_240.rho'])
-        self.connect('mu', ['aero_0.mu','aero_120.mu' ,'aero_240.mu'])
-        self.connect('shearExp', ['aero_0.shearExp','aero_120.shearExp','aero_240.shearExp'])
-        self.connect('nSector', ['aero_0.nSector','aero_120.nSector','aero_240.nSector'])
-        # self.connect('powercurve.ratedConditions.V + 3*gust.sigma', 'aero_0.V_load')  # OpenMDAO bug
-        self.connect('gust.V_gust', ['aero_0.V_load','aero_120.V_load','aero_240.V_load'])
-        self.connect('powercurve.ratedConditions.Omega', ['aero_0.Omega_load','aero_120.Omega_load','aero_240.Omega_load'])
-        self.aero_0.pitch_load = 89.0
-        self.aero_120.pitch_load = 89.0
-        self.aero_240.pitch_load = 89.0
-        self.aero_0.azimuth_load = 0.0
-        self.aero_120.azimuth_load = 120.0
-        self.aero_240.azimuth_load = 240.0
-        self.aero_0.run_case = 'loads'
-        self.aero_120.run_case = 'loads'
-        self.aero_240.run_case = 'loads'
+        # loads3-5: rated loads at 0, 120, 240 azimuth angles
+        # self.connect('powercurve.ratedConditions.V + 3*gust.sigma', 'aero_loads.V_load[3]')  # OpenMDAO bug
+        self.connect('gust.V_gust', ['aero_loads.V_load[3]', 'aero_loads.V_load[4]', 'aero_loads.V_load[5]'])
+        self.connect('powercurve.ratedConditions.Omega', ['aero_loads.Omega_load[3]', 'aero_loads.Omega_load[4]', 'aero_loads.Omega_load[5]'])
+        self.aero_loads.pitch_load[3:6] = 89.0
+        self.aero_loads.azimuth_load[3:6] = [0.0, 120.0, 240.0]
 
         # connections to root moment for drivetrain
         self.connect('spline.r_str', ['root_moment_0.r_str', 'root_moment_120.r_str', 'root_moment_240.r_str'])
-        self.connect('aero_rated.loads', ['root_moment_0.aeroLoads', 'root_moment_120.aeroLoads', 'root_moment_240.aeroLoads'])
+        self.connect('aero_loads.loads0', ['root_moment_0.aeroLoads', 'root_moment_120.aeroLoads', 'root_moment_240.aeroLoads'])
         self.connect('curvature.totalCone', ['root_moment_0.totalCone', 'root_moment_120.totalCone', 'root_moment_240.totalCone'])
         self.connect('curvature.x_az', ['root_moment_0.x_az','root_moment_120.x_az','root_moment_240.x_az'])
         self.connect('curvature.y_az', ['root_moment_0.y_az','root_moment_120.y_az','root_moment_240.y_az'])
@@ -2608,7 +2662,7 @@ class RotorSE(Assembly):
         self.connect('root_moment_120.Mxyz','Mxyz_120')
         self.connect('root_moment_240.Mxyz','Mxyz_240')
         self.connect('curvature.totalCone[-1]','TotalCone')
-        self.connect('aero_0.pitch_load','Pitch')
+        self.connect('aero_loads.loads3.pitch', 'Pitch')
         self.connect('root_moment_0.Fxyz', 'Fxyz_0')
         self.connect('root_moment_120.Fxyz', 'Fxyz_120')
         self.connect('root_moment_240.Fxyz', 'Fxyz_240')
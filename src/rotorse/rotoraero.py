@@ -9,9 +9,10 @@ Copyright (c) NREL. All rights reserved.
 
 import numpy as np
 from math import pi
-from openmdao.main.api import VariableTree, Component, Assembly, ImplicitComponent
-from openmdao.main.datatypes.api import Int, Float, Array, VarTree, Slot, Enum
-from openmdao.lib.drivers.api import Brent
+from scipy import sparse
+from scipy.special import gamma
+from openmdao.main.api import VariableTree, Component, Assembly
+from openmdao.main.datatypes.api import Int, Float, Array, VarTree, Slot, Enum, Bool
 
 from commonse.utilities import hstack, vstack, linspace_with_deriv, smooth_min, trapz_deriv
 from akima import Akima
@@ -22,6 +23,18 @@ RPM2RS = pi/30.0
 RS2RPM = 30.0/pi
 
 
+def sparse_zeros(m, n):
+    """an m x n block of zeros for assembling Jacobians with scipy.sparse.bmat"""
+
+    return sparse.csr_matrix((m, n))
+
+
+def sparse_block(x):
+    """a scalar, row (1D array), or 2D array as a block for scipy.sparse.bmat"""
+
+    return sparse.csr_matrix(np.atleast_2d(x))
+
+
 # ---------------------
 # Variable Trees
 # ---------------------
@@ -195,6 +208,7 @@ class Coefficients(Component):
     # inputs used in normalization
     R = Float(iotype='in', units='m', desc='rotor radius')
     rho = Float(iotype='in', units='kg/m**3', desc='density of fluid')
+    sparse_jacobian = Bool(False, iotype='in', desc='return the Jacobian as a scipy.sparse CSR matrix')
 
 
     # outputs
@@ -227,29 +241,28 @@ class Coefficients(Component):
         CT = self.CT
         CQ = self.CQ
         CP = self.CP
-        n = len(self.V)
         q = 0.5 * self.rho * V**2
         A = pi * R**2
-        zeronn = np.zeros((n, n))
+        diag = sparse.diags
 
-        dCT_dV = np.diag(-2.0*CT/V)
-        dCT_dT = np.diag(1.0/(q*A))
+        dCT_dV = diag(-2.0*CT/V)
+        dCT_dT = diag(1.0/(q*A))
         dCT_dR = -2.0*CT/R
-        dCT = hstack((dCT_dV, dCT_dT, zeronn, zeronn, dCT_dR))
 
-        dCQ_dV = np.diag(-2.0*CQ/V)
-        dCQ_dQ = np.diag(1.0/(q*R*A))
+        dCQ_dV = diag(-2.0*CQ/V)
+        dCQ_dQ = diag(1.0/(q*R*A))
         dCQ_dR = -3.0*CQ/R
-        dCQ = hstack((dCQ_dV, zeronn, dCQ_dQ, zeronn, dCQ_dR))
 
-        dCP_dV = np.diag(-3.0*CP/V)
-        dCP_dP = np.diag(1.0/(q*A*V))
+        dCP_dV = diag(-3.0*CP/V)
+        dCP_dP = diag(1.0/(q*A*V))
         dCP_dR = -2.0*CP/R
-        dCP = hstack((dCP_dV, zeronn, zeronn, dCP_dP, dCP_dR))
 
-        J = vstack((dCT, dCQ, dCP))
+        # columns: V, T, Q, P, R
+        J = sparse.bmat([[dCT_dV, dCT_dT, None, None, sparse_block(dCT_dR).T],
+                         [dCQ_dV, None, dCQ_dQ, None, sparse_block(dCQ_dR).T],
+                         [dCP_dV, None, None, dCP_dP, sparse_block(dCP_dR).T]], format='csr')
 
-        return J
+        return J if self.sparse_jacobian else J.toarray()
 
 
 
@@ -300,6 +313,9 @@ class SetupRunVarSpeed(Component):
     control = VarTree(VarSpeedMachine(), iotype='in', desc='control parameters')
     R = Float(iotype='in', units='m', desc='rotor radius')
     npts = Int(20, iotype='in', desc='number of points to evalute aero code to generate power curve')
+    sampling = Enum('uniform', ('uniform', 'adaptive'), iotype='in', desc='adaptive: place most points below an estimate of rated speed')
+    region2_span = Float(0.75, iotype='in', desc='the region 2 points end no further than this fraction of the way from cut-in to cut-out speed (adaptive sampling)')
+    region2_points = Float(0.75, iotype='in', desc='fraction of the points placed below the estimated rated speed (adaptive sampling)')
 
     # outputs
     Uhub = Array(iotype='out', units='m/s', desc='freestream velocities to run')
@@ -314,17 +330,41 @@ class SetupRunVarSpeed(Component):
         n = self.npts
         R = self.R
 
-        # # attempt to distribute points mostly before rated
-        # cpguess = 0.5
-        # Vr0 = (ctrl.ratedPower/(cpguess*0.5*rho*pi*R**2))**(1.0/3)
-        # Vr0 *= 1.20
+        if self.sampling == 'adaptive':
 
-        # V1 = np.linspace(Vin, Vr0, 15)
-        # V2 = np.linspace(Vr0, Vout, 6)
-        # V = np.concatenate([V1, V2[1:]])
+            if n < 3:
+                raise ValueError('adaptive sampling needs at least 3 points (npts = %d)' % n)
 
-        # velocity sweep
-        V = np.linspace(ctrl.Vin, ctrl.Vout, n)
+            # distribute points mostly before rated, using the speed where the rotor
+            # reaches maxOmega at the design tip-speed ratio as an estimate of rated speed
+            Vr0 = ctrl.maxOmega/RS2RPM*R/ctrl.tsr
+            dVr0_dtsr = -Vr0/ctrl.tsr
+            dVr0_dR = Vr0/R
+            dVr0_dmaxOmega = Vr0/ctrl.maxOmega
+
+            # slightly past the estimate (power still increases at maxOmega), but leave room for region 3
+            Vmax = ctrl.Vin + self.region2_span*(ctrl.Vout - ctrl.Vin)
+            Vr1, dVr1_dVr0, _ = smooth_min(1.2*Vr0, Vmax, pct_offset=0.01)
+            dVr1_dVr0 *= 1.2
+
+            # at least 2 points in region 2, and at least Vout in region 3
+            n2 = min(max(int(round(self.region2_points*n)), 2), n-1)
+            V2, _, dV2_dVr1 = linspace_with_deriv(ctrl.Vin, Vr1, n2)
+            V3, dV3_dVr1, _ = linspace_with_deriv(Vr1, ctrl.Vout, n-n2+1)
+            V = np.concatenate([V2, V3[1:]])  # remove duplicate point
+
+            dV_dVr1 = np.concatenate([dV2_dVr1, dV3_dVr1[1:]])
+            dV_dtsr = dV_dVr1*dVr1_dVr0*dVr0_dtsr
+            dV_dR = dV_dVr1*dVr1_dVr0*dVr0_dR
+            dV_dmaxOmega = dV_dVr1*dVr1_dVr0*dVr0_dmaxOmega
+
+        else:
+
+            # velocity sweep
+            V = np.linspace(ctrl.Vin, ctrl.Vout, n)
+            dV_dtsr = np.zeros(n)
+            dV_dR = np.zeros(n)
+            dV_dmaxOmega = np.zeros(n)
 
         # corresponding rotation speed
         Omega_d = ctrl.tsr*V/R*RS2RPM
@@ -336,9 +376,10 @@ class SetupRunVarSpeed(Component):
         self.pitch = ctrl.pitch*np.ones_like(V)
 
         # gradients
-        dV = np.zeros((n, 3))
-        dOmega_dtsr = dOmega_dOmegad * V/R*RS2RPM
-        dOmega_dR = dOmega_dOmegad * -ctrl.tsr*V/R**2*RS2RPM
+        dV = hstack([dV_dtsr, dV_dR, dV_dmaxOmega])
+        dOmega_dtsr = dOmega_dOmegad * (V + ctrl.tsr*dV_dtsr)/R*RS2RPM
+        dOmega_dR = dOmega_dOmegad * (ctrl.tsr*dV_dR/R - ctrl.tsr*V/R**2)*RS2RPM
+        dOmega_dmaxOmega = dOmega_dmaxOmega + dOmega_dOmegad * ctrl.tsr*dV_dmaxOmega/R*RS2RPM
         dOmega = hstack([dOmega_dtsr, dOmega_dR, dOmega_dmaxOmega])
         dpitch = np.zeros((n, 3))
         self.J = vstack([dV, dOmega, dpitch])
@@ -400,9 +441,9 @@ class UnregulatedPowerCurve(Component):
         return self.J
 
 
-class RegulatedPowerCurve(ImplicitComponent):
+class RegulatedPowerCurve(Component):
     """Fit a spline to the coarse sampled power curve (and thrust curve),
-    find rated speed through a residual convergence strategy,
+    find rated speed where the spline reaches rated power,
     then compute the regulated power curve and rated conditions"""
 
     # inputs
@@ -412,12 +453,7 @@ class RegulatedPowerCurve(ImplicitComponent):
     Tcoarse = Array(iotype='in', units='N', desc='unregulated thrust curve')
     R = Float(iotype='in', units='m', desc='rotor radius')
     npts = Int(200, iotype='in', desc='number of points for splined power curve')
-
-    # state
-    Vrated = Float(iotype='state', units='m/s', desc='rated wind speed')
-
-    # residual
-    residual = Float(iotype="residual")
+    sparse_jacobian = Bool(False, iotype='in', desc='return the Jacobian as a scipy.sparse CSR matrix')
 
     # outputs
     V = Array(iotype='out', units='m/s', desc='wind speeds')
@@ -426,21 +462,58 @@ class RegulatedPowerCurve(ImplicitComponent):
 
     missing_deriv_policy = 'assume_zero'
 
-    def __init__(self):
-        super(RegulatedPowerCurve, self).__init__()
-        self.eval_only = True  # allows an external solver to converge this, otherwise it will converge itself to mimic an explicit comp
 
+    def rated_speed(self, spline):
+        """wind speed where the power curve spline first crosses rated power from below
+        (cut-out speed if it never does, as the Brent solver used before returned
+        the upper end of its bracket when the bracket was invalid)"""
 
-    def evaluate(self):
+        ctrl = self.control
+        V = self.Vcoarse
+        P = self.Pcoarse
+
+        # each spline segment is a cubic Hermite polynomial in t = (V - V[i])/h
+        _, dPdV, _, _ = spline.interp(V)
+        h = np.diff(V)
+        y0 = P[:-1] - ctrl.ratedPower
+        y1 = P[1:] - ctrl.ratedPower
+        m0 = h*dPdV[:-1]
+        m1 = h*dPdV[1:]
+        coeff = np.array([2*y0 + m0 - 2*y1 + m1, -3*y0 - 2*m0 + 3*y1 - m1, m0, y0]).T
+
+        # first root in [0, 1] of any segment, crossing from below (the spline can
+        # reach rated power between knots that are both below it)
+        for i in range(len(h)):
+            t = np.roots(coeff[i])
+            t = np.real(t[np.abs(np.imag(t)) < 1e-8])
+            t = t[(t > -1e-8) & (t < 1 + 1e-8)]
+            t = t[np.polyval(np.polyder(coeff[i]), t) >= 0]
+            if len(t) > 0:
+                break
+        else:
+            return ctrl.Vout
+
+        Vrated = V[i] + h[i]*min(max(np.min(t), 0.0), 1.0)
+
+        # polish against the spline itself
+        for it in range(2):
+            Pr, dPr, _, _ = spline.interp(Vrated)
+            if dPr != 0:
+                Vrated = min(max(Vrated - (Pr - ctrl.ratedPower)/dPr, V[i]), V[i+1])
+
+        return Vrated
+
+
+    def execute(self):
 
         ctrl = self.control
         n = self.npts
-        Vrated = self.Vrated
 
-        # residual
         spline = Akima(self.Vcoarse, self.Pcoarse)
+        Vrated = self.rated_speed(spline)
+
+        # residual (zero at rated speed), for the derivatives of Vrated
         P, dres_dVrated, dres_dVcoarse, dres_dPcoarse = spline.interp(Vrated)
-        self.residual = P - ctrl.ratedPower
 
         # functional
 
@@ -479,33 +552,52 @@ class RegulatedPowerCurve(ImplicitComponent):
 
 
         # gradients
-        ncoarse = len(self.Vcoarse)
-
-        dres = np.concatenate([[0.0], dres_dVcoarse, dres_dPcoarse, np.zeros(ncoarse), np.array([dres_dVrated]), [0.0, 0.0]])
+        # blocks by output (rows) and by input (columns: tsr, Vcoarse, Pcoarse, Tcoarse, Vrated, R, maxOmega)
+        nc = len(self.Vcoarse)
+        n2 = len(V2)
+        n3 = len(V3)
+        Z = sparse_zeros
 
         dV_dVrated = np.concatenate([dV2_dVrated, dV3_dVrated])
-        dV = hstack([np.zeros((n, 1)), np.zeros((n, 3*ncoarse)), dV_dVrated, np.zeros((n, 2))])
-
-        dP_dVcoarse = vstack([dP2_dVcoarse, np.zeros((n/2, ncoarse))])
-        dP_dPcoarse = vstack([dP2_dPcoarse, np.zeros((n/2, ncoarse))])
-        dP_dVrated = np.concatenate([dP2_dV2*dV2_dVrated, np.zeros(n/2)])
-        dP = hstack([np.zeros((n, 1)), dP_dVcoarse, dP_dPcoarse, np.zeros((n, ncoarse)), dP_dVrated, np.zeros((n, 2))])
-
-        drV = np.concatenate([[0.0], np.zeros(3*ncoarse), [1.0, 0.0, 0.0]])
-        drOmega = np.concatenate([[dOmegaRated_dOmegad*Vrated/self.R*RS2RPM], np.zeros(3*ncoarse),
-            [dOmegaRated_dOmegad*ctrl.tsr/self.R*RS2RPM, -dOmegaRated_dOmegad*ctrl.tsr*Vrated/self.R**2*RS2RPM,
-            dOmegaRated_dmaxOmega]])
-        drpitch = np.zeros(3*ncoarse+4)
-        drT = np.concatenate([[0.0], dT_dVcoarse, np.zeros(ncoarse), dT_dTcoarse, [dT_dVrated, 0.0, 0.0]])
-        drQ = -ctrl.ratedPower / (self.ratedConditions.Omega**2 * RPM2RS) * drOmega
-
-        self.J = vstack([dres, dV, dP, drV, drOmega, drpitch, drT, drQ])
+        dP2_dVrated = dP2_dV2*dV2_dVrated
+
+        dOmega = [dOmegaRated_dOmegad*Vrated/self.R*RS2RPM, dOmegaRated_dOmegad*ctrl.tsr/self.R*RS2RPM,
+                  -dOmegaRated_dOmegad*ctrl.tsr*Vrated/self.R**2*RS2RPM, dOmegaRated_dmaxOmega]
+        dQ_dOmega = -ctrl.ratedPower / (self.ratedConditions.Omega**2 * RPM2RS)
+        dQ = [dQ_dOmega*d for d in dOmega]
+
+        B = sparse_block
+        col = lambda x: B(x).T
+
+        blocks = [
+            [Z(1, 1), B(dres_dVcoarse), B(dres_dPcoarse), Z(1, nc), B(dres_dVrated), Z(1, 1), Z(1, 1)],  # residual
+            [Z(n, 1), Z(n, nc), Z(n, nc), Z(n, nc), col(dV_dVrated), Z(n, 1), Z(n, 1)],  # V
+            [Z(n2, 1), B(dP2_dVcoarse), B(dP2_dPcoarse), Z(n2, nc), col(dP2_dVrated), Z(n2, 1), Z(n2, 1)],  # P (region 2)
+            [Z(n3, 1), Z(n3, nc), Z(n3, nc), Z(n3, nc), Z(n3, 1), Z(n3, 1), Z(n3, 1)],  # P (region 3)
+            [Z(1, 1), Z(1, nc), Z(1, nc), Z(1, nc), B(1.0), Z(1, 1), Z(1, 1)],  # ratedConditions.V
+            [B(dOmega[0]), Z(1, nc), Z(1, nc), Z(1, nc), B(dOmega[1]), B(dOmega[2]), B(dOmega[3])],  # ratedConditions.Omega
+            [Z(1, 1), Z(1, nc), Z(1, nc), Z(1, nc), Z(1, 1), Z(1, 1), Z(1, 1)],  # ratedConditions.pitch
+            [Z(1, 1), B(dT_dVcoarse), Z(1, nc), B(dT_dTcoarse), B(dT_dVrated), Z(1, 1), Z(1, 1)],  # ratedConditions.T
+            [B(dQ[0]), Z(1, nc), Z(1, nc), Z(1, nc), B(dQ[1]), B(dQ[2]), B(dQ[3])],  # ratedConditions.Q
+        ]
+        J = sparse.bmat(blocks, format='csr')
+
+        # total derivatives, with Vrated(x) defined implicitly by residual = 0
+        iV = 1 + 3*nc
+        others = np.delete(np.arange(3*nc+4), iV)
+        if dres_dVrated != 0 and ctrl.Vin < Vrated < ctrl.Vout:
+            dVrated_dx = -J[0, others].toarray()/dres_dVrated
+        else:
+            dVrated_dx = np.zeros((1, len(others)))
+        J = J[1:][:, others] + J[1:][:, iV]*sparse.csr_matrix(dVrated_dx)
+
+        self.J = J if self.sparse_jacobian else J.toarray()
 
 
     def list_deriv_vars(self):
 
-        inputs = ('control.tsr', 'Vcoarse', 'Pcoarse', 'Tcoarse', 'Vrated', 'R', 'control.maxOmega')
-        outputs = ('residual', 'V', 'P', 'ratedConditions.V', 'ratedConditions.Omega',
+        inputs = ('control.tsr', 'Vcoarse', 'Pcoarse', 'Tcoarse', 'R', 'control.maxOmega')
+        outputs = ('V', 'P', 'ratedConditions.V', 'ratedConditions.Omega',
             'ratedConditions.pitch', 'ratedConditions.T', 'ratedConditions.Q')
 
         return inputs, outputs
@@ -526,6 +618,7 @@ class AEP(Component):
     CDF_V = Array(iotype='in', desc='cumulative distribution function evaluated at each wind speed')
     P = Array(iotype='in', units='W', desc='power curve (power)')
     lossFactor = Float(iotype='in', desc='multiplicative factor for availability and other losses (soiling, array, etc.)')
+    sparse_jacobian = Bool(False, iotype='in', desc='return the Jacobian as a scipy.sparse CSR matrix')
 
     # outputs
     AEP = Float(iotype='out', units='kW*h', desc='annual energy production')
@@ -554,16 +647,220 @@ class AEP(Component):
 
         dAEP_dlossFactor = np.array([self.AEP/self.lossFactor])
 
-        n = len(self.P)
-        J = np.zeros((1, 2*n+1))
-        J[0, 0:n] = dAEP_dCDF
-        J[0, n:2*n] = dAEP_dP
-        J[0, 2*n] = dAEP_dlossFactor
+        J = np.concatenate([dAEP_dCDF, dAEP_dP, dAEP_dlossFactor])[np.newaxis, :]
 
-        return J
+        return sparse.csr_matrix(J) if self.sparse_jacobian else J
 
 
 
+def weibull(x, A, k):
+    """Weibull CDF and PDF with their derivatives
+
+    Returns
+    -------
+    F, f : ndarray
+        cumulative distribution and probability density at x
+    dF_dA, df_dx, df_dA : ndarray
+        derivatives (the derivative of F with respect to x is f)
+
+    """
+
+    u = (x/A)**k
+    e = np.exp(-u)
+    F = 1.0 - e
+    f = k/x*u*e
+    dF_dA = -e*k*u/A
+    df_dx = f*(k - 1.0 - k*u)/x
+    df_dA = -f*k*(1.0 - u)/A
+
+    return F, f, dF_dA, df_dx, df_dA
+
+
+
+class AEPQuadrature(Component):
+    """integrate the power curve spline against the wind speed distribution
+    with Gauss-Legendre quadrature on each spline segment, rather than with the
+    trapezoidal rule on the dense regulated power curve"""
+
+    # inputs
+    Vcoarse = Array(iotype='in', units='m/s', desc='wind speeds of the coarse power curve')
+    Pcoarse = Array(iotype='in', units='W', desc='unregulated power curve (but after drivetrain losses)')
+    Vrated = Float(iotype='in', units='m/s', desc='rated wind speed')
+    Vin = Float(iotype='in', units='m/s', desc='cut-in wind speed')
+    Vout = Float(iotype='in', units='m/s', desc='cut-out wind speed')
+    ratedPower = Float(iotype='in', units='W', desc='rated power')
+    lossFactor = Float(iotype='in', desc='multiplicative factor for availability and other losses (soiling, array, etc.)')
+    pdf_type = Enum('rayleigh', ('rayleigh', 'weibull'), iotype='in', desc='wind speed distribution')
+    xbar = Float(iotype='in', units='m/s', desc='mean wind speed')
+    k = Float(2.0, iotype='in', desc='shape factor of weibull distribution')
+    nquad = Int(4, iotype='in', desc='number of Gauss-Legendre points per spline segment')
+
+    # outputs
+    AEP = Float(iotype='out', units='kW*h', desc='annual energy production')
+
+
+    def execute(self):
+
+        V = self.Vcoarse
+        nc = len(V)
+        Vrated = min(max(self.Vrated, self.Vin), self.Vout)
+        k = 2.0 if self.pdf_type == 'rayleigh' else self.k
+        A = self.xbar / gamma(1.0 + 1.0/k)
+        dA_dxbar = A/self.xbar
+
+        # segments of region 2, each mapped to [-1, 1]
+        a = np.maximum(V[:-1], self.Vin)
+        b = np.minimum(V[1:], Vrated)
+        seg = np.nonzero(b > a)[0]
+        a = a[seg]
+        b = b[seg]
+        xi, w = np.polynomial.legendre.leggauss(self.nquad)
+        x = 0.5*(a + b)[:, np.newaxis] + 0.5*(b - a)[:, np.newaxis]*xi
+        h = 0.5*(b - a)[:, np.newaxis]*w
+
+        spline = Akima(V, self.Pcoarse)
+        P, dP_dx, dP_dVcoarse, dP_dPcoarse = spline.interp(x.flatten())
+        P = P.reshape(x.shape)
+        dP_dx = dP_dx.reshape(x.shape)
+        _, f, _, df_dx, df_dA = weibull(x, A, k)
+
+        # region 3 at constant rated power
+        Fr, fr, dFr_dA, _, _ = weibull(Vrated, A, k)
+        Fout, _, dFout_dA, _, _ = weibull(self.Vout, A, k)
+
+        factor = self.lossFactor/1e3*365.0*24.0
+        E = np.sum(h*P*f) + self.ratedPower*(Fout - Fr)
+        self.AEP = factor*E
+
+
+        # gradients
+        g = P*f
+        dg_dx = dP_dx*f + P*df_dx
+        dE_da = np.sum(0.5*w*(-g + (b - a)[:, np.newaxis]*dg_dx*(1 - xi)/2), axis=1)
+        dE_db = np.sum(0.5*w*(g + (b - a)[:, np.newaxis]*dg_dx*(1 + xi)/2), axis=1)
+
+        hf = (h*f).flatten()
+        dE_dVcoarse = np.dot(hf, dP_dVcoarse)
+        dE_dPcoarse = np.dot(hf, dP_dPcoarse)
+
+        # segment end points are either spline knots or the cut-in/rated speeds
+        dE_dVrated = -self.ratedPower*fr
+        for j, s in enumerate(seg):
+            if V[s] >= self.Vin:
+                dE_dVcoarse[s] += dE_da[j]
+            if V[s+1] <= Vrated:
+                dE_dVcoarse[s+1] += dE_db[j]
+            else:
+                dE_dVrated += dE_db[j]
+        if not (self.Vin < self.Vrated < self.Vout):
+            dE_dVrated = 0.0
+
+        dE_dxbar = (np.sum(h*P*df_dA) + self.ratedPower*(dFout_dA - dFr_dA))*dA_dxbar
+
+        dAEP_dlossFactor = E/1e3*365.0*24.0
+
+        self.J = np.concatenate([factor*dE_dVcoarse, factor*dE_dPcoarse,
+                                 factor*np.array([dE_dVrated, Fout - Fr, dE_dxbar]), [dAEP_dlossFactor]])[np.newaxis, :]
+
+
+    def list_deriv_vars(self):
+
+        inputs = ('Vcoarse', 'Pcoarse', 'Vrated', 'ratedPower', 'xbar', 'lossFactor')
+        outputs = ('AEP',)
+
+        return inputs, outputs
+
+
+    def provideJ(self):
+
+        return self.J
+
+
+
+class MultiSiteAEP(Component):
+    """annual energy production of one power curve at many sites, integrated
+    in a single vectorized pass like AEP"""
+
+    # inputs
+    V = Array(iotype='in', units='m/s', desc='power curve (wind speed)')
+    P = Array(iotype='in', units='W', desc='power curve (power)')
+    lossFactor = Float(iotype='in', desc='multiplicative factor for availability and other losses (soiling, array, etc.)')
+    distribution = Enum('weibull', ('weibull', 'histogram'), iotype='in', desc='form of the site wind speed distributions')
+    A = Array(iotype='in', units='m/s', desc='weibull scale factor of each site')
+    k = Array(iotype='in', desc='weibull shape factor of each site')
+    bin_edges = Array(iotype='in', units='m/s', desc='wind speed bin edges shared by all histograms')
+    frequency = Array(iotype='in', desc='histogram of each site (nsites x nbins), normalized internally')
+
+    # outputs
+    AEP = Array(iotype='out', units='kW*h', desc='annual energy production of each site')
+
+
+    def execute(self):
+
+        V = self.V
+        P = self.P
+        factor = self.lossFactor/1e3*365.0*24.0
+
+        if self.distribution == 'weibull':
+            A = self.A[:, np.newaxis]
+            k = self.k[:, np.newaxis]
+            F, f, dF_dA, _, _ = weibull(V, A, k)
+            dF_dk = (1.0 - F)*(V/A)**k*np.log(V/A)
+
+        else:
+            edges = self.bin_edges
+            freq = self.frequency / np.sum(self.frequency, axis=1)[:, np.newaxis]
+            cdf = np.concatenate([np.zeros((len(freq), 1)), np.cumsum(freq, axis=1)], axis=1)
+
+            # piecewise linear cdf (same bins at every site)
+            x = np.clip(V, edges[0], edges[-1])
+            i = np.clip(np.searchsorted(edges, x) - 1, 0, len(edges)-2)
+            t = (x - edges[i])/(edges[i+1] - edges[i])
+            F = (1 - t)*cdf[:, i] + t*cdf[:, i+1]
+            f = freq[:, i]/(edges[i+1] - edges[i])
+            f[:, (V <= edges[0]) | (V >= edges[-1])] = 0.0
+
+        # trapezoidal rule for every site
+        dF = np.diff(F, axis=1)
+        E = 0.5*np.dot(dF, P[:-1] + P[1:])
+        self.AEP = factor*E
+
+        # gradients (see trapz_deriv)
+        dE_dP = np.zeros_like(F)
+        dE_dP[:, :-1] += 0.5*dF
+        dE_dP[:, 1:] += 0.5*dF
+        Pavg = 0.5*(P[:-1] + P[1:])
+        dE_dF = np.zeros_like(F)
+        dE_dF[:, :-1] -= Pavg
+        dE_dF[:, 1:] += Pavg
+
+        self.dAEP_dV = factor*dE_dF*f
+        self.dAEP_dP = factor*dE_dP
+        self.dAEP_dlossFactor = E/1e3*365.0*24.0
+        if self.distribution == 'weibull':
+            self.dAEP_dA = factor*np.sum(dE_dF*dF_dA, axis=1)
+            self.dAEP_dk = factor*np.sum(dE_dF*dF_dk, axis=1)
+
+
+    def list_deriv_vars(self):
+
+        inputs = ('V', 'P', 'lossFactor')
+        if self.distribution == 'weibull':
+            inputs += ('A', 'k')
+        outputs = ('AEP',)
+
+        return inputs, outputs
+
+
+    def provideJ(self):
+
+        J = hstack([self.dAEP_dV, self.dAEP_dP, self.dAEP_dlossFactor])
+        if self.distribution == 'weibull':
+            J = hstack([J, np.diag(self.dAEP_dA), np.diag(self.dAEP_dk)])
+
+        return J
+
+
 # ---------------------
 # Assemblies
 # ---------------------
@@ -577,6 +874,7 @@ def common_io(assembly, varspeed, varpitch):
     assembly.add('npts_coarse_power_curve', Int(20, iotype='in', desc='number of points to evaluate aero analysis at'))
     assembly.add('npts_spline_power_curve', Int(200, iotype='in', desc='number of points to use in fitting spline to power curve'))
     assembly.add('AEP_loss_factor', Float(1.0, iotype='in', desc='availability and other losses (soiling, array, etc.)'))
+    assembly.add('sparse_jacobian', Bool(False, iotype='in', desc='power curve and AEP components provide sparse Jacobians'))
     if varspeed:
         assembly.add('control', VarTree(VarSpeedMachine(), iotype='in', desc='control parameters'))
     else:
@@ -616,18 +914,13 @@ def common_configure(assembly, varspeed, varpitch):
 
     if varspeed or varpitch:
         assembly.add('powercurve', RegulatedPowerCurve())
-        assembly.add('brent', Brent())
-        assembly.brent.workflow.add(['powercurve'])
     else:
         assembly.add('powercurve', UnregulatedPowerCurve())
 
     assembly.add('cdf', CDFBase())
     assembly.add('aep', AEP())
 
-    if regulated:
-        assembly.driver.workflow.add(['geom', 'setup', 'analysis', 'dt', 'brent', 'cdf', 'aep'])
-    else:
-        assembly.driver.workflow.add(['geom', 'setup', 'analysis', 'dt', 'powercurve', 'cdf', 'aep'])
+    assembly.driver.workflow.add(['geom', 'setup', 'analysis', 'dt', 'powercurve', 'cdf', 'aep'])
 
 
     # connections to setup
@@ -660,13 +953,7 @@ def common_configure(assembly, varspeed, varpitch):
 
     if regulated:
         assembly.connect('geom.R', 'powercurve.R')
-
-        # setup Brent method to find rated speed
-        assembly.connect('control.Vin', 'brent.lower_bound')
-        assembly.connect('control.Vout', 'brent.upper_bound')
-        assembly.brent.add_parameter('powercurve.Vrated', low=-1e-15, high=1e15)
-        assembly.brent.add_constraint('powercurve.residual = 0')
-        assembly.brent.invalid_bracket_return = 1.0
+        assembly.connect('sparse_jacobian', 'powercurve.sparse_jacobian')
 
 
     # connections to cdf
@@ -677,6 +964,7 @@ def common_configure(assembly, varspeed, varpitch):
     assembly.connect('cdf.F', 'aep.CDF_V')
     assembly.connect('powercurve.P', 'aep.P')
     assembly.connect('AEP_loss_factor', 'aep.lossFactor')
+    assembly.connect('sparse_jacobian', 'aep.sparse_jacobian')
 
 
     # connections to outputs
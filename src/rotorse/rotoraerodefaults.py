@@ -15,7 +15,7 @@ from openmdao.main.api import Component, Assembly
 from ccblade import CCAirfoil, CCBlade as CCBlade_PY
 from commonse.utilities import sind, cosd, smooth_abs, smooth_min, hstack, vstack, linspace_with_deriv
 from rotoraero import GeomtrySetupBase, AeroBase, DrivetrainLossesBase, CDFBase, \
-    VarSpeedMachine, FixedSpeedMachine, RatedConditions, common_configure
+    VarSpeedMachine, FixedSpeedMachine, RatedConditions, AeroLoads, common_configure
 from akima import Akima
 import pyXLIGHT
 from airfoilprep import Airfoil, Polar
@@ -23,6 +23,12 @@ import os, sys
 from naca_generator import naca4, naca5
 from math import cos, factorial
 import string
+import tempfile
+import warnings
+from polardatabase import PolarDatabase
+from airfoilsurrogate import KrigingSurrogate
+from vectorbem import VectorizedBEM
+from utilities import WorkerPool, parallel_map, hash_arrays
 
 # ---------------------
 # Map Design Variables to Discretization
@@ -174,27 +180,480 @@ class CCBladeGeometry(GeomtrySetupBase):
 
         return J
 
+
+# ---------------------
+# CST (Class-Shape-Transformation) Airfoils
+# ---------------------
+
+_cst_basis_cache = {}
+
+
+def _cst_basis(order, x, N1, N2):
+    """class function times Bernstein polynomials of the given order, evaluated at x.
+    Only depends on the order and the x distribution, so it is computed once and reused."""
+
+    x = np.asarray(x, dtype=float)
+    key = (order, N1, N2, x.tostring())
+    if key not in _cst_basis_cache:
+        j = np.arange(order+1)
+        K = np.array([factorial(order)/(factorial(k)*factorial(order-k)) for k in j], dtype=float)
+        C = x**N1*(1-x)**N2
+        _cst_basis_cache[key] = C[:, np.newaxis] * K * x[:, np.newaxis]**j * (1-x[:, np.newaxis])**(order-j)
+
+    return _cst_basis_cache[key]
+
+
+def cst_class_shape(w, x, N1, N2, dz):
+    """surface y-coordinates at x from CST weights w.
+    w can be a 1D array of weights or a 2D array with one row of weights per airfoil
+    (y then has one row per airfoil). Complex weights are supported (complex step)."""
+
+    w = np.asarray(w)
+    B = _cst_basis(w.shape[-1] - 1, x, N1, N2)
+
+    return np.dot(w, B.T) + np.asarray(x)*dz
+
+
+def cst_coordinates(wu, wl, N=120, N1=0.5, N2=1.0, dz=0.0):
+    """airfoil coordinates from upper and lower surface CST weights.
+
+    Parameters
+    ----------
+    wu, wl : array_like (nairfoils, nweights)
+        upper and lower surface weights (swapped if the lower surface is on top on average)
+
+    Returns
+    -------
+    x : ndarray (N,)
+        x-coordinates shared by all airfoils
+    y : ndarray (nairfoils, N)
+        y-coordinates of each airfoil
+
+    """
+
+    wu = np.atleast_2d(wu)
+    wl = np.atleast_2d(wl)
+    swap = (np.real(np.mean(wl, axis=1)) >= np.real(np.mean(wu, axis=1)))[:, np.newaxis]
+    wu, wl = np.where(swap, wl, wu), np.where(swap, wu, wl)
+
+    # cosine spacing, starting and ending at the trailing edge
+    zeta = 2*pi/N*np.arange(N)
+    zeta[-1] = 2*pi
+    x = 0.5*(np.cos(zeta)+1)
+
+    zerind = np.where(x == 0)[0]  # used to separate upper and lower surfaces
+    zerind = zerind[0] if len(zerind) > 0 else N/2
+
+    yl = cst_class_shape(wl, x[:zerind], N1, N2, -dz)
+    yu = cst_class_shape(wu, x[zerind:], N1, N2, dz)
+
+    y = np.concatenate([yl, yu], axis=1)[:, ::-1]
+
+    return x, y
+
+
+# ---------------------
+# Airfoil Polar Generation
+# ---------------------
+
+# bump whenever the way polars are generated changes so stale cache entries are ignored
+_POLAR_CACHE_VERSION = 2
+
+# 3-D rotational correction (r/R, c/r, tsr) and maximum drag coefficient
+# used to extrapolate generated polars
+_CORRECTION_SETTINGS = (0.5, 0.15, 7.55, 1.5)
+
+# polar databases and surrogates already loaded, keyed by (class, path, modification time)
+_loaded_models = {}
+
+
+def adaptive_alpha_sweep(airfoil, alpha_min, alpha_max, min_spacing, n_coarse=11, cl_tol=0.01, cd_tol=0.05,
+                         max_passes=8):
+    """sample a polar adaptively with an xfoilAnalysis object.
+
+    Starts from n_coarse evenly spaced angles and bisects the intervals next to
+    any converged point whose solved value differs from the linear interpolation
+    between its neighbors by more than cl_tol (absolute) or cd_tol (relative to cd).
+    Only intervals at least 2*min_spacing wide are bisected, so no new interval is
+    narrower than min_spacing.  An interval whose midpoint was already attempted
+    (e.g., it failed to converge) is not split again, and refinement stops after
+    max_passes.
+
+    Returns
+    -------
+    alpha, cl, cd, cm, lexitflag : arrays sorted by angle of attack (deg)
+
+    """
+
+    alpha = np.linspace(alpha_min, alpha_max, n_coarse)
+    cl, cd, cm, lexitflag = airfoil.solveAlphaSweep(alpha)
+
+    for it in range(max_passes):
+
+        ok = np.logical_not(lexitflag)
+        a = alpha[ok]
+        if len(a) < 3:
+            break
+
+        # linear interpolation error at each interior point (proportional to the local curvature)
+        w = (a[1:-1] - a[:-2]) / (a[2:] - a[:-2])
+        err_cl = np.abs(cl[ok][1:-1] - ((1-w)*cl[ok][:-2] + w*cl[ok][2:]))
+        err_cd = np.abs(cd[ok][1:-1] - ((1-w)*cd[ok][:-2] + w*cd[ok][2:])) / cd[ok][1:-1]
+        refine = np.logical_or(err_cl > cl_tol, err_cd > cd_tol)
+
+        # split both intervals adjacent to each flagged point
+        mid = 0.5*(a[:-1] + a[1:])
+        split = np.zeros(len(a)-1, dtype=bool)
+        split[:-1] |= refine
+        split[1:] |= refine
+        split &= np.diff(a) >= 2*min_spacing
+        split &= np.logical_not(np.in1d(mid, alpha))  # midpoint already attempted
+
+        if not np.any(split):
+            break
+
+        new_alpha = mid[split]
+        new_cl, new_cd, new_cm, new_flag = airfoil.solveAlphaSweep(new_alpha)
+
+        alpha = np.concatenate([alpha, new_alpha])
+        cl = np.concatenate([cl, new_cl])
+        cd = np.concatenate([cd, new_cd])
+        cm = np.concatenate([cm, new_cm])
+        lexitflag = np.concatenate([lexitflag, new_flag])
+
+        idx = np.argsort(alpha)
+        alpha, cl, cd, cm, lexitflag = alpha[idx], cl[idx], cd[idx], cm[idx], lexitflag[idx]
+
+    return alpha, cl, cd, cm, lexitflag
+
+
+def xfoil_polar(x, y, Re, mach, iterations, alphas, sampling='uniform', fallback=True):
+    """run XFOIL over alphas at one Reynolds number and Mach number.
+    With sampling='adaptive' only the range and spacing of alphas are used, and angles
+    are added only where the polar is not well resolved (see adaptive_alpha_sweep).
+
+    If fewer than two angles converge, every angle in alphas is solved again
+    from a cold start (as in the original one-angle-at-a-time analysis) and
+    the angles that converge are kept.  A ValueError is raised if fewer than
+    two converge then too, or at once with fallback=False.
+
+    Returns
+    -------
+    Re, alpha, cl, cd, cm : converged points of the polar
+
+    """
+
+    airfoil = pyXLIGHT.xfoilAnalysis([x, y])
+    airfoil.re = Re
+    airfoil.mach = mach
+    airfoil.iter = iterations
+    if sampling == 'adaptive':
+        alpha, cl, cd, cm, lexitflag = adaptive_alpha_sweep(airfoil, alphas[0], alphas[-1],
+                                                            alphas[1] - alphas[0])
+    else:
+        alpha = np.asarray(alphas)
+        cl, cd, cm, lexitflag = airfoil.solveAlphaSweep(alpha)
+
+    # only keep converged points
+    converged = np.logical_not(lexitflag)
+    if np.count_nonzero(converged) >= 2:
+        return Re, alpha[converged], cl[converged], cd[converged], cm[converged]
+
+    if not fallback:
+        raise ValueError('XFOIL failed to converge at enough angles of attack to define a polar')
+
+    warnings.warn('XFOIL converged at %d angles of attack for Re = %g, solving each angle from a cold start'
+                  % (np.count_nonzero(converged), Re))
+
+    alpha = np.asarray(alphas, dtype=float)
+    cl = np.zeros(len(alpha))
+    cd = np.zeros(len(alpha))
+    cm = np.zeros(len(alpha))
+    lexitflag = np.zeros(len(alpha), dtype=bool)
+    for j in range(len(alpha)):
+        airfoil.resetBoundaryLayer()
+        cl[j], cd[j], cm[j], lexitflag[j] = airfoil.solveAlpha(alpha[j])
+
+    converged = np.logical_not(lexitflag)
+    if np.count_nonzero(converged) < 2:
+        raise ValueError('XFOIL failed to converge at enough angles of attack to define a polar, '
+                         'even from a cold start')
+
+    return Re, alpha[converged], cl[converged], cd[converged], cm[converged]
+
+
+def _xfoil_polar_job(args):
+    """unpack arguments for xfoil_polar (map only passes a single argument)"""
+
+    # pyXLIGHT keeps its state in module-level Fortran common blocks, so each
+    # worker process must have its own copy of the extension (never threads)
+    return xfoil_polar(*args)
+
+
+def corrected_data_grid(polars, r_over_R, chord_over_r, tsr, cd_max):
+    """apply 3-D rotational corrections to polars (as returned by xfoil_polar) and extrapolate to +/- 180 deg
+
+    Returns
+    -------
+    alpha, Re, cl, cd : the data grid needed to construct a CCAirfoil (one column per Reynolds number)
+
+    """
+
+    af_p = Airfoil([Polar(Re, alpha, cl, cd, cm) for Re, alpha, cl, cd, cm in polars])
+    af3D = af_p.correction3D(r_over_R, chord_over_r, tsr)
+    af_extrap1 = af3D.extrapolate(cd_max)
+    alpha_ext, Re_ext, cl_ext, cd_ext, cm_ext = af_extrap1.createDataGrid()
+
+    return alpha_ext, Re_ext, cl_ext, cd_ext
+
+
+def _load_once(cls, fname):
+    """cls.load(fname), reusing the object if the file has not changed since it was last loaded"""
+
+    fname = os.path.abspath(fname)
+    key = (cls.__name__, fname, os.path.getmtime(fname))
+    if key not in _loaded_models:
+        _loaded_models[key] = cls.load(fname)
+
+    return _loaded_models[key]
+
+
+def load_polar_database(fname):
+    """load a PolarDatabase (cached until the file changes)"""
+
+    return _load_once(PolarDatabase, fname)
+
+
+def load_airfoil_surrogate(fname):
+    """load a KrigingSurrogate (cached until the file changes)"""
+
+    return _load_once(KrigingSurrogate, fname)
+
+
+def _cylinder_af():
+    """airfoils used at the three root stations when polars are generated"""
+
+    Re1 = [1e6]
+    return [CCAirfoil([-180, 0, 180], Re1, [0, 0, 0], [0.5, 0.5, 0.5]),
+            CCAirfoil([-180, 0, 180], Re1, [0, 0, 0], [0.5, 0.5, 0.5]),
+            CCAirfoil([-180, 0, 180], Re1, [0, 0, 0], [0.35, 0.35, 0.35])]
+
+
+def _round_sig(x, digits):
+    """round x to a number of significant digits"""
+
+    x = np.asarray(x, dtype=float)
+    scale = 10.0**(np.floor(np.log10(np.abs(x))) - digits + 1)
+
+    return np.round(x/scale)*scale
+
+
+def polar_cache_key(x, y, Re, mach, iterations, alphas, *settings):
+    """content-addressed key for a polar: hash of the coordinates and all analysis settings
+    (Re can be a list of Reynolds numbers)"""
+
+    return hash_arrays('polar-v%d' % _POLAR_CACHE_VERSION, np.real(x), np.real(y),
+                        Re, mach, iterations, alphas, settings)
+
+
+def _load_arrays(fname, names):
+    """load the named arrays from a binary file written with _save_arrays
+    (None if not found or unreadable)"""
+
+    if not os.path.exists(fname):
+        return None
+
+    try:
+        data = np.load(fname)
+        arrays = tuple(data[name] for name in names)
+        data.close()
+    except (IOError, KeyError, ValueError):
+        return None  # corrupt or partially written file, just regenerate it
+
+    return arrays
+
+
+def _save_arrays(fname, **arrays):
+    """save named arrays to a binary file, creating its directory if needed.
+    The file is written to a temporary name then renamed, so concurrent runs
+    never see a partial file."""
+
+    dirname = os.path.dirname(fname)
+    if not os.path.isdir(dirname):
+        try:
+            os.makedirs(dirname)
+        except OSError:
+            if not os.path.isdir(dirname):
+                raise
+
+    fd, tmpname = tempfile.mkstemp(suffix='.tmp', dir=dirname)
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, **arrays)
+    try:
+        os.rename(tmpname, fname)
+    except OSError:
+        os.remove(tmpname)  # another process already stored this file
+
+
+def _load_grid(fname):
+    """load a data grid (alpha, Re, cl, cd) saved with _save_grid (None if not found)"""
+
+    return _load_arrays(fname, ('alpha', 'Re', 'cl', 'cd'))
+
+
+def _save_grid(fname, grid):
+    """save a data grid (alpha, Re, cl, cd) to a binary file"""
+
+    alpha, Re, cl, cd = grid
+    _save_arrays(fname, alpha=alpha, Re=Re, cl=cl, cd=cd)
+
+
+def load_cached_polar(cache_dir, key):
+    """load a data grid previously stored with save_cached_polar (None if not found)"""
+
+    return _load_grid(os.path.join(cache_dir, key + '.npz'))
+
+
+def save_cached_polar(cache_dir, key, grid):
+    """store a data grid (alpha, Re, cl, cd) in cache_dir under key"""
+
+    _save_grid(os.path.join(cache_dir, key + '.npz'), grid)
+
+
+# ---------------------
+# AeroDyn Airfoil Files
+# ---------------------
+
+# airfoils already read: path -> (modification time, CCAirfoil)
+_aerodyn_airfoils = {}
+
+
+def load_aerodyn_airfoil(fname, sidecar=False):
+    """CCAirfoil from an AeroDyn file.  Each file is only parsed once per process
+    (until it is modified), and every station using it shares the same object.
+
+    With sidecar=True the data grid is also saved in a binary file next to the
+    AeroDyn file (same name with a .npz extension) and read from there in later
+    runs, unless the AeroDyn file is newer.
+    """
+
+    fname = os.path.abspath(fname)
+    mtime = os.path.getmtime(fname)
+
+    if fname in _aerodyn_airfoils and _aerodyn_airfoils[fname][0] == mtime:
+        return _aerodyn_airfoils[fname][1]
+
+    if sidecar:
+        npzname = os.path.splitext(fname)[0] + '.npz'
+        grid = None
+        if os.path.exists(npzname) and os.path.getmtime(npzname) >= mtime:
+            grid = _load_grid(npzname)
+        if grid is None:
+            alpha, Re, cl, cd, cm = Airfoil.initFromAerodynFile(fname).createDataGrid()
+            grid = (alpha, Re, cl, cd)
+            try:
+                _save_grid(npzname, grid)
+            except (IOError, OSError):
+                pass  # e.g., read-only install, just parse the file next time
+        af = CCAirfoil(*grid)
+    else:
+        af = CCAirfoil.initFromAerodynFile(fname)
+
+    _aerodyn_airfoils[fname] = (mtime, af)
+
+    return af
+
+
 class AirfoilParameterization(Component):
     airfoil_files = List(Str, iotype='in', desc='names of airfoil file')
     airfoil_parameterization_type = Enum('Coordinates', ('Coordinates', 'NACA', 'CST'), iotype='in', desc='type of airfoil parameterization, either NACA, CST (Class-Shape-Transformation), or thickness-to-chord-ratio')
-    airfoil_analysis_tool = Enum('Files', ('Files', 'XFOIL'), iotype='in', desc='type of airfoil analysis tool, either using XFOIL or files')
+    airfoil_analysis_tool = Enum('Files', ('Files', 'XFOIL', 'Database', 'Surrogate'), iotype='in', desc='type of airfoil analysis tool, either using XFOIL, files, interpolation in a precomputed polar database, or a trained surrogate of XFOIL')
     airfoil_parameters = Array(iotype='in', desc='airfoil parameters')
     airfoil_locations = Array(iotype='in', desc='airfoil locations')
+    polar_cache_dir = Str('', iotype='in', desc='directory of the on-disk cache for XFOIL generated polars (no caching if empty)')
+    airfoil_sidecars = Bool(False, iotype='in', desc='store the parsed AeroDyn files in binary .npz files next to them and read those in later runs (Files analysis tool)')
+    nprocs = Int(1, iotype='in', desc='number of worker processes used to run XFOIL across stations')
+    alpha_sampling = Enum('uniform', ('uniform', 'adaptive'), iotype='in', desc='angles of attack analyzed with XFOIL, either a uniform grid or adaptively refined where the polar is nonlinear')
+    reynolds_mode = Enum('fixed', ('fixed', 'local'), iotype='in', desc='fixed: one polar at Re=1e6 and Mach=0.03 for every station, local: polars at multiples of the local Reynolds number at rated conditions')
+    Re_factors = Array(np.array([0.5, 1.0, 2.0]), iotype='in', desc='multiples of the local Reynolds number analyzed at each station (local reynolds_mode only)')
+    reynolds_digits = Int(2, iotype='in', desc='significant digits the local Reynolds and Mach numbers are rounded to so small design changes reuse the same polars (0: no rounding, e.g., for finite difference gradients)')
+
+    # local Reynolds number inputs
+    r = Array(iotype='in', units='m', desc='radial locations of the stations')
+    chord = Array(iotype='in', units='m', desc='chord length at each station')
+    Rtip = Float(iotype='in', units='m', desc='tip radius')
+    rho = Float(1.225, iotype='in', units='kg/m**3', desc='density of air')
+    mu = Float(1.81206e-5, iotype='in', units='kg/m/s', desc='dynamic viscosity of air')
+    speed_of_sound = Float(340.3, iotype='in', units='m/s', desc='speed of sound in air')
+    tsr = Float(iotype='in', desc='design tip-speed ratio')
+    maxOmega = Float(iotype='in', units='rpm', desc='rated rotor speed')
+    airfoil_database = Str('', iotype='in', desc='polar database file (see polardatabase.build_polar_database), used by the Database analysis tool')
+    airfoil_surrogate = Str('', iotype='in', desc='trained surrogate file (see airfoilsurrogate.train_surrogate), used by the Surrogate analysis tool')
     af = Array(iotype='out', desc='CCBlade objects')
+    cl_polar = Array(iotype='out', desc='surrogate lift coefficients before 3-D corrections (station x Re x alpha), zero at the root cylinders (Surrogate analysis tool only)')
+    cd_polar = Array(iotype='out', desc='surrogate drag coefficients before 3-D corrections (station x Re x alpha), zero at the root cylinders (Surrogate analysis tool only)')
+    cache_hits = Int(0, iotype='out', desc='number of executions that reused the previous airfoils because the airfoil inputs were unchanged')
+    cache_misses = Int(0, iotype='out', desc='number of executions that (re)generated the airfoils')
+
+    def __init__(self):
+        super(AirfoilParameterization, self).__init__()
+        self._fingerprint = None
+        self._dpolar = None
+        self._pool = WorkerPool()  # XFOIL worker processes, kept between runs
+
+
+    def fingerprint(self):
+        """hash of everything the airfoils depend on for the current analysis tool
+        (including modification times of any files read)"""
+
+        tool = self.airfoil_analysis_tool
+        af_type = self.airfoil_parameterization_type
+
+        if tool == 'Files':
+            files = list(self.airfoil_files)
+            data = []
+        else:
+            files = []
+            if af_type == 'Coordinates':
+                files += [str(f) for f in self.airfoil_parameters]
+            if tool == 'Database':
+                files.append(self.airfoil_database)
+            elif tool == 'Surrogate':
+                files.append(self.airfoil_surrogate)
+
+            data = [af_type, self.airfoil_parameters, self.reynolds_mode]
+            if tool == 'XFOIL':
+                data.append(self.alpha_sampling)
+            if self.reynolds_mode == 'local' and tool in ('XFOIL', 'Surrogate'):
+                Re, mach = self.local_reynolds()  # rounded, so tiny chord changes usually still match
+                data += [Re, mach, self.Re_factors]
+
+        mtimes = [os.path.getmtime(f) for f in files]
+
+        return hash_arrays(tool, files, mtimes, *data)
+
 
     def execute(self):
-        if self.airfoil_analysis_tool == 'Files':
-            # airfoil files
-            n = len(self.airfoil_files)
-            af = [0]*n
-            afinit = CCAirfoil.initFromAerodynFile
 
-            for i in range(n):
-                af[i] = afinit(self.airfoil_files[i])
+        # reuse the previous airfoils if nothing they depend on has changed
+        fingerprint = self.fingerprint()
+        if fingerprint == self._fingerprint:
+            self.cache_hits += 1
+            return
+        self.cache_misses += 1
+
+        if self.airfoil_analysis_tool == 'Files':
+            # airfoil files (each unique file is only parsed once)
+            af = [load_aerodyn_airfoil(fname, self.airfoil_sidecars) for fname in self.airfoil_files]
+        elif self.airfoil_analysis_tool == 'Database':
+            af = self.database_af()
+        elif self.airfoil_analysis_tool == 'Surrogate':
+            af = self.surrogate_af()
         else:
             af = self.generate_af()
 
         self.af = af
+        self._fingerprint = fingerprint
 
     def generate_af(self):
 
@@ -203,14 +662,19 @@ class AirfoilParameterization(Component):
         if af_type == 'CST':
             n = len(self.airfoil_parameters[0])
             af = [0]*n
+
+            # all stations at once, weights are stored as [upper, lower] x stations
+            nw = len(af_parameters)/2
+            wu = np.transpose(af_parameters[:nw])
+            wl = np.transpose(af_parameters[nw:])
+            x_cst, y_cst = cst_coordinates(wu, wl)
         else:
             n = len(self.airfoil_parameters)
             af = [0]*n
 
-        r_over_R = 0.5
-        chord_over_r = 0.15
-        tsr = 7.55
-        cd_max = 1.5
+        r_over_R, chord_over_r, tsr, cd_max = _CORRECTION_SETTINGS
+
+        jobs = []  # stations that need an XFOIL analysis
 
         for i in range(n):
             x = []
@@ -239,122 +703,246 @@ class AirfoilParameterization(Component):
                     x.append(pts[j][0])
                     y.append(pts[j][1])
             elif af_type == 'CST':
-                n = len(af_parameters)/2
-                wu = np.zeros(n)
-                wl = np.zeros(n)
-                for j in range(n):
-                    wu[j] = af_parameters[j][i]
-                    wl[j] = af_parameters[j + n][i]
-                # wu, wl = np.split(af_parameters[i], 2)
-                w1 = np.average(wl)
-                w2 = np.average(wu)
-                if w1 < w2:
-                    pass
-                else:
-                    higher = wl
-                    lower = wu
-                    wl = lower
-                    wu = higher
-                N = 120
-                dz = 0.
-
-                # Populate x coordinates
-                x = np.ones((N, 1))
-                zeta = np.zeros((N, 1))
-                for z in range(0, N):
-                    zeta[z] = 2 * pi / N * z
-                    if z == N - 1:
-                        zeta[z] = 2 * pi
-                    x[z] = 0.5*(cos(zeta[z])+1)
-
-                # N1 and N2 parameters (N1 = 0.5 and N2 = 1 for airfoil shape)
-                N1 = 0.5
-                N2 = 1
+                x = x_cst
+                y = y_cst[i]
 
-                try:
-                    zerind = np.where(x == 0)  # Used to separate upper and lower surfaces
-                    zerind = zerind[0][0]
-                except:
-                    zerind = N/2
+            else:
+                print 'Error. Airfoil parameterization type not specified. Please choose Coordinates, NACA, or CST.'
 
-                xl = np.zeros(zerind)
-                xu = np.zeros(N-zerind)
+            if i < 3:
+                af[:3] = _cylinder_af()
+            else:
+                jobs.append((i, x, y))
 
-                for z in range(len(xl)):
-                    xl[z] = np.real(x[z])            # Lower surface x-coordinates
-                for z in range(len(xu)):
-                    xu[z] = np.real(x[z + zerind])   # Upper surface x-coordinates
+        # Reynolds and Mach numbers analyzed at each station
+        if self.reynolds_mode == 'local':
+            Re_local, mach_local = self.local_reynolds()
+        else:
+            Re_local = 1e6*np.ones(n)
+            mach_local = 0.03*np.ones(n)
+
+        # analyze the remaining stations, skipping any already in the cache
+        iterations = 1000  # per angle
+        alphas = np.linspace(-20, 20, 80)
+        settings = (r_over_R, chord_over_r, tsr, cd_max, self.alpha_sampling)
+        cache_dir = self.polar_cache_dir
+
+        keys = {}
+        pending = []
+        args = []
+        for i, x, y in jobs:
+            if self.reynolds_mode == 'local':
+                Re = list(Re_local[i]*self.Re_factors)
+            else:
+                Re = [Re_local[i]]
+            mach = mach_local[i]
+
+            if cache_dir:
+                keys[i] = polar_cache_key(x, y, Re, mach, iterations, alphas, *settings)
+                grid = load_cached_polar(cache_dir, keys[i])
+                if grid is not None:
+                    af[i] = CCAirfoil(*grid)
+                    continue
+
+            # one job per Reynolds number
+            pending.append((i, len(Re)))
+            for Re_j in Re:
+                args.append((x, y, Re_j, mach, iterations, alphas, self.alpha_sampling))
+
+        polars = self._pool.map(_xfoil_polar_job, args, self.nprocs)
+
+        # regroup the polars by station
+        k = 0
+        for i, nRe in pending:
+            grid = corrected_data_grid(polars[k:k+nRe], r_over_R, chord_over_r, tsr, cd_max)
+            k += nRe
+            if cache_dir:
+                save_cached_polar(cache_dir, keys[i], grid)
+            af[i] = CCAirfoil(*grid)
 
-                yl = self.__ClassShape(wl, xl, N1, N2, -dz) # Call ClassShape function to determine lower surface y-coordinates
-                yu = self.__ClassShape(wu, xu, N1, N2, dz)  # Call ClassShape function to determine upper surface y-coordinates
+        return af
+
+
+    def database_af(self):
+        """interpolate polars from a precomputed database instead of running XFOIL"""
+
+        db = load_polar_database(self.airfoil_database)
+
+        af_type = self.airfoil_parameterization_type
+        if af_type != db.parameterization:
+            raise ValueError('polar database %s is for %s airfoils, not %s' % (self.airfoil_database, db.parameterization, af_type))
 
-                y = np.concatenate([yl, yu])  # Combine upper and lower y coordinates
-                y = y[::-1]
-                # coord_split = [xl, yl, xu, yu]  # Combine x and y into single output
-                # coord = [x, y]
-                x1 = np.zeros(len(x))
-                for k in range(len(x)):
-                    x1[k] = x[k][0]
-                x = x1
+        af_parameters = np.asarray(self.airfoil_parameters)
+        if af_type == 'CST':
+            n = af_parameters.shape[1]
+        else:
+            n = len(af_parameters)
 
+        af = [0]*n
+        af[:3] = _cylinder_af()
+        for i in range(3, n):
+            if af_type == 'CST':
+                polars = db.polars(af_parameters[:, i])
             else:
-                print 'Error. Airfoil parameterization type not specified. Please choose Coordinates, NACA, or CST.'
+                polars = db.polars(af_parameters[i])
+            af[i] = CCAirfoil(*corrected_data_grid(polars, *_CORRECTION_SETTINGS))
 
-            if i < 3:
-                Re1 = [1e6]
-                af[0] = CCAirfoil([-180, 0, 180], Re1, [0, 0, 0], [0.5, 0.5, 0.5])
-                af[1] = CCAirfoil([-180, 0, 180], Re1, [0, 0, 0], [0.5, 0.5, 0.5])
-                af[2] = CCAirfoil([-180, 0, 180], Re1, [0, 0, 0], [0.35, 0.35, 0.35])
+        return af
+
+
+    def surrogate_af(self):
+        """evaluate polars with a trained surrogate of XFOIL instead of running XFOIL"""
+
+        model = load_airfoil_surrogate(self.airfoil_surrogate)
+
+        af_type = self.airfoil_parameterization_type
+        if af_type != model.parameterization:
+            raise ValueError('airfoil surrogate %s is for %s airfoils, not %s' % (self.airfoil_surrogate, model.parameterization, af_type))
+
+        af_parameters = np.asarray(self.airfoil_parameters)
+        if af_type == 'CST':
+            n = af_parameters.shape[1]
+        else:
+            n = len(af_parameters)
+
+        if self.reynolds_mode == 'local':
+            Re_local, mach_local = self.local_reynolds()
+            nRe = len(self.Re_factors)
+        else:
+            nRe = 1
+        alphas = np.linspace(-20, 20, 80)
+
+        af = [0]*n
+        dpolar = [None]*n
+        cl = np.zeros((n, nRe, len(alphas)))
+        cd = np.zeros_like(cl)
+        af[:3] = _cylinder_af()
+        for i in range(3, n):
+            if self.reynolds_mode == 'local':
+                Re = Re_local[i]*self.Re_factors
+            else:
+                Re = [1e6]
+            if af_type == 'CST':
+                polars, dpolar[i] = model.polars(af_parameters[:, i], Re, alphas)
             else:
-                coordinate_points = [x, y]
-                Re = 1e6
-                alphas = np.linspace(-20, 20, 80)
-                airfoil = pyXLIGHT.xfoilAnalysis(coordinate_points)
-                airfoil.re = Re
-                airfoil.mach = 0.03
-                airfoil.iter = 1000
-                cl = np.zeros(len(alphas))
-                cd = np.zeros(len(alphas))
-                cm = np.zeros(len(alphas))
-                for j in range(len(alphas)):
-                    angle = alphas[j]
-                    cl[j], cd[j], cm[j], lexitflag = airfoil.solveAlpha(angle)
-                    # print cl[j], cd[j], angle
-                p1 = Polar(Re, alphas, cl, cd, cm)
-                af_p = Airfoil([p1])
-                af3D = af_p.correction3D(r_over_R, chord_over_r, tsr)
-                af_extrap1 = af3D.extrapolate(cd_max)
-                alpha_ext, Re_ext, cl_ext, cd_ext, cm_ext = af_extrap1.createDataGrid()
-                af[i] = CCAirfoil(alpha_ext, Re_ext, cl_ext, cd_ext)
+                polars, dpolar[i] = model.polars(af_parameters[i], Re, alphas)
+            cl[i] = [p[2] for p in polars]
+            cd[i] = [p[3] for p in polars]
+            af[i] = CCAirfoil(*corrected_data_grid(polars, *_CORRECTION_SETTINGS))
+
+        self.cl_polar = cl
+        self.cd_polar = cd
+        self._dpolar = dpolar
 
         return af
 
-    def __ClassShape(self, w, x, N1, N2, dz):
 
-        # Class function; taking input of N1 and N2
-        C = np.zeros(len(x), dtype=complex)
-        for i in range(len(x)):
-            C[i] = x[i]**N1*((1-x[i])**N2)
+    def list_deriv_vars(self):
+
+        # the CCAirfoil splines in af are built after 3-D corrections and extrapolation,
+        # which are not differentiated, so gradients stop at the surrogate polars.
+        # local Reynolds numbers are rounded and treated as constant.
+        if self.airfoil_analysis_tool != 'Surrogate':
+            return (), ()
+
+        inputs = ('airfoil_parameters',)
+        outputs = ('cl_polar', 'cd_polar')
+
+        return inputs, outputs
+
+
+    def provideJ(self):
+
+        af_parameters = np.asarray(self.airfoil_parameters)
+        npar = af_parameters.size
+        n = len(self._dpolar)
+
+        dcl = np.zeros(self.cl_polar.shape + (npar,))
+        dcd = np.zeros(self.cd_polar.shape + (npar,))
+        for i, dcoef in enumerate(self._dpolar):
+            if dcoef is None:
+                continue
+            if self.airfoil_parameterization_type == 'CST':
+                cols = np.arange(af_parameters.shape[0])*n + i  # weights x stations
+            else:
+                cols = [i]
+            dcl[i][:, :, cols] = dcoef[0]
+            dcd[i][:, :, cols] = dcoef[1]
+
+        J = np.vstack([dcl.reshape(-1, npar), dcd.reshape(-1, npar)])
+
+        return J
+
+
+    def local_reynolds(self):
+        """Reynolds and Mach numbers at each station at rated conditions
+        (rated rotor speed, with the wind speed where the rotor first reaches it
+        and optimal axial induction). Both are rounded to reynolds_digits
+        significant digits so small changes in the design still reuse the
+        same polars."""
+
+        Omega = self.maxOmega*pi/30.0
+        V = Omega*self.Rtip/self.tsr
+        W = np.sqrt((2.0/3*V)**2 + (Omega*self.r)**2)
+
+        Re = self.rho*W*self.chord/self.mu
+        mach = W/self.speed_of_sound
+        if self.reynolds_digits > 0:
+            Re = _round_sig(Re, self.reynolds_digits)
+            mach = _round_sig(mach, self.reynolds_digits)
+
+        return Re, mach
 
-        # Shape function; using Bernstein Polynomials
-        n = len(w) - 1  # Order of Bernstein polynomials
 
-        K = np.zeros(n+1, dtype=complex)
-        for i in range(0, n+1):
-            K[i] = factorial(n)/(factorial(i)*(factorial((n)-(i))))
+def _airfoil_key(af):
+    """fingerprint of the data of a CCAirfoil (its lift and drag splines)"""
 
-        S = np.zeros(len(x), dtype=complex)
-        for i in range(len(x)):
-            S[i] = 0
-            for j in range(0, n+1):
-                S[i] += w[j]*K[j]*x[i]**(j) * ((1-x[i])**(n-(j)))
+    data = []
+    for spline in [af.cl_spline, af.cd_spline]:
+        data += list(spline.get_knots()) + [spline.get_coeffs(), spline.degrees]
 
-        # Calculate y output
-        y = np.zeros(len(x), dtype=complex)
-        for i in range(len(y)):
-            y[i] = C[i] * S[i] + x[i] * dz
+    return hash_arrays(*data)
+
+
+def _ccblade_rotor(comp, derivatives=True, vectorized=False):
+    """CCBlade_PY rotor (or VectorizedBEM if vectorized) for the geometry and
+    atmosphere of an aero component.  The rotor (and its airfoil splines) is
+    kept on the component and only rebuilt when one of its inputs changes, so
+    repeated evaluations at new operating points reuse it.  Each kind of
+    rotor is cached separately."""
+
+    # stations usually share airfoil objects, so each is only fingerprinted once
+    afkeys = {}
+    for af in comp.af:
+        if id(af) not in afkeys:
+            afkeys[id(af)] = _airfoil_key(af)
+
+    key = hash_arrays(comp.r, comp.chord, comp.theta, comp.precurve,
+                       [afkeys[id(af)] for af in comp.af],
+                       [comp.Rhub, comp.Rtip, comp.hubHt, comp.precone, comp.tilt, comp.yaw,
+                        comp.precurveTip, comp.rho, comp.mu, comp.shearExp],
+                       [comp.B, comp.nSector, comp.tiploss, comp.hubloss, comp.wakerotation,
+                        comp.usecd])
+
+    if not hasattr(comp, '_rotors'):
+        comp._rotors = {}
+
+    kind = 'vectorized' if vectorized else derivatives
+
+    if kind not in comp._rotors or comp._rotors[kind][0] != key:
+        options = dict(tiploss=comp.tiploss, hubloss=comp.hubloss, wakerotation=comp.wakerotation, usecd=comp.usecd)
+        if vectorized:
+            cls = VectorizedBEM
+        else:
+            cls = CCBlade_PY
+            options['derivatives'] = derivatives
+        rotor = cls(comp.r, comp.chord, comp.theta, comp.af, comp.Rhub, comp.Rtip, comp.B,
+            comp.rho, comp.mu, comp.precone, comp.tilt, comp.yaw, comp.shearExp, comp.hubHt,
+            comp.nSector, comp.precurve, comp.precurveTip, **options)
+        comp._rotors[kind] = (key, rotor)
+
+    return comp._rotors[kind][1]
 
-        return y
 
 
 class CCBlade(AeroBase):
@@ -388,6 +976,8 @@ class CCBlade(AeroBase):
     wakerotation = Bool(True, iotype='in', desc='include effect of wake rotation (i.e., tangential induction factor is nonzero)')
     usecd = Bool(True, iotype='in', desc='use drag coefficient in computing induction factors')
     af = Array(iotype='in', desc='CCBlade objects')
+    lazy_derivatives = Bool(False, iotype='in', desc='skip derivatives in execute and compute them only if provideJ is called')
+    bem_method = Enum('ccblade', ('ccblade', 'vectorized'), iotype='in', desc='vectorized: solve all operating points of the power case at once (derivatives are then computed lazily by ccblade)')
 
     missing_deriv_policy = 'assume_zero'
 
@@ -396,26 +986,35 @@ class CCBlade(AeroBase):
         if len(self.precurve) == 0:
             self.precurve = np.zeros_like(self.r)
 
-        af = self.af
+        vectorized = self.run_case == 'power' and self.bem_method == 'vectorized'
+
+        self.analyze(not (self.lazy_derivatives or vectorized), vectorized)
+
 
-        self.ccblade = CCBlade_PY(self.r, self.chord, self.theta, af, self.Rhub, self.Rtip, self.B,
-            self.rho, self.mu, self.precone, self.tilt, self.yaw, self.shearExp, self.hubHt,
-            self.nSector, self.precurve, self.precurveTip, tiploss=self.tiploss, hubloss=self.hubloss,
-            wakerotation=self.wakerotation, usecd=self.usecd, derivatives=True)
+    def analyze(self, derivatives, vectorized=False):
+        """run the current case, with or without derivatives"""
 
+        self.ccblade = _ccblade_rotor(self, derivatives, vectorized)
+        self.has_derivatives = derivatives
 
         if self.run_case == 'power':
 
             # power, thrust, torque
-            self.P, self.T, self.Q, self.dP, self.dT, self.dQ \
-                = self.ccblade.evaluate(self.Uhub, self.Omega, self.pitch, coefficient=False)
+            outputs = self.ccblade.evaluate(self.Uhub, self.Omega, self.pitch, coefficient=False)
+            if derivatives:
+                self.P, self.T, self.Q, self.dP, self.dT, self.dQ = outputs
+            else:
+                self.P, self.T, self.Q = outputs
 
 
         elif self.run_case == 'loads':
 
             # distributed loads
-            Np, Tp, self.dNp, self.dTp \
-                = self.ccblade.distributedAeroLoads(self.V_load, self.Omega_load, self.pitch_load, self.azimuth_load)
+            outputs = self.ccblade.distributedAeroLoads(self.V_load, self.Omega_load, self.pitch_load, self.azimuth_load)
+            if derivatives:
+                Np, Tp, self.dNp, self.dTp = outputs
+            else:
+                Np, Tp = outputs
 
             # concatenate loads at root/tip
             self.loads.r = np.concatenate([[self.Rhub], self.r, [self.Rtip]])
@@ -434,6 +1033,23 @@ class CCBlade(AeroBase):
             self.loads.azimuth = self.azimuth_load
 
 
+    def analyze_derivatives(self):
+        """derivatives of the current case, computed without touching the outputs
+        (for provideJ when execute skipped them)"""
+
+        ccblade = _ccblade_rotor(self, True)
+
+        if self.run_case == 'power':
+            outputs = ccblade.evaluate(self.Uhub, self.Omega, self.pitch, coefficient=False)
+            self.dP, self.dT, self.dQ = outputs[3:]
+
+        elif self.run_case == 'loads':
+            outputs = ccblade.distributedAeroLoads(self.V_load, self.Omega_load, self.pitch_load, self.azimuth_load)
+            self.dNp, self.dTp = outputs[2:]
+
+        self.has_derivatives = True
+
+
     def list_deriv_vars(self):
 
         if self.run_case == 'power':
@@ -453,6 +1069,9 @@ class CCBlade(AeroBase):
 
     def provideJ(self):
 
+        if not self.has_derivatives:
+            self.analyze_derivatives()
+
         if self.run_case == 'power':
 
             dP = self.dP
@@ -511,6 +1130,225 @@ class CCBlade(AeroBase):
 
 
 
+class CCBladeBatch(Component):
+    """blade element momentum code evaluated at several operating conditions
+    with a single rotor.  Each loads condition (V_load[i], Omega_load[i],
+    pitch_load[i], azimuth_load[i]) produces distributed loads in loads<i>,
+    and the power conditions (Uhub, Omega, pitch) produce P, T, Q."""
+
+    # (potential) variables
+    r = Array(iotype='in', units='m', desc='radial locations where blade is defined (should be increasing and not go all the way to hub or tip)')
+    chord = Array(iotype='in', units='m', desc='chord length at each section')
+    theta = Array(iotype='in', units='deg', desc='twist angle at each section (positive decreases angle of attack)')
+    Rhub = Float(iotype='in', units='m', desc='hub radius')
+    Rtip = Float(iotype='in', units='m', desc='tip radius')
+    hubHt = Float(iotype='in', units='m', desc='hub height')
+    precone = Float(0.0, iotype='in', desc='precone angle', units='deg')
+    tilt = Float(0.0, iotype='in', desc='shaft tilt', units='deg')
+    yaw = Float(0.0, iotype='in', desc='yaw error', units='deg')
+    precurve = Array(iotype='in', units='m', desc='precurve at each section')
+    precurveTip = Float(0.0, iotype='in', units='m', desc='precurve at tip')
+
+    # operating conditions
+    V_load = Array(iotype='in', units='m/s', desc='hub height wind speed of each loads condition')
+    Omega_load = Array(iotype='in', units='rpm', desc='rotor rotation speed of each loads condition')
+    pitch_load = Array(iotype='in', units='deg', desc='blade pitch setting of each loads condition')
+    azimuth_load = Array(iotype='in', units='deg', desc='blade azimuthal location of each loads condition')
+    Uhub = Array(iotype='in', units='m/s', desc='hub height wind speed of each power condition')
+    Omega = Array(iotype='in', units='rpm', desc='rotor rotation speed of each power condition')
+    pitch = Array(iotype='in', units='deg', desc='blade pitch setting of each power condition')
+
+    # parameters
+    B = Int(3, iotype='in', desc='number of blades')
+    rho = Float(1.225, iotype='in', units='kg/m**3', desc='density of air')
+    mu = Float(1.81206e-5, iotype='in', units='kg/(m*s)', desc='dynamic viscosity of air')
+    shearExp = Float(0.2, iotype='in', desc='shear exponent')
+    nSector = Int(4, iotype='in', desc='number of sectors to divide rotor face into in computing thrust and power')
+    tiploss = Bool(True, iotype='in', desc='include Prandtl tip loss model')
+    hubloss = Bool(True, iotype='in', desc='include Prandtl hub loss model')
+    wakerotation = Bool(True, iotype='in', desc='include effect of wake rotation (i.e., tangential induction factor is nonzero)')
+    usecd = Bool(True, iotype='in', desc='use drag coefficient in computing induction factors')
+    af = Array(iotype='in', desc='CCBlade objects')
+    lazy_derivatives = Bool(False, iotype='in', desc='skip derivatives in execute and compute them only if provideJ is called')
+
+    # outputs (loads<i> are added in the constructor)
+    T = Array(iotype='out', units='N', desc='rotor aerodynamic thrust at each power condition')
+    Q = Array(iotype='out', units='N*m', desc='rotor aerodynamic torque at each power condition')
+    P = Array(iotype='out', units='W', desc='rotor aerodynamic power at each power condition')
+
+    missing_deriv_policy = 'assume_zero'
+
+    def __init__(self, nloads=1, npower=1):
+        super(CCBladeBatch, self).__init__()
+
+        self.nloads = nloads
+        self.npower = npower
+
+        for i in range(nloads):
+            self.add('loads%d' % i, VarTree(AeroLoads(), iotype='out', desc='loads in blade-aligned coordinate system for loads condition %d' % i))
+
+        self.V_load = np.zeros(nloads)
+        self.Omega_load = np.zeros(nloads)
+        self.pitch_load = np.zeros(nloads)
+        self.azimuth_load = np.zeros(nloads)
+        self.Uhub = np.zeros(npower)
+        self.Omega = np.zeros(npower)
+        self.pitch = np.zeros(npower)
+        self.T = np.zeros(npower)
+        self.Q = np.zeros(npower)
+        self.P = np.zeros(npower)
+
+
+    def execute(self):
+
+        if len(self.precurve) == 0:
+            self.precurve = np.zeros_like(self.r)
+
+        self.analyze(not self.lazy_derivatives)
+
+
+    def analyze(self, derivatives):
+        """run all conditions, with or without derivatives"""
+
+        # one rotor for all conditions
+        self.ccblade = _ccblade_rotor(self, derivatives)
+        self.has_derivatives = derivatives
+
+        if self.npower > 0:
+            outputs = self.ccblade.evaluate(self.Uhub, self.Omega, self.pitch, coefficient=False)
+            if derivatives:
+                self.P, self.T, self.Q, self.dP, self.dT, self.dQ = outputs
+            else:
+                self.P, self.T, self.Q = outputs
+
+        self.dNp = [0]*self.nloads
+        self.dTp = [0]*self.nloads
+
+        for i in range(self.nloads):
+
+            outputs = self.ccblade.distributedAeroLoads(self.V_load[i], self.Omega_load[i],
+                                                        self.pitch_load[i], self.azimuth_load[i])
+            if derivatives:
+                Np, Tp, self.dNp[i], self.dTp[i] = outputs
+            else:
+                Np, Tp = outputs
+
+            # concatenate loads at root/tip and conform to blade-aligned coordinate system
+            loads = getattr(self, 'loads%d' % i)
+            loads.r = np.concatenate([[self.Rhub], self.r, [self.Rtip]])
+            loads.Px = np.concatenate([[0.0], Np, [0.0]])
+            loads.Py = -np.concatenate([[0.0], Tp, [0.0]])
+            loads.Pz = 0*loads.Px
+
+            # return other outputs needed
+            loads.V = self.V_load[i]
+            loads.Omega = self.Omega_load[i]
+            loads.pitch = self.pitch_load[i]
+            loads.azimuth = self.azimuth_load[i]
+
+
+    def analyze_derivatives(self):
+        """derivatives of all conditions, computed without touching the outputs
+        (for provideJ when execute skipped them)"""
+
+        ccblade = _ccblade_rotor(self, True)
+
+        if self.npower > 0:
+            outputs = ccblade.evaluate(self.Uhub, self.Omega, self.pitch, coefficient=False)
+            self.dP, self.dT, self.dQ = outputs[3:]
+
+        self.dNp = [0]*self.nloads
+        self.dTp = [0]*self.nloads
+
+        for i in range(self.nloads):
+            outputs = ccblade.distributedAeroLoads(self.V_load[i], self.Omega_load[i],
+                                                   self.pitch_load[i], self.azimuth_load[i])
+            self.dNp[i], self.dTp[i] = outputs[2:]
+
+        self.has_derivatives = True
+
+
+    def list_deriv_vars(self):
+
+        inputs = ('r', 'chord', 'theta', 'Rhub', 'Rtip', 'hubHt', 'precone', 'tilt', 'yaw',
+            'precurve', 'precurveTip', 'V_load', 'Omega_load', 'pitch_load', 'azimuth_load',
+            'Uhub', 'Omega', 'pitch')
+
+        outputs = []
+        for i in range(self.nloads):
+            outputs += ['loads%d.%s' % (i, name) for name in
+                        ('r', 'Px', 'Py', 'Pz', 'V', 'Omega', 'pitch', 'azimuth')]
+        if self.npower > 0:
+            outputs += ['P', 'T', 'Q']
+
+        return inputs, tuple(outputs)
+
+
+    def provideJ(self):
+
+        if not self.has_derivatives:
+            self.analyze_derivatives()
+
+        n = len(self.r)
+        nl = self.nloads
+        npw = self.npower
+
+        # column of each input
+        idx = {}
+        start = 0
+        for name, size in [('dr', n), ('dchord', n), ('dtheta', n), ('dRhub', 1), ('dRtip', 1),
+                           ('dhubHt', 1), ('dprecone', 1), ('dtilt', 1), ('dyaw', 1), ('dprecurve', n),
+                           ('dprecurveTip', 1), ('V_load', nl), ('Omega_load', nl), ('pitch_load', nl),
+                           ('azimuth_load', nl), ('dUinf', npw), ('dOmega', npw), ('dpitch', npw)]:
+            idx[name] = start
+            start += size
+        ncol = start
+
+        geom = ('dr', 'dchord', 'dtheta', 'dRhub', 'dRtip', 'dhubHt', 'dprecone', 'dtilt', 'dyaw', 'dprecurve')
+
+        J = []
+        for i in range(nl):
+
+            # the same condition columns as the single-case component, for condition i
+            col = dict((name, idx[name]) for name in geom)
+            col['dUinf'] = idx['V_load'] + i
+            col['dOmega'] = idx['Omega_load'] + i
+            col['dpitch'] = idx['pitch_load'] + i
+            col['dazimuth'] = idx['azimuth_load'] + i
+
+            dr = np.zeros((n+2, ncol))
+            dr[1:-1, 0:n] = np.eye(n)
+            dr[0, idx['dRhub']] = 1.0
+            dr[-1, idx['dRtip']] = 1.0
+
+            dPx = np.zeros((n+2, ncol))
+            dPy = np.zeros((n+2, ncol))
+            for name, c in col.iteritems():
+                dNp = np.reshape(self.dNp[i][name], (n, -1))
+                dTp = np.reshape(self.dTp[i][name], (n, -1))
+                dPx[1:-1, c:c+dNp.shape[1]] = dNp
+                dPy[1:-1, c:c+dTp.shape[1]] = -dTp
+
+            dcond = np.zeros((4, ncol))
+            dcond[0, col['dUinf']] = 1.0
+            dcond[1, col['dOmega']] = 1.0
+            dcond[2, col['dpitch']] = 1.0
+            dcond[3, col['dazimuth']] = 1.0
+
+            J += [dr, dPx, dPy, np.zeros((n+2, ncol)), dcond]
+
+        if npw > 0:
+            for d in [self.dP, self.dT, self.dQ]:
+                jd = np.zeros((npw, ncol))
+                for name in geom + ('dprecurveTip', 'dUinf', 'dOmega', 'dpitch'):
+                    block = np.reshape(d[name], (npw, -1))
+                    jd[:, idx[name]:idx[name]+block.shape[1]] = block
+                J.append(jd)
+
+        return vstack(J)
+
+
+
 class CSMDrivetrain(DrivetrainLossesBase):
     """drivetrain losses from NREL cost and scaling model"""
 
@@ -675,6 +1513,147 @@ class RayleighCDF(CDFBase):
 
 
 
+# histograms of measured wind speed already binned, keyed by file, modification time, and binning
+_wind_histograms = {}
+
+
+def _bin_time_series(fname, bin_width, chunk_size=2**22):
+    """count wind speeds in bins of width bin_width starting at zero.  .npy files are
+    memory-mapped and binned a chunk at a time, other files are read as text.
+    Missing values (nan or negative) are ignored."""
+
+    if fname.endswith('.npy'):
+        data = np.load(fname, mmap_mode='r')
+    else:
+        data = np.loadtxt(fname)
+    data = data.reshape(-1)
+
+    counts = np.zeros(0)
+    for start in range(0, len(data), chunk_size):
+        chunk = np.asarray(data[start:start+chunk_size], dtype=float)
+        chunk = chunk[~np.isnan(chunk)]
+        chunk = chunk[chunk >= 0]
+        c = np.bincount((chunk/bin_width).astype(int)).astype(float)
+        if len(c) > len(counts):
+            c[:len(counts)] += counts
+            counts = c
+        else:
+            counts[:len(c)] += c
+
+    edges = bin_width*np.arange(len(counts)+1)
+
+    return edges, counts
+
+
+def _read_histogram(fname):
+    """read a text histogram with columns: bin center wind speed, frequency (counts or fractions)"""
+
+    data = np.loadtxt(fname)
+    centers = data[:, 0]
+    freq = data[:, 1]
+
+    mid = 0.5*(centers[:-1] + centers[1:])
+    edges = np.concatenate([[max(2*centers[0] - mid[0], 0.0)], mid, [2*centers[-1] - mid[-1]]])
+
+    return edges, freq
+
+
+def _load_histogram(fname):
+    """load (edges, freq) saved with _save_histogram (None if not found)"""
+
+    return _load_arrays(fname, ('edges', 'freq'))
+
+
+def _save_histogram(fname, hist):
+    """save (edges, freq) to a binary file"""
+
+    _save_arrays(fname, edges=hist[0], freq=hist[1])
+
+
+def wind_speed_histogram(fname, file_type='timeseries', bin_width=0.5, cache_dir=''):
+    """binned wind speed distribution of a site, from a measured time series or histogram file.
+    Results are cached in memory, and on disk in cache_dir (if given), so that long
+    records are only binned once.
+
+    Parameters
+    ----------
+    fname : str
+        time series (.npy or text, one wind speed per entry) or
+        histogram (text, columns of bin center and frequency)
+    file_type : str
+        'timeseries' or 'histogram'
+    bin_width : float (m/s)
+        width of bins used for time series
+    cache_dir : str
+        directory of the on-disk cache (no on-disk caching if empty)
+
+    Returns
+    -------
+    edges : ndarray (nbins+1)
+        bin edges (m/s)
+    freq : ndarray (nbins)
+        fraction of time in each bin
+
+    """
+
+    fname = os.path.abspath(fname)
+    key = hash_arrays('wind-histogram', fname, file_type, os.path.getmtime(fname),
+                       os.path.getsize(fname), bin_width)
+
+    if key not in _wind_histograms:
+
+        cache_file = os.path.join(cache_dir, key + '.npz') if cache_dir else None
+        hist = _load_histogram(cache_file) if cache_file else None
+
+        if hist is None:
+            if file_type == 'histogram':
+                edges, freq = _read_histogram(fname)
+            else:
+                edges, freq = _bin_time_series(fname, bin_width)
+            hist = (edges, freq / np.sum(freq))
+            if cache_file:
+                _save_histogram(cache_file, hist)
+
+        _wind_histograms[key] = hist
+
+    return _wind_histograms[key]
+
+
+
+class EmpiricalCDF(CDFBase):
+    """cumulative distribution function of measured hub-height wind speeds
+    (Akima spline through the cumulative histogram)"""
+
+    wind_file = Str(iotype='in', desc='wind speed time series (.npy is memory-mapped, otherwise text) or histogram (text: bin center, frequency)')
+    file_type = Enum('timeseries', ('timeseries', 'histogram'), iotype='in', desc='contents of wind_file')
+    bin_width = Float(0.5, iotype='in', units='m/s', desc='width of bins used for a time series')
+    cache_dir = Str('', iotype='in', desc='directory of the on-disk cache of binned time series (in memory only if empty)')
+
+    def execute(self):
+
+        edges, freq = wind_speed_histogram(self.wind_file, self.file_type, self.bin_width, self.cache_dir)
+        cdf = np.concatenate([[0.0], np.cumsum(freq)])
+
+        x = np.clip(self.x, edges[0], edges[-1])
+        spline = Akima(edges, cdf)
+        F, dF_dx, _, _ = spline.interp(x)
+
+        self.F = np.clip(F, 0.0, 1.0)
+        self.dF_dx = np.where((self.x > edges[0]) & (self.x < edges[-1]), dF_dx, 0.0)
+
+    def list_deriv_vars(self):
+
+        inputs = ('x',)
+        outputs = ('F',)
+
+        return inputs, outputs
+
+    def provideJ(self):
+
+        return np.diag(self.dF_dx)
+
+
+
 def common_io_with_ccblade(assembly, varspeed, varpitch, cdf_type):
 
     regulated = varspeed or varpitch
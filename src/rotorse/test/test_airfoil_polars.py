@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_airfoil_polars.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import unittest
+import os
+import tempfile
+import warnings
+import numpy as np
+from rotorse import rotoraerodefaults
+from rotorse.rotoraerodefaults import adaptive_alpha_sweep, xfoil_polar
+from rotorse.polardatabase import PolarDatabase
+from rotorse.airfoilsurrogate import KrigingSurrogate, latin_hypercube
+
+
+class StubAirfoil(object):
+    """stands in for pyXLIGHT.xfoilAnalysis: a smooth polar with stall near 14 deg
+    that fails to converge between alpha_fail[0] and alpha_fail[1]
+    (between cold_fail[0] and cold_fail[1] when solved from a cold start)"""
+
+    def __init__(self, alpha_fail=(12.0, 13.0), cold_fail=(12.0, 13.0)):
+        self.alpha_fail = alpha_fail
+        self.cold_fail = cold_fail
+        self.solved = []
+
+    def solveAlphaSweep(self, alphas):
+        alphas = np.asarray(alphas, dtype=float)
+        self.solved.extend(alphas)
+
+        a = np.radians(alphas)
+        cl = 2*np.pi*a*np.exp(-(alphas/14.0)**8)
+        cd = 0.01 + 0.5*a**2
+        cm = -0.05*np.ones(len(alphas))
+        lexitflag = np.logical_and(alphas >= self.alpha_fail[0], alphas <= self.alpha_fail[1])
+        cl[lexitflag] = np.nan
+        cd[lexitflag] = np.nan
+        cm[lexitflag] = np.nan
+
+        return cl, cd, cm, lexitflag
+
+    def solveAlpha(self, alpha):
+        fail = self.alpha_fail
+        self.alpha_fail = self.cold_fail
+        cl, cd, cm, lexitflag = self.solveAlphaSweep([alpha])
+        self.alpha_fail = fail
+
+        return cl[0], cd[0], cm[0], lexitflag[0]
+
+    def resetBoundaryLayer(self):
+        pass
+
+
+class TestAdaptiveAlphaSweep(unittest.TestCase):
+
+    def test1(self):
+
+        airfoil = StubAirfoil()
+        alpha, cl, cd, cm, lexitflag = adaptive_alpha_sweep(airfoil, -20.0, 20.0, 0.5)
+
+        # terminates, and never solves the same angle twice
+        self.assertEqual(len(airfoil.solved), len(set(airfoil.solved)))
+        self.assertEqual(len(alpha), len(airfoil.solved))
+        self.assertTrue(np.all(np.diff(alpha) > 0))
+
+        # the non-converged angles are returned flagged
+        fail = np.logical_and(alpha >= 12.0, alpha <= 13.0)
+        self.assertTrue(np.any(fail))
+        np.testing.assert_array_equal(lexitflag, fail)
+
+        # refined around stall, but never below min_spacing
+        self.assertGreater(len(alpha), 11)
+        self.assertGreaterEqual(np.min(np.diff(alpha)), 0.5)
+
+
+    def test2(self):
+
+        airfoil = StubAirfoil()
+        alpha, cl, cd, cm, lexitflag = adaptive_alpha_sweep(airfoil, -20.0, 20.0, 0.01, max_passes=2)
+
+        # at most n_coarse + 2 passes that each split every interval once
+        self.assertLessEqual(len(alpha), 11 + 10 + 20)
+
+
+
+class TestXfoilPolar(unittest.TestCase):
+
+    def setUp(self):
+
+        self.xfoilAnalysis = rotoraerodefaults.pyXLIGHT.xfoilAnalysis
+        self.alphas = np.linspace(-10.0, 20.0, 31)
+
+
+    def tearDown(self):
+
+        rotoraerodefaults.pyXLIGHT.xfoilAnalysis = self.xfoilAnalysis
+
+
+    def polar(self, airfoil, fallback=True):
+
+        rotoraerodefaults.pyXLIGHT.xfoilAnalysis = lambda coords: airfoil
+        return xfoil_polar(None, None, 1e6, 0.0, 100, self.alphas, fallback=fallback)
+
+
+    def test1(self):
+
+        # only the converged angles of the sweep are kept
+        Re, alpha, cl, cd, cm = self.polar(StubAirfoil())
+        np.testing.assert_array_equal(alpha, self.alphas[np.logical_or(self.alphas < 12.0, self.alphas > 13.0)])
+        self.assertFalse(np.any(np.isnan(cl)))
+
+
+    def test2(self):
+
+        # the sweep fails, so each angle is solved from a cold start and the converged ones are kept
+        airfoil = StubAirfoil(alpha_fail=(-90.0, 90.0), cold_fail=(0.0, 90.0))
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            Re, alpha, cl, cd, cm = self.polar(airfoil)
+        self.assertEqual(len(w), 1)
+        np.testing.assert_array_equal(alpha, self.alphas[self.alphas < 0.0])
+        self.assertFalse(np.any(np.isnan(cl)))
+
+        # not enough converge from a cold start either
+        airfoil = StubAirfoil(alpha_fail=(-90.0, 90.0), cold_fail=(-9.5, 90.0))
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('always')
+            self.assertRaises(ValueError, self.polar, airfoil)
+
+        # or no fallback
+        airfoil = StubAirfoil(alpha_fail=(-90.0, 90.0), cold_fail=(0.0, 90.0))
+        self.assertRaises(ValueError, self.polar, airfoil, fallback=False)
+
+
+
+class TestPolarDatabase(unittest.TestCase):
+
+    def setUp(self):
+
+        rs = np.random.RandomState(0)
+        self.axes = [np.array([0.1, 0.2, 0.4]), np.array([-0.2, -0.1])]
+        self.Re = [5e5, 1e6]
+        self.alpha = np.linspace(-10, 10, 5)
+        shape = (3, 2, 2, 5)
+        self.cl = rs.rand(*shape)
+        self.cd = rs.rand(*shape)
+        self.cm = rs.rand(*shape)
+        self.db = PolarDatabase('CST', self.axes, self.Re, self.alpha, self.cl, self.cd, self.cm)
+
+
+    def test1(self):
+
+        # exact at every grid node
+        for i in range(3):
+            for j in range(2):
+                cl, cd, cm = self.db.interpolate([self.axes[0][i], self.axes[1][j]])
+                np.testing.assert_allclose(cl, self.cl[i, j], rtol=1e-14)
+                np.testing.assert_allclose(cd, self.cd[i, j], rtol=1e-14)
+                np.testing.assert_allclose(cm, self.cm[i, j], rtol=1e-14)
+
+        # bilinear inside a cell
+        cl, cd, cm = self.db.interpolate([0.3, -0.125])
+        expected = 0.5*(0.25*self.cl[1, 0] + 0.75*self.cl[1, 1]) + 0.5*(0.25*self.cl[2, 0] + 0.75*self.cl[2, 1])
+        np.testing.assert_allclose(cl, expected, rtol=1e-14)
+
+
+    def test2(self):
+
+        # clipped to the edges outside the grid (no extrapolation)
+        cl, cd, cm = self.db.interpolate([0.0, -0.5])
+        np.testing.assert_allclose(cl, self.cl[0, 0], rtol=1e-14)
+
+        cl, cd, cm = self.db.interpolate([1.0, -0.15])
+        np.testing.assert_allclose(cl, 0.5*(self.cl[2, 0] + self.cl[2, 1]), rtol=1e-14)
+
+        # so the polars do not change with the parameters there
+        cl2, cd2, cm2 = self.db.interpolate([1.1, -0.15])
+        np.testing.assert_array_equal(cl2, cl)
+
+        self.assertRaises(ValueError, self.db.interpolate, [0.1, 0.2, 0.3])
+
+
+    def test3(self):
+
+        fd, fname = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        try:
+            self.db.save(fname)
+            db = PolarDatabase.load(fname)
+        finally:
+            os.remove(fname)
+
+        self.assertEqual(db.parameterization, 'CST')
+        polars = db.polars([0.2, -0.1])
+        self.assertEqual(len(polars), 2)
+        Re, alpha, cl, cd, cm = polars[1]
+        self.assertEqual(Re, 1e6)
+        np.testing.assert_array_equal(alpha, self.alpha)
+        np.testing.assert_allclose(cl, self.cl[1, 1, 1], rtol=1e-6)  # stored in single precision
+
+
+
+class TestKrigingSurrogate(unittest.TestCase):
+
+    def setUp(self):
+
+        # two CST weights, alpha, and log10(Re)
+        X = latin_hypercube(40, [0.1, -0.2, -10.0, 5.5], [0.3, -0.1, 10.0, 6.5], seed=0)
+        Y = np.zeros((len(X), 3))
+        Y[:, 0] = 0.1*X[:, 2] + 2*X[:, 0]*np.sin(0.1*X[:, 2]) + X[:, 1]
+        Y[:, 1] = 0.01 + 0.05*X[:, 0]**2 + 1e-4*X[:, 2]**2 - 0.002*X[:, 3]
+        Y[:, 2] = -0.1*X[:, 1] + 0.01*X[:, 2]*X[:, 0]
+        self.X = X
+        self.Y = Y
+        self.model = KrigingSurrogate.train('CST', X, Y, thetas=[5.0])  # well conditioned
+
+
+    def test1(self):
+
+        # interpolates the training data
+        Y, dY_dX = self.model.evaluate(self.X)
+        np.testing.assert_allclose(Y, self.Y, atol=1e-5)
+
+
+    def test2(self):
+
+        # analytic derivatives against central differences
+        X = np.array([[0.2, -0.15, 3.0, 6.0], [0.12, -0.18, -7.0, 5.7]])
+        Y, dY_dX = self.model.evaluate(X)
+
+        h = 1e-5*(self.model.upper - self.model.lower)
+        for j in range(X.shape[1]):
+            Xp = X.copy()
+            Xm = X.copy()
+            Xp[:, j] += h[j]
+            Xm[:, j] -= h[j]
+            fd = (self.model.evaluate(Xp)[0] - self.model.evaluate(Xm)[0])/(2*h[j])
+            np.testing.assert_allclose(dY_dX[:, :, j], fd, rtol=1e-5, atol=1e-7)
+
+
+    def test3(self):
+
+        # polar derivatives with respect to the CST weights
+        w = np.array([0.2, -0.15])
+        Re = [5e5, 2e6]
+        alpha = np.linspace(-10, 10, 7)
+        polars, dcoef = self.model.polars(w, Re, alpha)
+        self.assertEqual(dcoef.shape, (3, 2, 7, 2))
+
+        h = 1e-7
+        for k in range(2):
+            wp = w.copy()
+            wp[k] += h
+            polars_p, _ = self.model.polars(wp, Re, alpha)
+            for j in range(2):
+                fd_cl = (polars_p[j][2] - polars[j][2])/h
+                fd_cd = (polars_p[j][3] - polars[j][3])/h
+                np.testing.assert_allclose(dcoef[0, j, :, k], fd_cl, rtol=1e-4, atol=1e-6)
+                np.testing.assert_allclose(dcoef[1, j, :, k], fd_cd, rtol=1e-4, atol=1e-6)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
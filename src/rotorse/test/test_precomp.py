@@ -0,0 +1,431 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_precomp.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import unittest
+import os
+import math
+import tempfile
+import numpy as np
+from rotorse.precomp import Profile, Orthotropic2DMaterial, CompositeSection, PackedLayup, laminateABD, \
+    panelBucklingStrain
+from rotorse import rotor
+from rotorse.rotor import PreCompSections, ResizeCompositeSection
+
+
+# NREL 5-MW blade, structural grid and shear web locations from main.py
+r_str = np.array([0.0, 0.00492790457512, 0.00652942887106, 0.00813095316699, 0.00983257273154,
+    0.0114340970275, 0.0130356213234, 0.02222276, 0.024446481932, 0.026048006228, 0.06666667, 0.089508406455,
+    0.11111057, 0.146462614229, 0.16666667, 0.195309105255, 0.23333333, 0.276686558545, 0.3, 0.333640766319,
+    0.36666667, 0.400404310407, 0.43333333, 0.5, 0.520818918408, 0.56666667, 0.602196371696, 0.63333333,
+    0.667358391486, 0.683573824984, 0.7, 0.73242031601, 0.76666667, 0.83333333, 0.88888943, 0.93333333, 0.97777724,
+    1.0])
+chord_str = np.array([3.2612, 3.3100915356, 3.32587052924, 3.34159388653, 3.35823798667, 3.37384375335,
+    3.38939112914, 3.4774055542, 3.49839685, 3.51343645709, 3.87017220335, 4.04645623801, 4.19408216643,
+    4.47641008477, 4.55844487985, 4.57383098262, 4.57285771934, 4.51914315648, 4.47677655262, 4.40075650022,
+    4.31069949379, 4.20483735936, 4.08985563932, 3.82931757126, 3.74220276467, 3.54415796922, 3.38732428502,
+    3.24931446473, 3.23421422609, 3.22701537997, 3.21972125648, 3.08979310611, 2.95152261813, 2.330753331,
+    2.05553464181, 1.82577817774, 1.5860853279, 1.4621])
+web1 = np.array([-1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, 0.4114, 0.4102, 0.4094, 0.3876, 0.3755, 0.3639, 0.345, 0.3342, 0.3313, 0.3274, 0.323, 0.3206, 0.3172, 0.3138, 0.3104, 0.307, 0.3003, 0.2982, 0.2935, 0.2899, 0.2867, 0.2833, 0.2817, 0.2799, 0.2767, 0.2731, 0.2664, 0.2607, 0.2562, 0.1886, -1.0])
+web2 = np.array([-1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, 0.5886, 0.5868, 0.5854, 0.5508, 0.5315, 0.5131, 0.4831, 0.4658, 0.4687, 0.4726, 0.477, 0.4794, 0.4828, 0.4862, 0.4896, 0.493, 0.4997, 0.5018, 0.5065, 0.5101, 0.5133, 0.5167, 0.5183, 0.5201, 0.5233, 0.5269, 0.5336, 0.5393, 0.5438, 0.6114, -1.0])
+web3 = np.array([-1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0])
+
+
+def blade_sections():
+    """materials, composite sections (upper, lower, webs), and profiles of the 5-MW blade"""
+
+    basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '5MW_PreCompFiles')
+
+    materials = Orthotropic2DMaterial.listFromPreCompFile(os.path.join(basepath, 'materials.inp'))
+
+    n = len(r_str)
+    upper = [0]*n
+    lower = [0]*n
+    webs = [0]*n
+    profile = [0]*n
+
+    for i in range(n):
+        webLoc = [w[i] for w in (web1, web2, web3) if w[i] != -1]
+        upper[i], lower[i], webs[i] = CompositeSection.initFromPreCompLayupFile(
+            os.path.join(basepath, 'layup_' + str(i+1) + '.inp'), webLoc, materials)
+        profile[i] = Profile.initFromPreCompFile(os.path.join(basepath, 'shape_' + str(i+1) + '.inp'))
+
+    return materials, upper, lower, webs, profile
+
+
+def beam_properties(beam):
+    """all outputs of a PreCompSections run, as one array per output"""
+
+    p = beam.properties
+    return [p.EA, p.EIxx, p.EIyy, p.EIxy, p.GJ, p.rhoA, p.rhoJ, p.x_ec_str, p.y_ec_str,
+            beam.eps_crit_spar, beam.eps_crit_te, beam.xu_strain_spar, beam.yu_strain_spar,
+            beam.xl_strain_te, beam.yl_strain_te]
+
+
+
+class TestPreCompSections(unittest.TestCase):
+
+    def setUp(self):
+
+        materials, upper, lower, webs, profile = blade_sections()
+
+        beam = PreCompSections()
+        beam.r = 1.5 + 61.5*r_str
+        beam.chord = chord_str
+        beam.theta = np.interp(r_str, [0.0, 0.15, 1.0], [13.308, 13.308, 0.0])
+        beam.leLoc = np.interp(r_str, [0.0, 0.2, 1.0], [0.5, 0.4, 0.4])
+        beam.profile = profile
+        beam.materials = materials
+        beam.upperCS = upper
+        beam.lowerCS = lower
+        beam.websCS = webs
+        beam.sector_idx_strain_spar = [2]*len(r_str)
+        beam.sector_idx_strain_te = [3]*len(r_str)
+        self.beam = beam
+
+
+    def test1(self):
+
+        # worker processes give the same results as a serial run
+        beam = self.beam
+        beam.reuse_stations = False
+        beam.run()
+        serial = [np.copy(x) for x in beam_properties(beam)]
+
+        beam.nprocs = 2
+        beam.run()
+        pool = beam._pool._pool
+        parallel = beam_properties(beam)
+        for x, y in zip(parallel, serial):
+            np.testing.assert_array_equal(x, y)
+
+        # and the workers are kept for the next run
+        beam.run()
+        self.assertTrue(beam._pool._pool is pool)
+        beam._pool.close()
+
+
+    def test2(self):
+
+        beam = self.beam
+        beam.run()
+
+        # thicker spar cap (sector 2) at one station
+        k = 20
+        upper = list(beam.upperCS)
+        lower = list(beam.lowerCS)
+        upper[k] = upper[k].mycopy()
+        lower[k] = lower[k].mycopy()
+        upper[k].t[2] = 1.1*upper[k].t[2]
+        lower[k].t[2] = 1.1*lower[k].t[2]
+        beam.upperCS = upper
+        beam.lowerCS = lower
+
+        # only that station is solved again
+        solved = []
+        precomp_section = rotor._precomp_section
+
+        def counted(args):
+            solved.append(args[0])
+            return precomp_section(args)
+
+        rotor._precomp_section = counted
+        try:
+            beam.run()
+        finally:
+            rotor._precomp_section = precomp_section
+
+        self.assertEqual(solved, [beam.chord[k]])
+        cached = [np.copy(x) for x in beam_properties(beam)]
+
+        # and the results match solving every station from scratch
+        beam.reuse_stations = False
+        beam.run()
+        for x, y in zip(beam_properties(beam), cached):
+            np.testing.assert_array_equal(x, y)
+
+
+    def test3(self):
+
+        beam = self.beam
+        beam.reuse_stations = False
+        beam.run()
+        expected = [np.copy(x) for x in beam_properties(beam)]
+
+        # views into packed layups are read from the layups directly
+        layup = PackedLayup.fromSections(beam.upperCS)
+        self.assertEqual(rotor._preCompFormatter(layup.sections()), layup._preCompFormat)
+        self.assertNotEqual(rotor._preCompFormatter(beam.upperCS), layup._preCompFormat)
+
+        beam.upperCS = layup.sections()
+        beam.lowerCS = PackedLayup.fromSections(beam.lowerCS).sections()
+        beam.websCS = PackedLayup.fromSections(beam.websCS).sections()
+        beam.run()
+        for x, y in zip(beam_properties(beam), expected):
+            np.testing.assert_array_equal(x, y)
+
+
+class TestPackedLayup(unittest.TestCase):
+
+    def setUp(self):
+
+        materials, upper, lower, webs, profile = blade_sections()
+        self.surfaces = [upper, lower, webs]
+
+
+    def compare(self, layup, sections):
+
+        self.assertEqual(len(layup), len(sections))
+        for i, cs in enumerate(sections):
+            expected = cs._preCompFormat()
+            for x, y in zip(layup._preCompFormat(i), expected):
+                np.testing.assert_array_equal(x, y)
+            for x, y in zip(layup.section(i).mycopy()._preCompFormat(), expected):
+                np.testing.assert_array_equal(x, y)
+
+
+    def test1(self):
+
+        # the inboard stations have no shear webs
+        self.assertEqual(len(self.surfaces[2][0].theta), 0)
+
+        for sections in self.surfaces:
+            self.compare(PackedLayup.fromSections(sections), sections)
+
+
+    def test2(self):
+
+        fd, fname = tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        try:
+            for sections in self.surfaces:
+                PackedLayup.fromSections(sections).save(fname)
+                for mmap in [True, False]:
+                    layup = PackedLayup.load(fname, sections[0].materials, mmap=mmap)
+                    self.compare(layup, sections)
+                    del layup
+        finally:
+            os.remove(fname)
+
+
+
+class TestResizeCompositeSection(unittest.TestCase):
+
+    def test1(self):
+
+        materials, upper, lower, webs, profile = blade_sections()
+
+        resize = ResizeCompositeSection()
+        resize.upperCSIn = upper
+        resize.lowerCSIn = lower
+        resize.websCSIn = webs
+
+        packedU = resize.packedInputs()[0]
+        np.testing.assert_array_equal(packedU._preCompFormat(20)[3], np.concatenate(upper[20].t))
+
+        # packed once
+        self.assertIs(resize.packedInputs()[0], packedU)
+
+        # repacked when a section is replaced
+        cs = upper[20].mycopy()
+        cs.t[2][0] *= 1.1
+        resize.upperCSIn[20] = cs
+        packedU = resize.packedInputs()[0]
+        np.testing.assert_array_equal(packedU._preCompFormat(20)[3], np.concatenate(cs.t))
+
+        # and when the list is set again
+        upper = [cs.mycopy() for cs in upper]
+        upper[5].t[1][0] *= 0.9
+        resize.upperCSIn = upper
+        packedU = resize.packedInputs()[0]
+        np.testing.assert_array_equal(packedU._preCompFormat(5)[3], np.concatenate(upper[5].t))
+        self.assertIs(resize.packedInputs()[1], resize.packedInputs()[1])
+
+
+    def test2(self):
+
+        n = len(r_str)
+        results = []
+
+        for packed, lazy_scale in [(False, False), (True, False), (True, True)]:
+
+            materials, upper, lower, webs, profile = blade_sections()
+
+            resize = ResizeCompositeSection()
+            resize.upperCSIn = upper
+            resize.lowerCSIn = lower
+            resize.websCSIn = webs
+            resize.chord_str_ref = chord_str
+            resize.chord_str = chord_str*np.linspace(1.1, 0.9, n)
+            resize.sector_idx_strain_spar = [2]*n
+            resize.sector_idx_strain_te = [3]*n
+            resize.sparT_str = 1.2*np.array([np.sum(cs.t[2]) for cs in upper])
+            resize.teT_str = 0.8*np.array([np.sum(cs.t[3]) for cs in upper])
+            resize.packed = packed
+            resize.lazy_scale = lazy_scale
+            resize.run()
+
+            outputs = [resize.upperCSOut, resize.lowerCSOut, resize.websCSOut]
+            data = []
+            for sections in outputs:
+                data.append([cs._preCompFormat() for cs in sections])
+                data.append([cs.mycopy()._preCompFormat() for cs in sections])
+                data.append([layup._preCompFormat(i) for layup in [PackedLayup.fromSections(sections)]
+                             for i in range(n)])
+            data.append([resize.upperCSOut[i].compositeMatrices(2) for i in range(n)])
+            data.append([(resize.upperCSOut[i].effectiveEAxial(3),) for i in range(n)])
+            results.append(data)
+
+        # packed and lazily scaled layups match resizing copies of the sections
+        for data in results[1:]:
+            for stations, expected in zip(data, results[0]):
+                for x, y in zip(stations, expected):
+                    for xk, yk in zip(x, y):
+                        np.testing.assert_allclose(xk, yk, rtol=1e-12)
+
+
+
+    def test3(self):
+
+        n = len(r_str)
+        materials, upper, lower, webs, profile = blade_sections()
+
+        resize = ResizeCompositeSection()
+        resize.upperCSIn = upper
+        resize.lowerCSIn = lower
+        resize.websCSIn = webs
+        resize.chord_str_ref = chord_str
+        resize.sector_idx_strain_spar = [2]*n
+        resize.sector_idx_strain_te = [3]*n
+        resize.sparT_str = np.array([np.sum(cs.t[2]) for cs in upper])
+        resize.teT_str = np.array([np.sum(cs.t[3]) for cs in upper])
+        resize.packed = True
+        resize.lazy_scale = True
+
+        # lazy scale factors are applied to the layups packed on the first run (no plies are copied)
+        for scale in [1.1, 0.9]:
+            resize.chord_str = scale*chord_str
+            resize.run()
+            for sections, layup in zip([resize.upperCSOut, resize.lowerCSOut, resize.websCSOut], resize.packedInputs()):
+                self.assertIs(sections[0].layup.t, layup.t)
+
+        np.testing.assert_allclose(resize.websCSOut[20].thickness(0), 0.9*webs[20].t[0], rtol=1e-12)
+
+
+
+class TestLaminateABD(unittest.TestCase):
+
+    def setUp(self):
+
+        materials, upper, lower, webs, profile = blade_sections()
+
+        # spar cap and trailing-edge laminates of the upper surface, padded with empty laminae
+        laminates = [(cs, j) for cs in upper for j in [2, 3]]
+        m = max(len(cs.theta[j]) for cs, j in laminates)
+
+        self.laminates = laminates
+        self.t = np.zeros((len(laminates), m))
+        self.n_plies = np.zeros((len(laminates), m))
+        self.theta = np.zeros((len(laminates), m))
+        self.props = np.ones((4, len(laminates), m))
+        self.props[3] = 0.0
+
+        for i, (cs, j) in enumerate(laminates):
+            k = len(cs.theta[j])
+            mats = [cs.materials[int(idx)] for idx in cs.mat_idx[j]]
+            self.t[i, :k] = cs.t[j]
+            self.n_plies[i, :k] = cs.n_plies[j]
+            self.theta[i, :k] = cs.theta[j]
+            self.props[:, i, :k] = [[mat.E1 for mat in mats], [mat.E2 for mat in mats],
+                                    [mat.G12 for mat in mats], [mat.nu12 for mat in mats]]
+
+
+    def test1(self):
+
+        # same as compositeMatrices, one laminate at a time
+        A, B, D, H = laminateABD(self.t, self.n_plies, self.theta, *self.props)
+
+        for i, (cs, j) in enumerate(self.laminates):
+            A0, B0, D0, H0 = cs.compositeMatrices(j)
+            scale = np.max(np.abs(A0))
+            np.testing.assert_allclose(A[i], A0, rtol=1e-12, atol=1e-14*scale)
+            np.testing.assert_allclose(B[i], B0, rtol=1e-12, atol=1e-14*scale*H0)
+            np.testing.assert_allclose(D[i], D0, rtol=1e-12, atol=1e-14*scale*H0**2)
+            np.testing.assert_allclose(H[i], H0, rtol=1e-14)
+
+
+    def test2(self):
+
+        # derivatives against central differences
+        A, B, D, H, dA, dB, dD, dH = laminateABD(self.t, self.n_plies, self.theta, *self.props, derivatives=True)
+
+        for k in range(self.t.shape[1]):
+            step = np.zeros_like(self.t)
+            step[:, k] = 1e-6*np.max(self.t, axis=1)
+            fp = laminateABD(self.t + step, self.n_plies, self.theta, *self.props)
+            fm = laminateABD(self.t - step, self.n_plies, self.theta, *self.props)
+
+            h = 2*step[:, k]
+            for x, dx, xp, xm in zip([A, B, D], [dA, dB, dD], fp[:3], fm[:3]):
+                fd = (xp - xm)/h[:, np.newaxis, np.newaxis]
+                scale = np.max(np.abs(dx[:, k]))
+                np.testing.assert_allclose(dx[:, k], fd, rtol=1e-5, atol=1e-7*scale)
+            np.testing.assert_allclose(dH[:, k], (fp[3] - fm[3])/h, rtol=1e-6)
+
+
+
+class TestPanelBucklingStrain(unittest.TestCase):
+
+    def setUp(self):
+
+        materials, upper, lower, webs, profile = blade_sections()
+        self.sections = upper
+        self.chord = chord_str
+
+
+    def test1(self):
+
+        # same as the per-section compositeMatrices/effectiveEAxial loop
+        n = len(self.sections)
+
+        for j in [2, 3]:
+            eps_crit, Eaxial = panelBucklingStrain(self.sections, [j]*n, self.chord)
+
+            for i, cs in enumerate(self.sections):
+                sector_length = self.chord[i] * (cs.loc[j+1] - cs.loc[j])
+                A, B, D, totalHeight = cs.compositeMatrices(j)
+                E = cs.effectiveEAxial(j)
+                Nxx = 2 * (math.pi/sector_length)**2 * (math.sqrt(D[0, 0]*D[1, 1]) + D[0, 1] + 2*D[2, 2])
+
+                np.testing.assert_allclose(Eaxial[i], E, rtol=1e-10)
+                np.testing.assert_allclose(eps_crit[i], -Nxx/totalHeight/E, rtol=1e-10)
+
+
+    def test2(self):
+
+        # derivatives with respect to ply thickness against central differences
+        n = len(self.sections)
+        j = 2
+        eps_crit, Eaxial, deps_dt = panelBucklingStrain(self.sections, [j]*n, self.chord, derivatives=True)
+
+        for i in [10, 20, 30]:
+            for k in range(len(self.sections[i].theta[j])):
+                h = 1e-6*np.max(self.sections[i].t[j])
+                sections = list(self.sections)
+                sections[i] = self.sections[i].mycopy()
+                sections[i].t[j][k] += h
+                ep = panelBucklingStrain(sections, [j]*n, self.chord)[0]
+                sections[i].t[j][k] -= 2*h
+                em = panelBucklingStrain(sections, [j]*n, self.chord)[0]
+
+                fd = (ep[i] - em[i])/(2*h)
+                np.testing.assert_allclose(deps_dt[i][k], fd, rtol=1e-5, atol=1e-8*np.max(np.abs(deps_dt[i])))
+
+
+
+if __name__ == '__main__':
+    unittest.main()
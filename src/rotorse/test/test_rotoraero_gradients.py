@@ -8,11 +8,19 @@ Copyright (c) NREL. All rights reserved.
 """
 
 import unittest
+import os
+import copy
+import tempfile
 import numpy as np
+from scipy import sparse
+from ccblade import CCAirfoil
+from akima import Akima
 from commonse.utilities import check_gradient_unit_test, check_for_missing_unit_tests
-from rotorse.rotoraero import Coefficients, SetupRunVarSpeed, RegulatedPowerCurve, AEP
-from rotorse.rotoraerodefaults import GeometrySpline, CCBladeGeometry, CCBlade, CSMDrivetrain, \
-    WeibullCDF, WeibullWithMeanCDF, RayleighCDF
+from rotorse.rotoraero import Coefficients, SetupRunVarSpeed, RegulatedPowerCurve, AEP, AEPQuadrature, \
+    MultiSiteAEP
+from rotorse.rotoraerodefaults import GeometrySpline, CCBladeGeometry, CCBlade, CCBladeBatch, CSMDrivetrain, \
+    WeibullCDF, WeibullWithMeanCDF, RayleighCDF, EmpiricalCDF, AirfoilParameterization, _ccblade_rotor
+from rotorse.airfoilsurrogate import KrigingSurrogate, latin_hypercube
 
 
 # class TestMaxTipSpeed(unittest.TestCase):
@@ -42,6 +50,27 @@ class TestCoefficients(unittest.TestCase):
         check_gradient_unit_test(self, coeff)
 
 
+    def test2(self):
+
+        coeff = Coefficients()
+        coeff.V = np.array([12.5, 11.5574318317, 10.7470459579, 10.0428591371, 9.42527942463, 8.87925487168, 8.39303048389, 7.95729238704, 7.56456542753, 7.2087807692, 6.88496003209, 6.58898090313, 6.31740071221, 6.06732191135, 5.83628828803, 5.62220402072, 5.42326991915, 5.2379327383])
+        coeff.T = np.array([297537.442366, 287373.577926, 276842.263638, 266577.02588, 257357.173035, 249612.50174, 243430.855264, 238328.580357, 232897.327461, 226569.543695, 218948.774702, 210325.108191, 201373.59928, 192450.494842, 183749.591171, 175393.691013, 167431.667222, 159881.687873])
+        coeff.Q = np.array([2771187.76066, 2708873.98497, 2608206.05664, 2489419.14819, 2369374.79424, 2256062.60666, 2150350.91314, 2043415.20025, 1921526.97181, 1784742.05328, 1635134.27376, 1484081.73688, 1340896.38225, 1209094.24861, 1089686.69666, 982501.972978, 886537.720876, 800672.778302])
+        coeff.P = np.array([1741188.62212, 1702035.72214, 1638784.19732, 1564148.18153, 1488722.08943, 1417525.94222, 1351105.32627, 1283915.63627, 1207331.00366, 1121386.50463, 1027385.16442, 932476.05638, 842510.044742, 759696.321788, 684670.344188, 617324.196089, 557028.078207, 503077.543649])
+        coeff.R = 62.9400379597
+        coeff.rho = 1.225
+
+        coeff.run()
+        J = coeff.provideJ()
+
+        coeff.sparse_jacobian = True
+        coeff.run()
+        Jsparse = coeff.provideJ()
+
+        self.assertTrue(sparse.issparse(Jsparse))
+        np.testing.assert_allclose(Jsparse.toarray(), J)
+
+
 
 
 class TestSetupRunVarSpeed(unittest.TestCase):
@@ -58,6 +87,41 @@ class TestSetupRunVarSpeed(unittest.TestCase):
         check_gradient_unit_test(self, sr)
 
 
+    def test2(self):
+
+        sr = SetupRunVarSpeed()
+        sr.control.Vin = 3.0
+        sr.control.Vout = 25.0
+        sr.control.ratedPower = 5e6
+        sr.control.tsr = 7.55
+        sr.control.maxOmega = 12.0
+        sr.R = 62.9400379597
+        sr.npts = 12
+        sr.sampling = 'adaptive'
+
+        check_gradient_unit_test(self, sr)
+
+
+    def test3(self):
+
+        sr = SetupRunVarSpeed()
+        sr.control.Vin = 3.0
+        sr.control.Vout = 25.0
+        sr.control.tsr = 7.55
+        sr.control.maxOmega = 12.0
+        sr.R = 62.9400379597
+        sr.sampling = 'adaptive'
+
+        # smallest number of points still reaches cut-out
+        sr.npts = 3
+        sr.run()
+        self.assertEqual(len(sr.Uhub), 3)
+        self.assertAlmostEqual(sr.Uhub[-1], 25.0)
+
+        sr.npts = 2
+        self.assertRaises(ValueError, sr.run)
+
+
 
 class TestRegulatedPowerCurve(unittest.TestCase):
 
@@ -73,18 +137,105 @@ class TestRegulatedPowerCurve(unittest.TestCase):
         rpc.Vcoarse = np.array([3.0, 4.15789473684, 5.31578947368, 6.47368421053, 7.63157894737, 8.78947368421, 9.94736842105, 11.1052631579, 12.2631578947, 13.4210526316, 14.5789473684, 15.7368421053, 16.8947368421, 18.0526315789, 19.2105263158, 20.3684210526, 21.5263157895, 22.6842105263, 23.8421052632, 25.0])
         rpc.Pcoarse = np.array([22025.3984542, 165773.30206, 416646.421046, 804477.093872, 1359097.659, 2110340.45488, 3088037.81999, 4297554.655, 5634839.03406, 7014620.69097, 8243314.7876, 9151515.42199, 9805082.34125, 10369558.6255, 10906183.6245, 11403861.5527, 11836495.4076, 12179487.9734, 12422864.4516, 12564556.3923])
         rpc.Tcoarse = np.array([52447.090344, 100745.549657, 164669.981102, 244220.384676, 339396.760382, 450199.108219, 576627.428186, 690511.171188, 779190.745114, 856112.80582, 912563.587402, 948902.381907, 976338.470922, 1006515.00082, 1040084.63496, 1074759.69165, 1108268.14897, 1138947.1794, 1166201.26418, 1190149.76946])
-        rpc.Vrated = 12.0
         rpc.R = 62.9400379597
 
         rpc.Vcoarse = np.array([3.0, 4.15789473684, 5.31578947368, 6.47368421053, 7.63157894737, 8.78947368421, 9.94736842105, 11.1052631579, 12.2631578947, 13.4210526316, 14.5789473684, 15.7368421053, 16.8947368421, 18.0526315789, 19.2105263158, 20.3684210526, 21.5263157895, 22.6842105263, 23.8421052632, 25.0])
         rpc.Tcoarse = np.ones_like(rpc.Vcoarse)
         rpc.Pcoarse = np.array([22143.0308767, 166086.474653, 417300.856162, 805659.094773, 1361034.10985, 2113298.82078, 3092326.1469, 4286358.61399, 5591725.34132, 6937129.28979, 8125185.26458, 8984885.40408, 9593871.7193, 10123953.8042, 10633976.0967, 11108130.4757, 11519828.4787, 11844353.1304, 12071672.597, 12199492.6409])
-        rpc.Vrated = 11.7420119076
 
         # check_gradient_unit_test(self, rpc, tol=1e-6, display=True)
         check_gradient_unit_test(self, rpc, tol=3e-5, display=False)
 
 
+    def test2(self):
+
+        rpc = RegulatedPowerCurve()
+        rpc.control.Vin = 3.0
+        rpc.control.Vout = 25.0
+        rpc.control.ratedPower = 5e6
+        rpc.control.tsr = 7.5
+        rpc.control.pitch = 0.0
+        rpc.control.maxOmega = 12.0
+        rpc.Vcoarse = np.array([3.0, 4.15789473684, 5.31578947368, 6.47368421053, 7.63157894737, 8.78947368421, 9.94736842105, 11.1052631579, 12.2631578947, 13.4210526316, 14.5789473684, 15.7368421053, 16.8947368421, 18.0526315789, 19.2105263158, 20.3684210526, 21.5263157895, 22.6842105263, 23.8421052632, 25.0])
+        rpc.Tcoarse = np.array([52447.090344, 100745.549657, 164669.981102, 244220.384676, 339396.760382, 450199.108219, 576627.428186, 690511.171188, 779190.745114, 856112.80582, 912563.587402, 948902.381907, 976338.470922, 1006515.00082, 1040084.63496, 1074759.69165, 1108268.14897, 1138947.1794, 1166201.26418, 1190149.76946])
+        rpc.Pcoarse = np.array([22143.0308767, 166086.474653, 417300.856162, 805659.094773, 1361034.10985, 2113298.82078, 3092326.1469, 4286358.61399, 5591725.34132, 6937129.28979, 8125185.26458, 8984885.40408, 9593871.7193, 10123953.8042, 10633976.0967, 11108130.4757, 11519828.4787, 11844353.1304, 12071672.597, 12199492.6409])
+        rpc.R = 62.9400379597
+
+        rpc.run()
+        self.assertAlmostEqual(rpc.ratedConditions.V, 11.7420119076, 4)
+
+        check_gradient_unit_test(self, rpc, tol=3e-5, display=False)
+
+
+    def test3(self):
+
+        rpc = RegulatedPowerCurve()
+        rpc.control.Vin = 3.0
+        rpc.control.Vout = 25.0
+        rpc.control.tsr = 7.5
+        rpc.control.pitch = 0.0
+        rpc.control.maxOmega = 12.0
+        rpc.Vcoarse = np.linspace(3.0, 25.0, 12)
+        rpc.Tcoarse = np.ones(12)
+        rpc.Pcoarse = 1e5*rpc.Vcoarse
+        rpc.R = 62.9400379597
+
+        # never reaches rated power: cut-out speed
+        rpc.control.ratedPower = 5e6
+        rpc.run()
+        self.assertEqual(rpc.ratedConditions.V, 25.0)
+
+        # above rated power everywhere: also cut-out speed (what the Brent solver returned)
+        rpc.control.ratedPower = 1e5
+        rpc.run()
+        self.assertEqual(rpc.ratedConditions.V, 25.0)
+
+
+    def test4(self):
+
+        rpc = RegulatedPowerCurve()
+        rpc.control.Vin = 3.0
+        rpc.control.Vout = 25.0
+        rpc.control.ratedPower = 5e6
+        rpc.control.tsr = 7.5
+        rpc.control.pitch = 0.0
+        rpc.control.maxOmega = 12.0
+        rpc.Vcoarse = np.array([3.0, 4.15789473684, 5.31578947368, 6.47368421053, 7.63157894737, 8.78947368421, 9.94736842105, 11.1052631579, 12.2631578947, 13.4210526316, 14.5789473684, 15.7368421053, 16.8947368421, 18.0526315789, 19.2105263158, 20.3684210526, 21.5263157895, 22.6842105263, 23.8421052632, 25.0])
+        rpc.Tcoarse = np.ones_like(rpc.Vcoarse)
+        rpc.Pcoarse = np.array([22143.0308767, 166086.474653, 417300.856162, 805659.094773, 1361034.10985, 2113298.82078, 3092326.1469, 4286358.61399, 5591725.34132, 6937129.28979, 8125185.26458, 8984885.40408, 9593871.7193, 10123953.8042, 10633976.0967, 11108130.4757, 11519828.4787, 11844353.1304, 12071672.597, 12199492.6409])
+        rpc.R = 62.9400379597
+
+        rpc.run()
+        J = rpc.provideJ()
+
+        rpc.sparse_jacobian = True
+        rpc.run()
+        Jsparse = rpc.provideJ()
+
+        self.assertTrue(sparse.issparse(Jsparse))
+        np.testing.assert_allclose(Jsparse.toarray(), J)
+
+
+    def test5(self):
+
+        rpc = RegulatedPowerCurve()
+        rpc.control.Vin = 3.0
+        rpc.control.Vout = 25.0
+        rpc.control.tsr = 7.5
+        rpc.control.pitch = 0.0
+        rpc.control.maxOmega = 12.0
+        rpc.Vcoarse = np.linspace(3.0, 25.0, 12)
+        rpc.Tcoarse = np.ones(12)
+        rpc.Pcoarse = 1e6*np.array([0.1, 0.4, 1.0, 2.0, 3.3, 4.6, 4.8, 4.6, 4.3, 4.0, 3.8, 3.6])
+        rpc.R = 62.9400379597
+
+        # every knot is below rated power, but the spline peaks above it between 13 and 15 m/s
+        rpc.control.ratedPower = 4.85e6
+        rpc.run()
+        self.assertGreater(rpc.ratedConditions.V, 13.0)
+        self.assertLess(rpc.ratedConditions.V, 15.0)
+        self.assertAlmostEqual(rpc.P[rpc.npts/2 - 1]/rpc.control.ratedPower, 1.0, 8)
+
 
 
 class TestAEP(unittest.TestCase):
@@ -99,6 +250,148 @@ class TestAEP(unittest.TestCase):
         check_gradient_unit_test(self, aep, step_size=1)  # larger step size b.c. AEP is big value
 
 
+    def test2(self):
+
+        aep = AEP()
+        aep.CDF_V = 1.0 - np.exp(-(np.linspace(3.0, 25.0, 50)/10.0)**2)
+        aep.P = np.minimum(5e6, 1e3*np.linspace(3.0, 25.0, 50)**3)
+        aep.lossFactor = 0.95
+
+        aep.run()
+        J = aep.provideJ()
+
+        aep.sparse_jacobian = True
+        aep.run()
+        Jsparse = aep.provideJ()
+
+        self.assertTrue(sparse.issparse(Jsparse))
+        np.testing.assert_allclose(Jsparse.toarray(), J)
+
+
+
+class TestAEPQuadrature(unittest.TestCase):
+
+    def test1(self):
+
+        aep = AEPQuadrature()
+        aep.Vcoarse = np.array([3.0, 4.15789473684, 5.31578947368, 6.47368421053, 7.63157894737, 8.78947368421, 9.94736842105, 11.1052631579, 12.2631578947, 13.4210526316, 14.5789473684, 15.7368421053, 16.8947368421, 18.0526315789, 19.2105263158, 20.3684210526, 21.5263157895, 22.6842105263, 23.8421052632, 25.0])
+        aep.Pcoarse = np.array([22143.0308767, 166086.474653, 417300.856162, 805659.094773, 1361034.10985, 2113298.82078, 3092326.1469, 4286358.61399, 5591725.34132, 6937129.28979, 8125185.26458, 8984885.40408, 9593871.7193, 10123953.8042, 10633976.0967, 11108130.4757, 11519828.4787, 11844353.1304, 12071672.597, 12199492.6409])
+        aep.Vrated = 11.7420119076
+        aep.Vin = 2.9  # keeps the cut-in speed off the first spline knot so finite differences are one-sided
+        aep.Vout = 25.0
+        aep.ratedPower = 5e6
+        aep.lossFactor = 0.95
+        aep.xbar = 10.0
+
+        check_gradient_unit_test(self, aep, step_size=1e-4, tol=1e-5)
+
+
+    def test2(self):
+
+        aep = AEPQuadrature()
+        aep.Vcoarse = np.array([3.0, 4.15789473684, 5.31578947368, 6.47368421053, 7.63157894737, 8.78947368421, 9.94736842105, 11.1052631579, 12.2631578947, 13.4210526316, 14.5789473684, 15.7368421053, 16.8947368421, 18.0526315789, 19.2105263158, 20.3684210526, 21.5263157895, 22.6842105263, 23.8421052632, 25.0])
+        aep.Pcoarse = np.array([22143.0308767, 166086.474653, 417300.856162, 805659.094773, 1361034.10985, 2113298.82078, 3092326.1469, 4286358.61399, 5591725.34132, 6937129.28979, 8125185.26458, 8984885.40408, 9593871.7193, 10123953.8042, 10633976.0967, 11108130.4757, 11519828.4787, 11844353.1304, 12071672.597, 12199492.6409])
+        aep.Vrated = 11.7420119076
+        aep.Vin = 3.0
+        aep.Vout = 25.0
+        aep.ratedPower = 5e6
+        aep.lossFactor = 0.95
+        aep.xbar = 10.0
+        aep.pdf_type = 'weibull'
+        aep.k = 2.3
+        aep.run()
+
+        # trapezoidal integration on a very fine regulated power curve
+        spline = Akima(aep.Vcoarse, aep.Pcoarse)
+        V2 = np.linspace(aep.Vin, aep.Vrated, 20000)
+        V3 = np.linspace(aep.Vrated, aep.Vout, 20000)
+        P = np.concatenate([spline.interp(V2)[0], aep.ratedPower*np.ones(len(V3)-1)])
+        cdf = WeibullWithMeanCDF()
+        cdf.x = np.concatenate([V2, V3[1:]])
+        cdf.xbar = aep.xbar
+        cdf.k = aep.k
+        cdf.run()
+        AEPfine = aep.lossFactor*np.trapz(P, cdf.F)/1e3*365.0*24.0
+
+        self.assertAlmostEqual(aep.AEP/AEPfine, 1.0, 6)
+
+
+
+class TestMultiSiteAEP(unittest.TestCase):
+
+    def setUp(self):
+
+        self.aep = MultiSiteAEP()
+        self.aep.V = np.linspace(3.0, 25.0, 40)
+        self.aep.P = np.minimum(5e6, 3e3*self.aep.V**3)
+        self.aep.lossFactor = 0.95
+
+    def test1(self):
+
+        aep = self.aep
+        aep.A = np.array([7.0, 8.0, 9.5])
+        aep.k = np.array([1.8, 2.0, 2.4])
+        aep.run()
+
+        # same as integrating each site separately
+        for i in range(len(aep.A)):
+            F = 1.0 - np.exp(-(aep.V/aep.A[i])**aep.k[i])
+            self.assertAlmostEqual(aep.AEP[i]/(aep.lossFactor*np.trapz(aep.P, F)/1e3*365.0*24.0), 1.0, 10)
+
+        check_gradient_unit_test(self, aep, step_size=1e-4, tol=1e-5)
+
+    def test2(self):
+
+        aep = self.aep
+        aep.distribution = 'histogram'
+        aep.bin_edges = np.arange(0.3, 30.4, 1.0)
+        aep.frequency = np.random.RandomState(0).rand(3, 30)
+
+        check_gradient_unit_test(self, aep, step_size=1e-4, tol=1e-5)
+
+
+
+class TestAirfoilParameterization(unittest.TestCase):
+
+    def test1(self):
+
+        # surrogate of two CST weights, alpha, and log10(Re)
+        X = latin_hypercube(40, [0.1, -0.2, -20.0, 5.5], [0.3, -0.1, 20.0, 6.5], seed=0)
+        Y = np.zeros((len(X), 3))
+        Y[:, 0] = 0.1*X[:, 2] + 2*X[:, 0]*np.sin(0.1*X[:, 2]) + X[:, 1]
+        Y[:, 1] = 0.01 + 0.05*X[:, 0]**2 + 1e-4*X[:, 2]**2
+        Y[:, 2] = -0.1*X[:, 1]
+
+        fd, fname = tempfile.mkstemp(suffix='.npz')
+        os.close(fd)
+        KrigingSurrogate.train('CST', X, Y, thetas=[5.0]).save(fname)
+
+        ap = AirfoilParameterization()
+        ap.airfoil_analysis_tool = 'Surrogate'
+        ap.airfoil_parameterization_type = 'CST'
+        ap.airfoil_surrogate = fname
+        ap.airfoil_parameters = np.array([np.linspace(0.12, 0.28, 6), np.linspace(-0.18, -0.12, 6)])
+
+        try:
+            ap.run()
+            J = ap.provideJ()
+
+            P = ap.airfoil_parameters.copy()
+            h = 1e-6
+            for k in range(P.size):
+                f = []
+                for step in [h, -h]:
+                    Pk = P.copy()
+                    Pk.flat[k] += step
+                    ap.airfoil_parameters = Pk
+                    ap.run()
+                    f.append(np.concatenate([ap.cl_polar.flatten(), ap.cd_polar.flatten()]))
+                np.testing.assert_allclose(J[:, k], (f[0] - f[1])/(2*h), rtol=1e-5, atol=1e-6)
+        finally:
+            os.remove(fname)
+
+
+
 
 class TestGeometrySpline(unittest.TestCase):
 
@@ -244,6 +537,105 @@ class TestCCBlade(unittest.TestCase):
 
 
 
+@unittest.skip("CCBlade test takes a long time")
+class TestCCBladeBatch(unittest.TestCase):
+
+    def setUp(self):
+
+        self.ccblade = ccblade = CCBladeBatch(nloads=2, npower=2)
+        ccblade.r = np.array([2.8667, 5.6000, 8.3333, 11.7500, 15.8500, 19.9500, 24.0500,
+                  28.1500, 32.2500, 36.3500, 40.4500, 44.5500, 48.6500, 52.7500,
+                  56.1667, 58.9000, 61.6333])
+        ccblade.chord = np.array([3.542, 3.854, 4.167, 4.557, 4.652, 4.458, 4.249, 4.007, 3.748,
+                      3.502, 3.256, 3.010, 2.764, 2.518, 2.313, 2.086, 1.419])
+        ccblade.theta = np.array([13.308, 13.308, 13.308, 13.308, 11.480, 10.162, 9.011, 7.795,
+                      6.544, 5.361, 4.188, 3.125, 2.319, 1.526, 0.863, 0.370, 0.106])
+        ccblade.Rhub = 1.5
+        ccblade.Rtip = 63.0
+        ccblade.hubHt = 80.0
+        ccblade.precone = 2.5
+        ccblade.tilt = -5.0
+        ccblade.yaw = 0.0
+        ccblade.B = 3
+        ccblade.rho = 1.225
+        ccblade.mu = 1.81206e-5
+        ccblade.shearExp = 0.2
+        ccblade.nSector = 4
+
+        # airfoils
+        basepath = '/Users/sning/Dropbox/NREL/5MW_files/5MW_AFFiles/'
+
+        # load all airfoils
+        airfoil_types = [0]*8
+        airfoil_types[0] = CCAirfoil.initFromAerodynFile(basepath + 'Cylinder1.dat')
+        airfoil_types[1] = CCAirfoil.initFromAerodynFile(basepath + 'Cylinder2.dat')
+        airfoil_types[2] = CCAirfoil.initFromAerodynFile(basepath + 'DU40_A17.dat')
+        airfoil_types[3] = CCAirfoil.initFromAerodynFile(basepath + 'DU35_A17.dat')
+        airfoil_types[4] = CCAirfoil.initFromAerodynFile(basepath + 'DU30_A17.dat')
+        airfoil_types[5] = CCAirfoil.initFromAerodynFile(basepath + 'DU25_A17.dat')
+        airfoil_types[6] = CCAirfoil.initFromAerodynFile(basepath + 'DU21_A17.dat')
+        airfoil_types[7] = CCAirfoil.initFromAerodynFile(basepath + 'NACA64_A17.dat')
+
+        # place at appropriate radial stations
+        af_idx = [0, 0, 1, 2, 3, 3, 4, 5, 5, 6, 6, 7, 7, 7, 7, 7, 7]
+
+        n = len(ccblade.r)
+        af = [0]*n
+        for i in range(n):
+            af[i] = airfoil_types[af_idx[i]]
+
+        ccblade.af = af
+
+        ccblade.V_load = np.array([12.0, 70.0])
+        ccblade.Omega_load = np.array([10.0, 0.0])
+        ccblade.pitch_load = np.array([0.0, 0.0])
+        ccblade.azimuth_load = np.array([180.0, 0.0])
+        ccblade.Uhub = np.array([70.0, 70.0])
+        ccblade.Omega = np.array([0.0, 0.0])
+        ccblade.pitch = np.array([0.0, 90.0])
+
+
+    def test1(self):
+
+        check_gradient_unit_test(self, self.ccblade, tol=1e-5, display=True)
+
+
+    def test2(self):
+
+        ccblade = self.ccblade
+        ccblade.run()
+        J = ccblade.provideJ()
+
+        # lazy derivatives are computed in provideJ without touching the outputs
+        ccblade.lazy_derivatives = True
+        ccblade.run()
+        P = ccblade.P
+        Px = ccblade.loads1.Px
+        Jlazy = ccblade.provideJ()
+
+        self.assertTrue(ccblade.P is P)
+        self.assertTrue(ccblade.loads1.Px is Px)
+        np.testing.assert_allclose(Jlazy, J, rtol=1e-12, atol=1e-12)
+
+
+    def test3(self):
+
+        ccblade = self.ccblade
+        ccblade.run()
+        rotor = _ccblade_rotor(ccblade)
+
+        # the cached rotor is reused for new airfoil objects with the same data
+        ccblade.af = copy.deepcopy(ccblade.af)
+        self.assertTrue(_ccblade_rotor(ccblade) is rotor)
+
+        # and rebuilt when the airfoil data change
+        af = list(ccblade.af)
+        af[10] = af[2]
+        ccblade.af = af
+        self.assertFalse(_ccblade_rotor(ccblade) is rotor)
+
+
+
 class TestCSMDrivetrain(unittest.TestCase):
 
     def test1(self):
@@ -322,6 +714,26 @@ class TestRayleighCDF(unittest.TestCase):
 
 
 
+class TestEmpiricalCDF(unittest.TestCase):
+
+    def test1(self):
+
+        fd, fname = tempfile.mkstemp(suffix='.npy')
+        os.close(fd)
+        np.save(fname, 8.0*np.random.RandomState(0).weibull(2.0, 100000))
+
+        ecdf = EmpiricalCDF()
+        ecdf.wind_file = fname
+        ecdf.x = np.linspace(3.0, 25.0, 50)
+
+        try:
+            check_gradient_unit_test(self, ecdf, tol=1e-5)
+            self.assertAlmostEqual(ecdf.F[-1], 1.0, 3)
+        finally:
+            os.remove(fname)
+
+
+
 if __name__ == '__main__':
     import rotorse.rotoraero
     import rotorse.rotoraerodefaults
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+test_vectorbem.py
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import unittest
+import os
+import warnings
+import numpy as np
+from ccblade import CCAirfoil, CCBlade as CCBlade_PY
+from rotorse.vectorbem import VectorizedBEM, _illinois
+
+
+class TestVectorizedBEM(unittest.TestCase):
+    """compare against ccblade.CCBlade for the NREL 5-MW rotor"""
+
+    def setUp(self):
+
+        self.r = np.array([2.8667, 5.6000, 8.3333, 11.7500, 15.8500, 19.9500, 24.0500,
+                           28.1500, 32.2500, 36.3500, 40.4500, 44.5500, 48.6500, 52.7500,
+                           56.1667, 58.9000, 61.6333])
+        self.chord = np.array([3.542, 3.854, 4.167, 4.557, 4.652, 4.458, 4.249, 4.007, 3.748,
+                               3.502, 3.256, 3.010, 2.764, 2.518, 2.313, 2.086, 1.419])
+        self.theta = np.array([13.308, 13.308, 13.308, 13.308, 11.480, 10.162, 9.011, 7.795,
+                               6.544, 5.361, 4.188, 3.125, 2.319, 1.526, 0.863, 0.370, 0.106])
+
+        basepath = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '5MW_AFFiles')
+        names = ['Cylinder1', 'Cylinder2', 'DU40_A17', 'DU35_A17', 'DU30_A17', 'DU25_A17',
+                 'DU21_A17', 'NACA64_A17']
+        airfoil_types = [CCAirfoil.initFromAerodynFile(os.path.join(basepath, name + '.dat'))
+                         for name in names]
+        af_idx = [0, 0, 1, 2, 3, 3, 4, 5, 5, 6, 6, 7, 7, 7, 7, 7, 7]
+        self.af = [airfoil_types[i] for i in af_idx]
+
+        # power curve, parked (pitched and feathered), and reversed rotation
+        # (inflow angles beyond 90 deg and below 0 at the outboard stations)
+        self.Uinf = np.array([3.0, 7.0, 11.0, 15.0, 25.0, 70.0, 70.0, 8.0])
+        self.Omega = np.array([6.97, 9.6, 12.1, 12.1, 12.1, 0.0, 0.0, -12.0])
+        self.pitch = np.array([0.0, 0.0, 0.0, 8.7, 23.5, 0.0, 90.0, 0.0])
+
+
+    def compare(self, **options):
+
+        args = (self.r, self.chord, self.theta, self.af, 1.5, 63.0, 3, 1.225, 1.81206e-5,
+                2.5, -5.0, 0.0, 0.2, 90.0, 4)
+        ccblade = CCBlade_PY(*args, derivatives=False, **options)
+        vbem = VectorizedBEM(*args, **options)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # stations with no solution, in both codes
+
+            P, T, Q = vbem.evaluate(self.Uinf, self.Omega, self.pitch)
+            CP, CT, CQ = vbem.evaluate(self.Uinf, self.Omega, self.pitch, coefficient=True)
+            Np, Tp = vbem.distributedAeroLoads(self.Uinf, self.Omega, self.pitch, 30.0)
+
+            P0, T0, Q0 = ccblade.evaluate(self.Uinf, self.Omega, self.pitch)
+            CP0, CT0, CQ0 = ccblade.evaluate(self.Uinf, self.Omega, self.pitch, coefficient=True)
+
+            for i in range(len(self.Uinf)):
+                Np0, Tp0 = ccblade.distributedAeroLoads(self.Uinf[i], self.Omega[i], self.pitch[i], 30.0)
+                np.testing.assert_allclose(Np[i], Np0, rtol=1e-6, atol=1e-6)
+                np.testing.assert_allclose(Tp[i], Tp0, rtol=1e-6, atol=1e-6)
+
+        np.testing.assert_allclose(P, P0, rtol=1e-6, atol=1e-3)
+        np.testing.assert_allclose(T, T0, rtol=1e-6, atol=1e-3)
+        np.testing.assert_allclose(Q, Q0, rtol=1e-6, atol=1e-3)
+        np.testing.assert_allclose(CP, CP0, rtol=1e-6, atol=1e-9)
+
+
+    def test1(self):
+
+        self.compare()
+
+
+    def test2(self):
+
+        self.compare(tiploss=False, hubloss=False)
+
+
+    def test3(self):
+
+        self.compare(wakerotation=False, usecd=False)
+
+
+
+class TestIllinois(unittest.TestCase):
+
+    def test1(self):
+
+        c = np.array([0.5, 2.0, -1.0])
+        f = lambda x: x**2 - c  # no real root for the last element
+        lo = np.zeros(3)
+        hi = 2*np.ones(3)
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            x = _illinois(f, lo, hi, f(lo), f(hi))
+
+        np.testing.assert_allclose(x[:2], np.sqrt(c[:2]), rtol=1e-12)
+        self.assertTrue(np.isnan(x[2]))  # not bracketed
+        self.assertEqual(len(w), 0)
+
+
+    def test2(self):
+
+        f = lambda x: np.tanh(50*(x - 0.3)) + 1e-3*x
+        lo = np.array([0.0])
+        hi = np.array([1.0])
+
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter('always')
+            x = _illinois(f, lo, hi, f(lo), f(hi), maxiter=2)
+
+        self.assertEqual(len(w), 1)  # reported, not silent
+
+
+
+if __name__ == '__main__':
+    unittest.main()
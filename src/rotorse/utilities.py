@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+utilities.py
+
+Helpers shared by the aero and structural components.
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import numpy as np
+import hashlib
+import multiprocessing
+
+
+class WorkerPool(object):
+    """a pool of worker processes that is kept alive between calls to map, so a
+    component that runs in parallel on every execute only starts its workers once.
+    The workers are started on first use and restarted if nprocs changes.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._nprocs = 0
+
+
+    def map(self, func, args, nprocs):
+        """map func over args, using nprocs worker processes if nprocs > 1.
+        Results are returned in the same order as args."""
+
+        args = list(args)
+        if nprocs <= 1 or len(args) <= 1:
+            return map(func, args)
+
+        if self._pool is None or self._nprocs != nprocs:
+            self.close()
+            self._pool = multiprocessing.Pool(processes=nprocs)
+            self._nprocs = nprocs
+
+        try:
+            return self._pool.map(func, args)
+        except:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+            raise
+
+
+    def close(self):
+        """stop the worker processes (they are restarted by the next map)"""
+
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+    def __getstate__(self):
+        # worker processes cannot be copied or pickled, a copy starts its own
+        return {'_pool': None, '_nprocs': 0}
+
+
+
+def parallel_map(func, args, nprocs):
+    """map func over args, using a pool of nprocs worker processes if nprocs > 1
+    that is shut down afterwards.  Results are returned in the same order as args."""
+
+    pool = WorkerPool()
+    try:
+        return pool.map(func, args, nprocs)
+    finally:
+        pool.close()
+
+
+
+def hash_arrays(*args):
+    """sha1 fingerprint of a sequence of arrays, lists, numbers, or strings"""
+
+    h = hashlib.sha1()
+    for a in args:
+        if isinstance(a, basestring):
+            h.update(a)
+        else:
+            a = np.asarray(a)
+            h.update(a.dtype.str)
+            h.update(str(a.shape))
+            h.update(a.tostring())
+
+    return h.hexdigest()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# encoding: utf-8
+"""
+vectorbem.py
+
+Blade element momentum analysis vectorized over sections, operating points,
+and azimuthal sectors.  Follows the same equations as CCBlade (wind
+components, Buhl-corrected induction factors, thrust/torque integration along
+the curved blade), but solves for the inflow angle of every (operating point,
+sector, section) combination at once with a bracketed Illinois iteration
+rather than one Brent solve per section.
+
+Copyright (c) NREL. All rights reserved.
+"""
+
+import warnings
+import numpy as np
+from math import pi
+
+
+def define_curvature(r, precurve, presweep, precone):
+    """azimuthal coordinates, local cone angle, and path length along the blade
+    (precone in radians)"""
+
+    x_az = -r*np.sin(precone) + precurve*np.cos(precone)
+    z_az = r*np.cos(precone) + precurve*np.sin(precone)
+    y_az = presweep
+
+    dcone = np.arctan2(-np.diff(x_az), np.diff(z_az))
+    cone = np.zeros_like(r)
+    cone[0] = dcone[0]
+    cone[1:-1] = 0.5*(dcone[:-1] + dcone[1:])
+    cone[-1] = dcone[-1]
+
+    s = np.concatenate([[0.0], np.cumsum(np.sqrt(np.diff(precurve)**2 + np.diff(presweep)**2 + np.diff(r)**2))])
+
+    return x_az, y_az, z_az, cone, s
+
+
+def wind_components(r, precurve, presweep, precone, yaw, tilt, azimuth, Uinf, Omega, hubHt, shearExp):
+    """axial and tangential velocity at each section for arrays of operating points
+
+    Parameters
+    ----------
+    r, precurve, presweep : ndarray (n,)
+        blade geometry
+    precone, yaw, tilt : float (rad)
+    azimuth, Uinf, Omega : ndarray (m,)
+        azimuth (rad), hub height wind speed (m/s), and rotation speed (rpm) of each case
+    hubHt, shearExp : float
+
+    Returns
+    -------
+    Vx, Vy : ndarray (m, n)
+
+    """
+
+    sy = np.sin(yaw)
+    cy = np.cos(yaw)
+    st = np.sin(tilt)
+    ct = np.cos(tilt)
+    sa = np.sin(azimuth)[:, np.newaxis]
+    ca = np.cos(azimuth)[:, np.newaxis]
+    Omega = (Omega*pi/30.0)[:, np.newaxis]
+    Uinf = Uinf[:, np.newaxis]
+
+    x_az, y_az, z_az, cone, s = define_curvature(r, precurve, presweep, precone)
+    sc = np.sin(cone)
+    cc = np.cos(cone)
+
+    heightFromHub = (y_az*sa + z_az*ca)*ct - x_az*st
+    V = Uinf*(1.0 + heightFromHub/hubHt)**shearExp
+
+    Vwind_x = V*((cy*st*ca + sy*sa)*sc + cy*ct*cc)
+    Vwind_y = V*(cy*st*sa - sy*ca)
+    Vrot_x = -Omega*y_az*sc
+    Vrot_y = Omega*z_az
+
+    return Vwind_x + Vrot_x, Vwind_y + Vrot_y
+
+
+def induction_factors(r, chord, Rhub, Rtip, phi, cl, cd, B, Vx, Vy,
+                      usecd=True, hubloss=True, tiploss=True, wakerotation=True):
+    """residual of the BEM equations and the induction factors (arrays of any common shape)"""
+
+    sigma_p = B/2.0/pi*chord/r
+    sphi = np.sin(phi)
+    cphi = np.cos(phi)
+
+    if usecd:
+        cn = cl*cphi + cd*sphi
+        ct = cl*sphi - cd*cphi
+    else:
+        cn = cl*cphi
+        ct = cl*sphi
+
+    # Prandtl's tip and hub loss factors
+    F = 1.0
+    if tiploss:
+        factortip = B/2.0*(Rtip - r)/(r*np.abs(sphi))
+        F = F*2.0/pi*np.arccos(np.exp(-factortip))
+    if hubloss:
+        factorhub = B/2.0*(r - Rhub)/(Rhub*np.abs(sphi))
+        F = F*2.0/pi*np.arccos(np.exp(-factorhub))
+
+    k = sigma_p*cn/4.0/F/sphi/sphi
+    kp = sigma_p*ct/4.0/F/sphi/cphi
+
+    # axial induction: momentum, Buhl's empirical correction, or propeller brake
+    g1 = 2.0*F*k - (10.0/9 - F)
+    g2 = np.maximum(2.0*F*k - (4.0/3 - F)*F, 0.0)
+    g3 = 2.0*F*k - (25.0/9 - 2*F)
+    small = np.abs(g3) < 1e-6
+    g3 = np.where(small, 1.0, g3)
+    a_buhl = np.where(small, 1.0 - 1.0/2.0/np.sqrt(np.where(small, g2, 1.0)), (g1 - np.sqrt(g2))/g3)
+    a_momentum = np.where(k <= 2.0/3.0, k/(1 + k), a_buhl)
+    a_brake = np.where(k > 1.0, k/(k - 1.0), 0.0)
+    a = np.where(phi > 0, a_momentum, a_brake)
+
+    ap = kp/(1.0 - kp)
+    if not wakerotation:
+        ap = 0*ap
+        kp = 0*kp
+
+    lambda_r = Vy/Vx
+    fzero = np.where(phi > 0, sphi/(1.0 - a) - cphi/lambda_r*(1.0 - kp),
+                     sphi*(1.0 - k) - cphi/lambda_r*(1.0 - kp))
+
+    return fzero, a, ap
+
+
+def _illinois(f, lo, hi, flo, fhi, xtol=2e-12, rtol=4*np.finfo(float).eps, maxiter=100):
+    """bracketed root of f for every element of lo/hi at once (Illinois variant of regula falsi).
+    Elements without a sign change between lo and hi are not iterated on and are
+    returned as nan, and a warning is issued for any element still not converged
+    after maxiter iterations."""
+
+    bracketed = flo*fhi <= 0
+    x = lo.copy()
+    side = np.zeros(lo.shape, dtype=int)
+
+    for it in range(maxiter):
+
+        # elements without a bracket stay at lo
+        x_old = x
+        x = np.where(bracketed, (lo*fhi - hi*flo)/np.where(bracketed, fhi - flo, 1.0), lo)
+        fx = np.where(bracketed, f(x), 0.0)
+
+        # keep the sign change, and halve the stale end when the same end is replaced twice
+        right = fx*flo > 0
+        lo = np.where(right, x, lo)
+        hi = np.where(right, hi, x)
+        flo = np.where(right, fx, np.where(side == -1, flo/2, flo))
+        fhi = np.where(right, np.where(side == 1, fhi/2, fhi), fx)
+        side = np.where(right, 1, -1)
+
+        converged = (np.abs(x - x_old) < xtol + rtol*np.abs(x)) | (fx == 0)
+        if np.all(converged):
+            break
+
+    if not np.all(converged):
+        warnings.warn('inflow angle not converged after %d iterations at %d of %d sections'
+                      % (maxiter, np.count_nonzero(np.logical_not(converged)), converged.size))
+
+    return np.where(bracketed, x, np.nan)
+
+
+class VectorizedBEM(object):
+    """BEM analysis of a rotor at many operating points at once.  Inputs and
+    conventions are those of ccblade.CCBlade (angles in degrees, Omega in rpm)."""
+
+    def __init__(self, r, chord, theta, af, Rhub, Rtip, B=3, rho=1.225, mu=1.81206e-5,
+                 precone=0.0, tilt=0.0, yaw=0.0, shearExp=0.2, hubHt=80.0, nSector=8,
+                 precurve=None, precurveTip=0.0, tiploss=True, hubloss=True,
+                 wakerotation=True, usecd=True):
+
+        self.r = np.array(r, dtype=float)
+        self.chord = np.array(chord, dtype=float)
+        self.theta = np.radians(theta)
+        self.Rhub = float(Rhub)
+        self.Rtip = float(Rtip)
+        self.B = B
+        self.rho = rho
+        self.mu = mu
+        self.precone = np.radians(precone)
+        self.tilt = np.radians(tilt)
+        self.yaw = np.radians(yaw)
+        self.shearExp = shearExp
+        self.hubHt = hubHt
+        self.precurveTip = precurveTip
+        self.rotorR = Rtip*np.cos(self.precone) + precurveTip*np.sin(self.precone)
+
+        # an axisymmetric inflow needs only one sector
+        if tilt == 0.0 and yaw == 0.0 and shearExp == 0.0:
+            self.nSector = 1
+        else:
+            self.nSector = max(4, nSector)
+        self.precurve = np.zeros_like(self.r) if precurve is None else np.array(precurve, dtype=float)
+        self.presweep = np.zeros_like(self.r)
+        self.options = dict(usecd=usecd, hubloss=hubloss, tiploss=tiploss, wakerotation=wakerotation)
+
+        # sections sharing an airfoil are evaluated together
+        groups = {}
+        for i, airfoil in enumerate(af):
+            groups.setdefault(id(airfoil), (airfoil, []))[1].append(i)
+        self.groups = [(airfoil, np.array(idx)) for airfoil, idx in groups.values()]
+
+        # curvature including hub and tip, for integrating thrust and torque
+        rfull = np.concatenate([[self.Rhub], self.r, [self.Rtip]])
+        curvefull = np.concatenate([[0.0], self.precurve, [self.precurveTip]])
+        x_az, y_az, self.z_full, self.cone_full, self.s_full = \
+            define_curvature(rfull, curvefull, np.zeros_like(rfull), self.precone)
+
+
+    def _airfoils(self, alpha, Re):
+        """cl and cd of each section (alpha in radians, arrays of shape (m, n))"""
+
+        cl = np.zeros_like(alpha)
+        cd = np.zeros_like(alpha)
+        for airfoil, idx in self.groups:
+            a = alpha[:, idx]
+            cl_g, cd_g = airfoil.evaluate(a.ravel(), Re[:, idx].ravel())
+            cl[:, idx] = np.reshape(cl_g, a.shape)
+            cd[:, idx] = np.reshape(cd_g, a.shape)
+
+        return cl, cd
+
+
+    def _residual(self, phi, Vx, Vy, twist):
+        """BEM residual, evaluated (as in CCBlade) with the airfoil data at zero induction"""
+
+        alpha = phi - twist
+        Re = self.rho*np.sqrt(Vx**2 + Vy**2)*self.chord/self.mu
+        cl, cd = self._airfoils(alpha, Re)
+
+        return induction_factors(self.r, self.chord, self.Rhub, self.Rtip, phi, cl, cd,
+                                 self.B, Vx, Vy, **self.options)
+
+
+    def _solve(self, Vx, Vy, twist):
+        """inflow angle of every case and section"""
+
+        errf = lambda phi: self._residual(phi, Vx, Vy, twist)[0]
+
+        # standard bracket, then the two fallbacks CCBlade uses where it has no sign change
+        eps = 1e-6
+        ones = np.ones_like(Vx)
+        lo = eps*ones
+        hi = pi/2*ones
+        flo = errf(lo)
+        fhi = errf(hi)
+
+        nobracket = flo*fhi > 0
+        if np.any(nobracket):
+            brake = (errf(-pi/4*ones) < 0) & (errf(-eps*ones) > 0)
+            lo = np.where(nobracket, np.where(brake, -pi/4, pi/2), lo)
+            hi = np.where(nobracket, np.where(brake, -eps, pi - eps), hi)
+            flo = errf(lo)
+            fhi = errf(hi)
+
+        phi = _illinois(errf, lo, hi, flo, fhi)
+
+        # no solution, CCBlade warns and uses phi = 0 as well
+        unsolved = np.isnan(phi)
+        if np.any(unsolved):
+            warnings.warn('no bracketed BEM solution at %d of %d sections, using phi = 0'
+                          % (np.count_nonzero(unsolved), unsolved.size))
+            phi[unsolved] = 0.0
+
+        return phi
+
+
+    def distributedAeroLoads(self, Uinf, Omega, pitch, azimuth):
+        """distributed normal and tangential loads (N/m) for arrays of operating
+        points (all of length m).  Returns Np, Tp of shape (m, nsections)."""
+
+        Uinf = np.atleast_1d(np.asarray(Uinf, dtype=float))
+        Omega = np.atleast_1d(np.asarray(Omega, dtype=float))*np.ones_like(Uinf)
+        pitch = np.radians(np.atleast_1d(np.asarray(pitch, dtype=float)))*np.ones_like(Uinf)
+        azimuth = np.radians(np.atleast_1d(np.asarray(azimuth, dtype=float)))*np.ones_like(Uinf)
+
+        Vx, Vy = wind_components(self.r, self.precurve, self.presweep, self.precone, self.yaw,
+                                 self.tilt, azimuth, Uinf, Omega, self.hubHt, self.shearExp)
+        twist = self.theta + pitch[:, np.newaxis]
+
+        # parked cases are not solved and have no induction
+        phi = pi/2*np.ones_like(Vx)
+        a = np.zeros_like(Vx)
+        ap = np.zeros_like(Vx)
+
+        rotating = Omega != 0
+        if np.any(rotating):
+            phi[rotating] = self._solve(Vx[rotating], Vy[rotating], twist[rotating])
+            fzero, a[rotating], ap[rotating] = self._residual(phi[rotating], Vx[rotating], Vy[rotating], twist[rotating])
+
+        # loads with the converged induction
+        alpha = phi - twist
+        W = np.sqrt((Vx*(1 - a))**2 + (Vy*(1 + ap))**2)
+        Re = self.rho*W*self.chord/self.mu
+        cl, cd = self._airfoils(alpha, Re)
+
+        cn = cl*np.cos(phi) + cd*np.sin(phi)
+        ct = cl*np.sin(phi) - cd*np.cos(phi)
+        q = 0.5*self.rho*W**2
+
+        return cn*q*self.chord, ct*q*self.chord
+
+
+    def evaluate(self, Uinf, Omega, pitch, coefficient=False):
+        """power, thrust, and torque (or their coefficients) at each operating point,
+        averaged over nSector azimuthal sectors"""
+
+        Uinf = np.atleast_1d(np.asarray(Uinf, dtype=float))
+        Omega = np.atleast_1d(np.asarray(Omega, dtype=float))
+        pitch = np.atleast_1d(np.asarray(pitch, dtype=float))
+        npts = len(Uinf)
+        nsec = self.nSector
+
+        # every (operating point, sector) pair in one solve
+        azimuth = np.tile(360.0*np.arange(nsec)/nsec, npts)
+        Np, Tp = self.distributedAeroLoads(np.repeat(Uinf, nsec), np.repeat(Omega, nsec),
+                                           np.repeat(pitch, nsec), azimuth)
+
+        zero = np.zeros((len(Np), 1))
+        thrust = np.hstack([zero, Np, zero])*np.cos(self.cone_full)
+        torque = np.hstack([zero, Tp, zero])*self.z_full
+
+        T = self.B*np.trapz(thrust, self.s_full, axis=1).reshape(npts, nsec).mean(axis=1)
+        Q = self.B*np.trapz(torque, self.s_full, axis=1).reshape(npts, nsec).mean(axis=1)
+        P = Q*Omega*pi/30.0
+
+        if coefficient:
+            q = 0.5*self.rho*Uinf**2
+            A = pi*self.rotorR**2
+            return P/(q*A*Uinf), T/(q*A), Q/(q*self.rotorR*A)
+
+        return P, T, Q